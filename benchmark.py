@@ -0,0 +1,1042 @@
+#!/usr/bin/env python3
+"""Замеры производительности слоя базы данных.
+
+Запуск: python benchmark.py [--sizes 10000 100000 1000000]
+       python benchmark.py --explain   (проверка планов запросов)
+       python benchmark.py --history-ui 100000   (окно истории, нужен дисплей)
+       python benchmark.py --export 1000000      (скорость экспорта)
+       python benchmark.py --fleet 1000 500      (проверка автопарка)
+       python benchmark.py --concurrency 100000  (читатели и писатель, WAL)
+       python benchmark.py --startup [--max-ms 100]  (холодный запуск)
+       python benchmark.py --config-faults  (сбои при сохранении настроек)
+       python benchmark.py --forecast 10000 20  (прогноз ТО, нужен numpy)
+       python benchmark.py --check-cache  (кэш проверки против проверки без кэша)
+       python benchmark.py --search 1000000  (полнотекстовый поиск)
+       python benchmark.py --suite [--json new.json] [--baseline old.json]
+                           (сценарии add_record, check_services, get_all_records,
+                            delete_record; код 1 при замедлении больше --tolerance %)
+       python benchmark.py --instrumentation 100000  (цена сбора статистики)
+       xvfb-run -a python benchmark.py --dialogs [--sizes 1000 100000]
+                           [--procedures 12 100 500] [--json ...] [--baseline ...]
+                           (время открытия окон, число виджетов и строк)
+"""
+import argparse
+import json
+import datetime
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from connection import PRAGMAS
+from database import Database, DEFAULT_VEHICLE_ID
+
+
+REPAIRS = (
+    "Замена тормозных колодок", "Замена тормозного диска", "Прокачка тормозной системы",
+    "Ремонт подвески", "Замена амортизаторов", "Замена лампы ближнего света",
+    "Диагностика двигателя", "Ремонт стартера", "Замена ремня ГРМ",
+    "Развал-схождение", "Замена аккумулятора", "Ремонт генератора",
+)
+
+FIRST_DAY = datetime.date(2010, 1, 1)
+LAST_DAY = datetime.date(2025, 12, 31)
+
+
+def generate_logs(count, works, seed=42):
+    """Синтетический журнал одного автомобиля: (пробег, дата, тип, описание).
+
+    Пробег растёт с каждой записью, даты не убывают и равномерно
+    покрывают FIRST_DAY..LAST_DAY. 70% записей — плановые работы из works,
+    остальные — внеплановые ремонты. При одном seed записи одни и те же.
+    """
+    rng = random.Random(seed)
+    span = (LAST_DAY - FIRST_DAY).days
+    mileage = 0
+    for i in range(count):
+        mileage += rng.randint(10, 300)
+        date = (FIRST_DAY + datetime.timedelta(days=i * span // count)).isoformat()
+        if rng.random() < 0.7:
+            yield mileage, date, "плановое ТО", rng.choice(works)
+        else:
+            yield mileage, date, "внеплановый ремонт", f"{rng.choice(REPAIRS)}, заказ-наряд {i}"
+
+
+def fill_logs(db, count, seed=42, vehicle_id=DEFAULT_VEHICLE_ID):
+    """Заполняет журнал автомобиля записями generate_logs"""
+    works = ([work for work, _, _ in db.plan.snapshot().planned_work]
+             or ["Замена масла в двигателе"])
+    work_ids = db.get_work_ids(works)
+    mileage = 0
+
+    def rows():
+        nonlocal mileage
+        for mileage, date, type_, description in generate_logs(count, works, seed):
+            yield (mileage, date, type_, description, work_ids.get(description), vehicle_id)
+
+    db.conn.executemany(
+        "INSERT INTO logs (mileage, date, type, description, work_id, vehicle_id) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows())
+    db.conn.execute("UPDATE vehicles SET mileage = ? WHERE id = ?", (mileage, vehicle_id))
+    db.conn.commit()
+    db.data_changed(vehicle_id)
+
+
+def measure(func, repeat):
+    """Возвращает среднее время вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench_check_services(sizes, repeat=20):
+    print(f"{'Записей':>10} | {'check_services, мс':>20} | {'из кэша, мс':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'bench.db'))
+            fill_logs(db, size)
+            mileage = db.conn.execute("SELECT MAX(mileage) FROM logs").fetchone()[0]
+            db.check_services(mileage)  # прогрев кэша страниц
+
+            def uncached():
+                db.clear_check_cache()
+                db.check_services(mileage)
+
+            elapsed = measure(uncached, repeat)
+            # Соседние значения пробега обычно попадают в тот же интервал порогов
+            mileages = iter(range(mileage, mileage + repeat * 10, 10))
+            cached = measure(lambda: db.check_services(next(mileages)), repeat)
+            db.close()
+        print(f"{size:>10} | {elapsed:>20.2f} | {cached:>12.3f}")
+
+
+SUITE_SIZES = (1_000, 10_000, 100_000)
+SUITE_SCENARIOS = ('add_record', 'check_services', 'get_all_records', 'delete_record')
+REGRESSION_TOLERANCE = 20  # %, на сколько медиана может вырасти без тревоги
+REGRESSION_MIN_MS = 0.1    # меньшие разницы — шум диска и таймера
+
+
+def median_ms(func, repeat):
+    """Медиана времени вызова в миллисекундах: меньше зависит от случайных
+    задержек диска и планировщика, чем среднее"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def environment(seed, repeat):
+    """Условия замера для JSON-отчёта"""
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeat': repeat,
+    }
+
+
+def run_suite(sizes, repeat=20, seed=42):
+    """Сценарии SUITE_SCENARIOS на журналах из sizes записей.
+
+    Журналы строит generate_logs с seed, поэтому при одном seed данные
+    совпадают между запусками. Возвращает словарь для JSON: условия
+    замера и results — {сценарий: {размер: медиана, мс}}.
+    """
+    results = {name: {} for name in SUITE_SCENARIOS}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'bench.db'))
+            fill_logs(db, size, seed)
+            mileage, date = db.conn.execute(
+                "SELECT MAX(mileage), MAX(date) FROM logs").fetchone()
+            work = db.plan.snapshot().planned_work[0][0]
+            db.check_services(mileage)  # прогрев кэша страниц
+            added = []
+
+            def add():
+                added.append(db.add_record(mileage + len(added) + 1, date, "плановое ТО", work))
+
+            def check():
+                db.clear_check_cache()
+                db.check_services(mileage + len(added))
+
+            # Удаляются записи, добавленные сценарием add_record, — размер
+            # журнала после замера прежний
+            timings = {
+                'add_record': median_ms(add, repeat),
+                'check_services': median_ms(check, repeat),
+                'get_all_records': median_ms(db.get_all_records, repeat),
+                'delete_record': median_ms(lambda: db.delete_record(added.pop()), repeat),
+            }
+            db.close()
+        for name, elapsed in timings.items():
+            results[name][str(size)] = round(elapsed, 4)
+    return dict(environment(seed, repeat), results=results)
+
+
+def size_label(size):
+    """Подпись столбца: число записей с разделителями, остальное как есть"""
+    return f"{int(size):,}" if size.isdigit() else size
+
+
+def find_regressions(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Сценарии и размеры, где медиана выросла больше чем на tolerance %
+    относительно baseline (отчёт из файла). Сравниваются только пары,
+    которые есть в обоих отчётах."""
+    problems = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name, {})
+        for size, elapsed in current.items():
+            before = previous.get(size)
+            if before is None:
+                continue
+            if (elapsed > before * (1 + tolerance / 100)
+                    and elapsed - before > REGRESSION_MIN_MS):
+                problems.append(f"{name} [{size_label(size)}]: "
+                                f"{before:.2f} -> {elapsed:.2f} мс "
+                                f"(+{(elapsed / before - 1) * 100:.0f}%)")
+    return problems
+
+
+def print_suite(report, baseline=None, title="Сценарий, мс"):
+    sizes = list(dict.fromkeys(size for timings in report['results'].values()
+                               for size in timings))
+    print(f"{title:>18} | " + " | ".join(f"{size_label(size):>16}" for size in sizes))
+    for name, timings in report['results'].items():
+        previous = (baseline or {}).get('results', {}).get(name, {})
+        cells = []
+        for size in sizes:
+            elapsed = timings.get(size)
+            before = previous.get(size)
+            cell = "" if elapsed is None else f"{elapsed:.3f}"
+            if elapsed is not None and before:
+                cell += f" ({(elapsed / before - 1) * 100:+.0f}%)"
+            cells.append(f"{cell:>16}")
+        print(f"{name:>18} | " + " | ".join(cells))
+
+
+def check_check_cache(size=5_000, rounds=200, seed=7):
+    """Сверяет check_services из кэша с проверкой без кэша при изменениях.
+
+    Между проверками журнал и план меняются методами Database, другим
+    соединением (как из другого процесса) и напрямую через db.conn. Заодно
+    check_fleet сверяется с check_services по каждому автомобилю.
+    Возвращает (список расхождений, статистика кэша).
+    """
+    rng = random.Random(seed)
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        db = Database(path)
+        fill_logs(db, size)
+        second = db.add_vehicle("Второй автомобиль")
+        fill_logs(db, size // 10, seed=seed, vehicle_id=second)
+        works = [work for work, _, _ in db.plan.snapshot().planned_work]
+        other = sqlite3.connect(path)
+        # Эталон — отдельный объект с тем же соединением, кэш сбрасывается
+        reference = Database(path)
+        reference.plan.watch_interval = 0
+        ids = []
+
+        for step in range(rounds):
+            vehicle_id = rng.choice((DEFAULT_VEHICLE_ID, second))
+            action = rng.random()
+            if action < 0.3:
+                date = f"20{rng.randint(20, 26)}-{rng.randint(1, 12):02d}-{rng.randint(1, 31):02d}"
+                try:
+                    datetime.date.fromisoformat(date)
+                except ValueError:
+                    date = date[:8] + "28"  # 31 февраля и т.п.
+                ids.append(db.add_record(
+                    rng.randint(0, 600_000), date, "плановое ТО",
+                    rng.choice(works), vehicle_id))
+            elif action < 0.4 and ids:
+                db.delete_record(ids.pop(rng.randrange(len(ids))))
+            elif action < 0.45:
+                planned = [(work, rng.choice((5000, 10000, 15000)),
+                            rng.choice((None, 1, 6, 12, 24))) for work in works]
+                db.plan.update(planned, rng.choice((5, 10, 20)))
+            elif action < 0.5:
+                other.execute("DELETE FROM logs WHERE id = (SELECT MAX(id) FROM logs)")
+                other.commit()
+            elif action < 0.55:
+                db.conn.execute(
+                    "UPDATE logs SET mileage = mileage + 1000, date = '2026-02-28' "
+                    "WHERE id = (SELECT MAX(id) FROM logs WHERE vehicle_id = ?)", (vehicle_id,))
+                db.conn.commit()
+                db.data_changed(vehicle_id)
+
+            mileage = rng.randint(0, 600_000)
+            for offset in (0, 20, 40):  # повторные проверки должны попадать в кэш
+                cached = db.check_services(mileage + offset, vehicle_id)
+                reference.clear_check_cache()
+                expected = reference.check_services(mileage + offset, vehicle_id)
+                if cached != expected:
+                    problems.append(f"шаг {step}, пробег {mileage + offset}: "
+                                    f"из кэша {cached}, без кэша {expected}")
+
+            # Пакетная проверка парка должна давать то же, что проверка по одному
+            for fleet_vehicle, _, current in db.get_vehicles():
+                fleet = [row[3:] for row in db.check_fleet() if row[0] == fleet_vehicle]
+                reference.clear_check_cache()
+                single = reference.check_services(current, fleet_vehicle)
+                if fleet != single:
+                    problems.append(f"шаг {step}, автомобиль {fleet_vehicle}: "
+                                    f"check_fleet {fleet}, check_services {single}")
+
+        info = db.check_cache_info()
+        other.close()
+        db.close()
+    return problems, info
+
+
+def bench_fleet(vehicles, records, repeat=5):
+    """Проверка всего автопарка: vehicles автомобилей по records записей.
+
+    Замеры повторяются для плана только с интервалами в км и для того же
+    плана с интервалами в месяцах ("что наступит раньше").
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        fill_logs(db, records)
+        for number in range(2, vehicles + 1):
+            vehicle_id = db.add_vehicle(f"Автомобиль {number}")
+            fill_logs(db, records, seed=number, vehicle_id=vehicle_id)
+        print(f"Автомобилей: {vehicles}, записей: {vehicles * records}")
+
+        mileage_plan = [(work, period, None)
+                        for work, period, _ in db.plan.snapshot().planned_work]
+        calendar_plan = [(work, period, 12 * (position + 1))
+                         for position, (work, period, _) in enumerate(mileage_plan)]
+        # Последние записи журнала — 2025 год: к этой дате часть сроков
+        # в месяцах уже наступила, часть ещё нет
+        today = "2026-06-01"
+
+        def per_vehicle():
+            db.clear_check_cache()
+            for vehicle_id, _, mileage in db.get_vehicles():
+                db.check_services(mileage, vehicle_id)
+
+        for title, planned_work in (("только км", mileage_plan),
+                                    ("км и месяцы", calendar_plan)):
+            db.plan.update(planned_work)
+            due = db.check_fleet(today)
+            fleet_ms = measure(lambda: db.check_fleet(today), repeat)
+            single_ms = measure(per_vehicle, repeat)
+            print(f"  план {title}: check_fleet {fleet_ms:.1f} мс "
+                  f"(работ к выполнению: {len(due)}), "
+                  f"check_services по каждому автомобилю {single_ms:.1f} мс")
+        db.close()
+
+
+def bench_forecast(vehicles, records, repeat=3):
+    """Прогноз дат ТО для vehicles автомобилей по records записей"""
+    from forecast import estimate_daily_mileage, forecast_fleet
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        fill_logs(db, records)
+        for number in range(2, vehicles + 1):
+            vehicle_id = db.add_vehicle(f"Автомобиль {number}")
+            fill_logs(db, records, seed=number, vehicle_id=vehicle_id)
+
+        rows = forecast_fleet(db)
+        trends = db.get_mileage_trends()
+        print(f"Автомобилей: {vehicles}, записей: {vehicles * records}, "
+              f"прогнозов: {len(rows)}")
+        print(f"  суммы по журналу (SQL):  {measure(db.get_mileage_trends, repeat):.1f} мс")
+        print(f"  план автопарка (SQL):    {measure(db.get_fleet_plan, repeat):.1f} мс")
+        print(f"  оценка пробега (NumPy):  "
+              f"{measure(lambda: estimate_daily_mileage(trends), repeat):.1f} мс")
+        print(f"  forecast_fleet целиком:  {measure(lambda: forecast_fleet(db), repeat):.1f} мс")
+        db.close()
+
+
+def current_rss_mb():
+    """Текущий объём резидентной памяти процесса в МБ"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource  # не Linux: берём пиковое значение
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench_history_ui(size):
+    """Время до первой отрисовки окна истории и память на size записей"""
+    import tkinter as tk
+    from db_worker import DatabaseWorker
+    from history_grid import VirtualHistoryGrid
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Нет дисплея, замер окна истории пропущен: {e}")
+        return
+
+    def wait(condition):
+        """Крутит цикл событий Tk, пока не выполнится условие"""
+        while not condition():
+            root.update()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        db = Database(path)
+        fill_logs(db, size)
+        worker = DatabaseWorker(root, db)
+        rss_before = current_rss_mb()
+
+        start = time.perf_counter()
+        first = []
+        worker.call(VirtualHistoryGrid.load_first_window, on_result=first.append)
+        wait(lambda: first)
+        container = tk.Frame(root)
+        container.pack(fill='both', expand=True)
+        grid = VirtualHistoryGrid(container, worker, *first[0], height=15)
+        grid.grid(row=0, column=0)
+        root.update_idletasks()
+        first_paint = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(100):
+            target = grid.offset + grid.visible_rows
+            grid.scroll_to(target)
+            wait(lambda: grid.task is None)
+            root.update_idletasks()
+        page_scroll = (time.perf_counter() - start) * 1000 / 100
+
+        print(f"Записей: {size}")
+        print(f"  первая отрисовка:   {first_paint:.1f} мс")
+        print(f"  прокрутка страницы: {page_scroll:.2f} мс")
+        print(f"  строк в Treeview:   {len(grid.tree.get_children())}")
+        print(f"  прирост RSS:        {current_rss_mb() - rss_before:.1f} МБ")
+        worker.close()
+        db.close()
+        root.destroy()
+
+
+DIALOG_SIZES = (1_000, 100_000)       # записей в журнале
+DIALOG_PROCEDURES = (12, 100, 500)     # процедур в плане ТО
+DIALOG_TIMEOUT = 60                    # с ожидания фоновой загрузки окна
+
+
+def generate_plan(count, seed=42):
+    """План ТО из count процедур: сначала работы плана по умолчанию, затем
+    ремонты из REPAIRS с номером позиции (как в каталоге дилера)"""
+    from config import DEFAULT_PLANNED_WORK
+
+    rng = random.Random(seed)
+    works = [work for work, _ in DEFAULT_PLANNED_WORK]
+    works += [f"{REPAIRS[position % len(REPAIRS)]} (позиция {position + 1})"
+              for position in range(len(works), count)]
+    return [(work, rng.choice((5_000, 10_000, 15_000, 30_000, 60_000)),
+             rng.choice((None, 6, 12, 24)))
+            for work in works[:count]]
+
+
+def count_widgets(widget):
+    """(виджетов, элементов) в окне: элементы — строки Treeview и фигуры Canvas"""
+    from tkinter import ttk
+
+    widgets = items = 0
+    pending = list(widget.winfo_children())
+    while pending:
+        child = pending.pop()
+        widgets += 1
+        pending.extend(child.winfo_children())
+        if isinstance(child, ttk.Treeview):
+            rows = list(child.get_children())
+            while rows:
+                items += 1
+                rows.extend(child.get_children(rows.pop()))
+        elif child.winfo_class() == 'Canvas':
+            items += len(child.find_all())
+    return widgets, items
+
+
+def find_widgets(widget, kind):
+    """Все потомки widget класса kind"""
+    found, pending = [], list(widget.winfo_children())
+    while pending:
+        child = pending.pop()
+        if isinstance(child, kind):
+            found.append(child)
+        pending.extend(child.winfo_children())
+    return found
+
+
+def bench_dialogs(sizes, procedures, repeat=3, seed=42):
+    """Открытие окон CarLoggerApp на журналах из sizes записей и планах из
+    procedures процедур.
+
+    Время — от вызова метода окна до завершения update_idletasks после
+    того, как окно показало данные (для истории — первые строки из
+    фоновой загрузки, для проверки состояния — результат проверки по
+    последнему пробегу). Нужен дисплей; на сервере — xvfb-run -a.
+    Возвращает отчёт как run_suite, плюс число виджетов и элементов
+    последнего открытого окна. None, если дисплея нет.
+    """
+    import tkinter as tk
+    from main import CarLoggerApp
+
+    def wait(root, ready):
+        deadline = time.perf_counter() + DIALOG_TIMEOUT
+        while not ready():
+            if time.perf_counter() > deadline:
+                raise RuntimeError("окно не загрузилось за DIALOG_TIMEOUT секунд")
+            root.update()
+
+    def run_check(app, dialog):
+        # Вводим последний пробег и нажимаем "Проверить", как пользователь
+        mileage = app.db.get_vehicles()[0][2]
+        find_widgets(dialog, tk.Entry)[0].insert(0, str(mileage))
+        button = next(button for button in find_widgets(dialog, tk.Button)
+                      if "Проверить" in button.cget('text'))
+        button.invoke()
+        return lambda: str(button.cget('state')) == 'normal'
+
+    def history_loaded(app, dialog):
+        from tkinter import ttk
+        return lambda: any(tree.get_children() for tree in find_widgets(dialog, ttk.Treeview))
+
+    # Метод окна -> (что сделать после вызова, чтобы дождаться данных;
+    # закрывать ли обработчиком окна, который отменяет фоновые запросы)
+    dialogs = {
+        'view_history': (history_loaded, True),
+        'check_status': (run_check, True),
+        'view_services': (None, False),
+        # Обработчик закрытия настройки ТО спрашивает подтверждение
+        'configure_services': (None, False),
+    }
+    report = {key: {name: {} for name in dialogs} for key in ('results', 'widgets', 'items')}
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'bench.db'))
+            fill_logs(db, size, seed)
+            try:
+                app = CarLoggerApp(db=db)
+            except tk.TclError as e:
+                print(f"Нет дисплея, замер окон пропущен: {e}")
+                db.close()
+                return None
+            root = app.root
+            root.update()
+            for count in procedures:
+                db.plan.update(generate_plan(count, seed))
+                app.publish_plan(db.plan.snapshot())  # не дожидаясь watch_plan
+                key = f"{size}/{count}"
+                for name, (prepare, close_handler) in dialogs.items():
+                    times = []
+                    for _ in range(repeat):
+                        before = set(root.winfo_children())
+                        start = time.perf_counter()
+                        getattr(app, name)()
+                        dialog = next(child for child in root.winfo_children()
+                                      if isinstance(child, tk.Toplevel) and child not in before)
+                        if prepare is not None:
+                            wait(root, prepare(app, dialog))
+                        dialog.update_idletasks()
+                        times.append((time.perf_counter() - start) * 1000)
+                        widgets, items = count_widgets(dialog)
+                        if close_handler:
+                            dialog.tk.call(dialog.protocol("WM_DELETE_WINDOW"))
+                        else:
+                            dialog.destroy()
+                        root.update()
+                    report['results'][name][key] = round(statistics.median(times), 2)
+                    report['widgets'][name][key] = widgets
+                    report['items'][name][key] = items
+            app.worker.close()
+            root.destroy()
+            db.close()
+    return dict(environment(seed, repeat), **report)
+
+
+def bench_instrumentation(size, repeat=2000):
+    """Цена сбора статистики (instrumentation.py) на частых вызовах Database"""
+    from instrumentation import monitor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        fill_logs(db, size)
+        mileage = db.get_vehicles()[0][2]
+        original = Database.check_services
+        calls = (("check_services (из кэша)", lambda: db.check_services(mileage)),
+                 ("get_records_page (100)", lambda: db.get_records_page(100)))
+        print(f"Записей: {size:,}")
+        print(f"{'Вызов, мкс':>26} | {'выключено':>10} | {'включено':>10} | "
+              f"{'+ медленные':>12}")
+        for title, call in calls:
+            timings = []
+            for slow_ms in (False, None, 1000.0):
+                if slow_ms is False:
+                    monitor.disable()
+                else:
+                    monitor.enable(slow_ms)
+                call()  # прогрев
+                timings.append(median_ms(call, repeat) * 1000)
+            monitor.disable()
+            print(f"{title:>26} | " + " | ".join(
+                f"{value:>{width}.1f}" for value, width in zip(timings, (10, 10, 12))))
+        if Database.check_services is not original:
+            print("disable() не вернул исходные методы Database")
+        monitor.reset()
+        db.close()
+
+
+def bench_export(size):
+    """Скорость экспорта журнала из size записей во все форматы"""
+    from exporter import FORMATS, export_file
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        fill_logs(db, size)
+        print(f"{'Формат':>10} | {'записей/с':>12} | {'размер, МБ':>10}")
+        for name, (extension, _, _) in FORMATS.items():
+            path = os.path.join(tmp, 'export' + extension)
+            result = export_file(db, path, name)
+            size_mb = os.path.getsize(path) / 2 ** 20
+            print(f"{name:>10} | {result['rows_per_second']:>12,.0f} | {size_mb:>10.1f}")
+        db.close()
+
+
+def bench_search(size, repeat=5):
+    """Полнотекстовый поиск по журналу из size записей с разными описаниями"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        works = [work for work, _, _ in db.plan.snapshot().planned_work]
+
+        start = time.perf_counter()
+        db.add_records(generate_logs(size, works), batch_size=10_000)
+        print(f"Записей: {size:,}, вставка с индексом FTS5: "
+              f"{time.perf_counter() - start:.1f} с")
+
+        print(f"{'Запрос':>16} | {'найдено':>9} | {'число, мс':>10} | "
+              f"{'1-я стр., мс':>12} | {'стр. 100, мс':>12} | {'LIKE, мс':>9}")
+        for query in ("торм", "ТОРМОЗН ДИСК", "ст", "наряд 12345", "генератор"):
+            found = db.count_search(query)
+            count_ms = measure(lambda: db.count_search(query), repeat)
+            first_ms = measure(lambda: db.search_records(query, 100), repeat)
+            deep_ms = measure(lambda: db.search_records(query, 100, 100 * 99), repeat)
+            # Для сравнения: поиск подстроки без индекса
+            like = f"%{query.split()[0]}%"
+            like_ms = measure(lambda: db.conn.execute(
+                "SELECT id FROM logs WHERE vehicle_id = ? AND description LIKE ? LIMIT 100",
+                (DEFAULT_VEHICLE_ID, like)).fetchall(), 1)
+            print(f"{query:>16} | {found:>9,} | {count_ms:>10.1f} | "
+                  f"{first_ms:>12.1f} | {deep_ms:>12.1f} | {like_ms:>9.1f}")
+        db.close()
+
+
+def run_concurrently(db, readers, seconds):
+    """readers потоков читают историю и состояние, один поток пишет.
+
+    Возвращает (чтений/с, записей/с, 95-й перцентиль чтения в мс, ошибок).
+    """
+    stop = threading.Event()
+    reads, writes, errors = [], [], []
+    mileage = db.conn.execute("SELECT MAX(mileage) FROM logs").fetchone()[0]
+    work = db.plan.snapshot().planned_work[0][0]
+
+    def reader():
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    db.check_services(mileage)
+                    db.get_records_page(100)
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+                    continue
+                reads.append(time.perf_counter() - start)
+        finally:
+            db.pool.release()
+
+    def writer():
+        current = mileage
+        try:
+            while not stop.is_set():
+                current += 10
+                try:
+                    db.add_record(current, "2026-01-01", "плановое ТО", work)
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+                    continue
+                writes.append(current)
+        finally:
+            db.pool.release()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    reads.sort()
+    p95 = reads[int(len(reads) * 0.95)] * 1000 if reads else float('nan')
+    return len(reads) / seconds, len(writes) / seconds, p95, len(errors)
+
+
+def bench_concurrency(size, readers=3, seconds=3.0):
+    """Сравнивает WAL с журналом отката при одновременном чтении и записи"""
+    modes = {
+        'WAL': PRAGMAS,
+        'DELETE': ("PRAGMA journal_mode = DELETE", "PRAGMA synchronous = FULL"),
+    }
+    print(f"Записей: {size}, читателей: {readers}, писатель: 1, {seconds:.0f} с")
+    print(f"{'Журнал':>8} | {'чтений/с':>9} | {'записей/с':>9} | "
+          f"{'p95 чтения, мс':>14} | {'ошибок':>6}")
+    for mode, pragmas in modes.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'bench.db'), pragmas)
+            fill_logs(db, size)
+            result = run_concurrently(db, readers, seconds)
+            db.close()
+        print(f"{mode:>8} | {result[0]:>9.0f} | {result[1]:>9.0f} | "
+              f"{result[2]:>14.2f} | {result[3]:>6}")
+
+
+def cold_start_ms(args, cwd, repeat=5):
+    """Лучшее из repeat время запуска нового процесса Python, мс"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def check_startup(max_ms):
+    """Проверяет холодный запуск. Возвращает список нарушений.
+
+    Запуски идут во временном каталоге: там нет car_config.json, поэтому
+    видно, не читается ли (и не создаётся ли) конфигурация при импорте.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    env_path = os.environ.get('PYTHONPATH')
+    os.environ['PYTHONPATH'] = here + (os.pathsep + env_path if env_path else '')
+    problems = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for module in ('database', 'main'):
+                ms = cold_start_ms(['-c', f'import {module}'], tmp)
+                print(f"  import {module:<10} {ms:>7.1f} мс")
+            if os.path.exists(os.path.join(tmp, 'car_config.json')):
+                problems.append("импорт модулей создал car_config.json")
+
+            db_path = os.path.join(tmp, 'bench.db')
+            ms = cold_start_ms(['-m', 'cli', '--db', db_path, 'check'], tmp)
+            print(f"  cli check         {ms:>7.1f} мс (предел {max_ms} мс)")
+            if ms > max_ms:
+                problems.append(f"cli check: {ms:.1f} мс > {max_ms} мс")
+
+            result = subprocess.run(
+                [sys.executable, '-c',
+                 'import sys, cli; sys.exit("tkinter" in sys.modules)'], cwd=tmp)
+            if result.returncode:
+                problems.append("cli импортирует tkinter")
+    finally:
+        if env_path is None:
+            del os.environ['PYTHONPATH']
+        else:
+            os.environ['PYTHONPATH'] = env_path
+    return problems
+
+
+def check_config_faults(kills=20):
+    """Внедряет сбои при сохранении настроек. Возвращает список нарушений."""
+    import config
+
+    versions = [[(f"Работа {i}", 1000 * (i + 1))] for i in range(5)]
+    problems = []
+
+    def saved(path):
+        try:
+            return [list(item) for item in config.read_config_file(path)[0]]
+        except (OSError, ValueError):
+            return None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'car_config.json')
+        service = config.ConfigService(path, watch_interval=None)
+        for planned_work in versions:
+            service.update(planned_work, 10)
+        backups = [name for name in os.listdir(tmp) if name.startswith('car_config.json.')]
+        if len(backups) != config.BACKUP_COUNT:
+            problems.append(f"резервных копий {len(backups)}, ожидалось {config.BACKUP_COUNT}")
+
+        # Сбой на fsync и на переименовании: файл не должен измениться
+        for name, target in (('fsync', os), ('replace', os)):
+            original = getattr(target, name)
+
+            def failing(*args, _original=original):
+                if name == 'fsync' or str(args[0]).endswith('.tmp'):
+                    raise OSError("внедрённый сбой")
+                return _original(*args)
+
+            setattr(target, name, failing)
+            try:
+                ok = service.update([("Не сохранится", 1)], 10)
+            finally:
+                setattr(target, name, original)
+            if ok or saved(path) != [list(item) for item in config.normalize_plan(versions[-1])]:
+                problems.append(f"сбой {name} изменил файл настроек")
+        if any(name.endswith('.tmp') for name in os.listdir(tmp)):
+            problems.append("после сбоя остался временный файл")
+
+        # Обрезанный файл (сбой старой неатомарной записи): берётся копия .1
+        latest_backup = saved(config.backup_path(path, 1))
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        recovered = config.ConfigService(path, watch_interval=None).snapshot()
+        if latest_backup is None or [list(item) for item in recovered.planned_work] != latest_backup:
+            problems.append("обрезанный файл не восстановлен из резервной копии")
+        if saved(path) is None:
+            problems.append("файл настроек не переписан восстановленной копией")
+
+        # Все копии испорчены: настройки по умолчанию
+        for name in os.listdir(tmp):
+            with open(os.path.join(tmp, name), 'w') as f:
+                f.write('{"PLANNED_WORK": [')
+        fallback = config.ConfigService(path, watch_interval=None).snapshot()
+        if fallback.planned_work != config.normalize_plan(config.DEFAULT_PLANNED_WORK):
+            problems.append("при испорченных копиях не взяты настройки по умолчанию")
+
+        # Процесс убивается в случайный момент непрерывной записи
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        writer = (
+            "import sys, config\n"
+            "service = config.ConfigService(sys.argv[1], watch_interval=None)\n"
+            "i = 0\n"
+            "while True:\n"
+            "    i += 1\n"
+            "    service.update([(f'Работа {j}', i) for j in range(200)], 10)\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        rng = random.Random(1)
+        for _ in range(kills):
+            child = subprocess.Popen([sys.executable, '-c', writer, path], env=env)
+            time.sleep(rng.uniform(0.1, 0.3))
+            child.kill()
+            child.wait()
+            if saved(path) is None:
+                problems.append("после аварийного завершения файл настроек испорчен")
+                break
+    return problems
+
+
+def capture_queries(db, func):
+    """Возвращает тексты SQL-запросов, выполненных внутри func"""
+    queries = []
+    db.conn.set_trace_callback(queries.append)
+    try:
+        func()
+    finally:
+        db.conn.set_trace_callback(None)
+    return [q for q in queries if q.lstrip().upper().startswith(("SELECT", "WITH"))]
+
+
+def check_query_plans(size=10_000):
+    """Проверяет через EXPLAIN QUERY PLAN, что горячие запросы идут по индексам.
+
+    Возвращает список найденных проблем (пустой, если всё в порядке).
+    """
+    # Для check_services сортировка допустима: сортируется только план (VALUES)
+    scenarios = {
+        'check_services': (lambda db: db.check_services(10 ** 7), True),
+        'get_all_records': (lambda db: db.get_all_records(), False),
+        'get_records_page': (lambda db: db.get_records_page(
+            100, db.get_records_page(100)[1]), False),
+        'get_records_slice': (lambda db: db.get_records_slice(1000, 100), False),
+        'get_records_slice_end': (lambda db: db.get_records_slice(size - 1000, 100), False),
+        'get_records_before': (lambda db: db.get_records_before(
+            100, db.get_records_page(100)[1]), False),
+        'count_records': (lambda db: db.count_records(), False),
+        'check_fleet': (lambda db: db.check_fleet(), True),
+        # Сортировка по релевантности неизбежна, но логи читаются по rowid
+        'search_records': (lambda db: db.search_records("замена масла", 100, 100), True),
+        'get_last_service': (lambda db: db.get_last_service(
+            db.plan.snapshot().planned_work[0][0]), False),
+    }
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'explain.db'))
+        fill_logs(db, size)
+        db.conn.execute("ANALYZE")
+        for name, (scenario, allow_sort) in scenarios.items():
+            for query in capture_queries(db, lambda: scenario(db)):
+                logs_first = False
+                for row in db.conn.execute("EXPLAIN QUERY PLAN " + query):
+                    step = row[3]
+                    table = step.split()[1] if step.startswith(("SCAN", "SEARCH")) else None
+                    if table == "logs_fts" and logs_first:
+                        # MATCH во внутреннем цикле выполняется для каждой записи
+                        problems.append(f"{name}: {step} после перебора logs")
+                    elif table == "logs":
+                        logs_first = True
+                        if step.startswith("SCAN") and "INDEX" not in step:
+                            problems.append(f"{name}: {step}")
+                    elif "TEMP B-TREE" in step and not allow_sort:
+                        problems.append(f"{name}: {step}")
+        db.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help="размеры журнала (по умолчанию 10000 100000 1000000, "
+                             "для --suite — 1000 10000 100000)")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--explain', action='store_true',
+                        help="проверить планы запросов и выйти")
+    parser.add_argument('--history-ui', type=int, metavar='N',
+                        help="замерить окно истории на N записях и выйти")
+    parser.add_argument('--export', type=int, metavar='N',
+                        help="замерить экспорт N записей и выйти")
+    parser.add_argument('--fleet', type=int, nargs=2, metavar=('VEHICLES', 'RECORDS'),
+                        help="замерить проверку автопарка и выйти")
+    parser.add_argument('--concurrency', type=int, metavar='N',
+                        help="замерить одновременные чтение и запись на N записях и выйти")
+    parser.add_argument('--startup', action='store_true',
+                        help="проверить время холодного запуска и выйти")
+    parser.add_argument('--max-ms', type=float, default=100,
+                        help="предел холодного запуска cli check, мс")
+    parser.add_argument('--config-faults', action='store_true',
+                        help="проверить сохранение настроек при сбоях и выйти")
+    parser.add_argument('--forecast', type=int, nargs=2, metavar=('VEHICLES', 'RECORDS'),
+                        help="замерить прогноз ТО автопарка и выйти")
+    parser.add_argument('--check-cache', action='store_true',
+                        help="сверить кэш проверки состояния с проверкой без кэша и выйти")
+    parser.add_argument('--search', type=int, metavar='N',
+                        help="замерить полнотекстовый поиск на N записях и выйти")
+    parser.add_argument('--instrumentation', type=int, metavar='N',
+                        help="замерить цену сбора статистики на N записях и выйти")
+    parser.add_argument('--suite', action='store_true',
+                        help="замерить сценарии слоя базы данных и выйти")
+    parser.add_argument('--dialogs', action='store_true',
+                        help="замерить открытие окон (нужен дисплей или xvfb-run) и выйти")
+    parser.add_argument('--procedures', type=int, nargs='+',
+                        help="с --dialogs: процедур в плане ТО (по умолчанию 12 100 500)")
+    parser.add_argument('--seed', type=int, default=42, help="seed генератора журнала")
+    parser.add_argument('--json', metavar='ФАЙЛ',
+                        help="с --suite или --dialogs: сохранить результаты в JSON")
+    parser.add_argument('--baseline', metavar='ФАЙЛ',
+                        help="с --suite или --dialogs: сравнить с сохранённым JSON, "
+                             "при замедлении — код 1")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="допустимый рост медианы относительно --baseline, %%")
+    args = parser.parse_args()
+
+    if args.instrumentation:
+        bench_instrumentation(args.instrumentation)
+        return
+
+    if args.suite or args.dialogs:
+        if args.suite:
+            report = run_suite(args.sizes or SUITE_SIZES, args.repeat, args.seed)
+        else:
+            report = bench_dialogs(args.sizes or DIALOG_SIZES,
+                                   args.procedures or DIALOG_PROCEDURES,
+                                   min(args.repeat, 5), args.seed)
+            if report is None:
+                return
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        if args.suite:
+            print_suite(report, baseline)
+        else:
+            print_suite(report, baseline, title="Окно, мс")
+            print_suite({'results': report['widgets']}, title="Виджетов")
+            print_suite({'results': report['items']}, title="Строк и фигур")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        problems = find_regressions(report, baseline, args.tolerance) if baseline else []
+        for problem in problems:
+            print(f"Замедление: {problem}")
+        sys.exit(1 if problems else 0)
+
+    if args.search:
+        bench_search(args.search)
+        return
+
+    if args.check_cache:
+        problems, info = check_check_cache()
+        for problem in problems[:20]:
+            print(f"Кэш проверки: {problem}")
+        print(f"Попаданий: {info['hits']}, промахов: {info['misses']}")
+        if not problems:
+            print("Кэш проверки согласован с базой")
+        sys.exit(1 if problems else 0)
+
+    if args.forecast:
+        bench_forecast(*args.forecast)
+        return
+
+    if args.config_faults:
+        problems = check_config_faults()
+        for problem in problems:
+            print(f"Настройки: {problem}")
+        if not problems:
+            print("Сохранение настроек устойчиво к сбоям")
+        sys.exit(1 if problems else 0)
+
+    if args.startup:
+        problems = check_startup(args.max_ms)
+        for problem in problems:
+            print(f"Запуск: {problem}")
+        sys.exit(1 if problems else 0)
+
+    if args.concurrency:
+        bench_concurrency(args.concurrency)
+        return
+
+    if args.fleet:
+        bench_fleet(*args.fleet)
+        return
+
+    if args.export:
+        bench_export(args.export)
+        return
+
+    if args.history_ui:
+        bench_history_ui(args.history_ui)
+        return
+
+    if args.explain:
+        problems = check_query_plans()
+        for problem in problems:
+            print(f"Полный просмотр или сортировка: {problem}")
+        if not problems:
+            print("Планы запросов в порядке")
+        sys.exit(1 if problems else 0)
+
+    bench_check_services(args.sizes or [10_000, 100_000, 1_000_000], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Консольный интерфейс без графического окна (для серверов без дисплея).
+
+Запуск: python -m cli check [--mileage 152000] [--vehicle 1] [--fleet] [--date 2024-05-01]
+        python -m cli add --mileage 152000 --date 2026-10-18 "Замена масла в двигателе"
+        python -m cli history [--limit 20] [--search "торм"]
+        python -m cli delete 42
+        python -m cli forecast [--days 90] [--vehicle 1]   (нужен numpy)
+        python -m cli config [--allowance 15] [--set-work "Замена свечей" 30000]
+                             [--months 24] [--remove-work "Замена свечей"] [--history]
+
+Результат печатается в stdout в формате JSON (--pretty перед командой —
+с отступами), ошибки — в stderr
+({"error": "..."}) с кодом возврата 1. tkinter не импортируется.
+
+--diagnostics ФАЙЛ перед командой сохраняет статистику вызовов Database
+(см. instrumentation.py) в JSON ("-" — в stderr); --slow-ms N добавляет
+в неё запросы вызовов дольше N мс с планами EXPLAIN QUERY PLAN.
+"""
+import argparse
+import datetime
+import json
+import sqlite3
+import sys
+
+from connection import DEFAULT_DB_PATH
+from database import Database, DEFAULT_VEHICLE_ID
+
+
+class CliError(Exception):
+    pass
+
+
+def record_to_dict(row):
+    record_id, mileage, date, type_, description = row
+    return {'id': record_id, 'mileage': mileage, 'date': date,
+            'type': type_, 'description': description}
+
+
+def current_mileage(db, vehicle_id):
+    for vid, _, mileage in db.get_vehicles():
+        if vid == vehicle_id:
+            return mileage
+    raise CliError(f"Автомобиль с ID {vehicle_id} не найден")
+
+
+def cmd_check(db, args):
+    if args.fleet:
+        return [
+            {'vehicle_id': vehicle_id, 'vehicle': name, 'mileage': mileage,
+             'work': work, 'last_service': last, 'next_service': next_service,
+             'next_date': next_date, 'status': status}
+            for vehicle_id, name, mileage, work, last, next_service, status, next_date
+            in db.check_fleet(args.date)
+        ]
+
+    mileage = args.mileage
+    if mileage is None:
+        mileage = current_mileage(db, args.vehicle)
+    services = db.check_services(mileage, args.vehicle, args.date)
+    return {
+        'vehicle_id': args.vehicle,
+        'mileage': mileage,
+        'plan_version': (db.plan.snapshot() if args.date is None
+                         else db.plan.at(args.date)).version,
+        'services': [
+            {'work': work, 'last_service': last, 'next_service': next_service,
+             'next_date': next_date, 'status': status}
+            for work, last, next_service, status, next_date in services
+        ],
+    }
+
+
+def cmd_add(db, args):
+    from importer import validate_record
+
+    current_mileage(db, args.vehicle)  # проверяем, что автомобиль существует
+    try:
+        mileage, date, type_, description = validate_record({
+            'mileage': args.mileage,
+            'date': args.date or datetime.date.today().isoformat(),
+            'type': args.type,
+            'description': " ".join(args.description),
+        })
+    except ValueError as e:
+        raise CliError(str(e))
+    record_id = db.add_record(mileage, date, type_, description, args.vehicle)
+    return record_to_dict((record_id, mileage, date, type_, description))
+
+
+def cmd_history(db, args):
+    if args.search:
+        return [record_to_dict(row) for row in db.search_records(
+            args.search, args.limit, vehicle_id=args.vehicle)]
+    if args.all:
+        rows = db.iter_records(vehicle_id=args.vehicle)
+    else:
+        rows, _ = db.get_records_page(args.limit, vehicle_id=args.vehicle)
+    return [record_to_dict(row) for row in rows]
+
+
+def cmd_forecast(db, args):
+    from forecast import forecast_fleet
+
+    return [
+        {'vehicle_id': vehicle_id, 'vehicle': name, 'mileage': mileage, 'work': work,
+         'next_service': next_service, 'daily_mileage': rate, 'due_date': due_date,
+         'days_left': days_left}
+        for vehicle_id, name, mileage, work, next_service, rate, due_date, days_left
+        in forecast_fleet(db, horizon_days=args.days, vehicle_id=args.vehicle,
+                          since=args.since)
+    ]
+
+
+def cmd_delete(db, args):
+    if not db.delete_record(args.id):
+        raise CliError(f"Запись с ID {args.id} не найдена")
+    return {'deleted': args.id}
+
+
+def plan_to_dict(planned_work):
+    return [{'work': work, 'period': period, 'months': months}
+            for work, period, months in planned_work]
+
+
+def cmd_config(db, args):
+    if args.history:
+        return [
+            {'version': change_id, 'changed_at': changed_at, 'allowance': allowance,
+             'planned_work': plan_to_dict(planned_work)}
+            for change_id, changed_at, allowance, planned_work in db.plan.history()
+        ]
+
+    settings = db.plan.snapshot()
+    planned_work = list(settings.planned_work)
+    allowance = settings.allowance
+    changed = False
+
+    if args.allowance is not None:
+        if not 1 <= args.allowance <= 99:
+            raise CliError("Допуск должен быть между 1 и 99%")
+        allowance = args.allowance
+        changed = True
+
+    if args.set_work:
+        work, period = args.set_work
+        work = work.strip()
+        try:
+            period = int(period)
+        except ValueError:
+            period = 0
+        if not work or period <= 0:
+            raise CliError(f"Некорректный интервал для: {work}")
+        months = args.months or None  # 0 — без срока в месяцах
+        if months is not None and months < 0:
+            raise CliError(f"Некорректный интервал в месяцах для: {work}")
+        works = [name for name, _, _ in planned_work]
+        if work in works:
+            planned_work[works.index(work)] = (work, period, months)
+        else:
+            planned_work.append((work, period, months))
+        changed = True
+    elif args.months is not None:
+        raise CliError("--months задаётся вместе с --set-work")
+
+    if args.remove_work:
+        remaining = [item for item in planned_work if item[0] != args.remove_work]
+        if len(remaining) == len(planned_work):
+            raise CliError(f"Процедура не найдена: {args.remove_work}")
+        if not remaining:
+            raise CliError("Список процедур не может быть пустым")
+        planned_work = remaining
+        changed = True
+
+    if changed and not db.plan.update(planned_work, allowance):
+        raise CliError("Не удалось сохранить конфигурацию")
+
+    settings = db.plan.snapshot()
+    return {
+        'version': settings.version,
+        'planned_work': plan_to_dict(settings.planned_work),
+        'allowance': settings.allowance,
+    }
+
+
+def valid_date(value):
+    try:
+        datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Неверный формат даты: {value!r}")
+    return value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli",
+                                     description="Журнал обслуживания автомобиля")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="файл базы данных")
+    parser.add_argument('--pretty', action='store_true', help="JSON с отступами")
+    parser.add_argument('--diagnostics', metavar='ФАЙЛ',
+                        help="сохранить статистику вызовов базы в JSON (- — в stderr)")
+    parser.add_argument('--slow-ms', type=float, metavar='МС',
+                        help="с --diagnostics: записать планы запросов вызовов дольше МС")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    check = commands.add_parser('check', help="какие работы пора выполнить")
+    check.add_argument('--mileage', type=int,
+                       help="текущий пробег (по умолчанию — последний внесённый)")
+    check.add_argument('--vehicle', type=int, default=DEFAULT_VEHICLE_ID)
+    check.add_argument('--fleet', action='store_true', help="проверить весь автопарк")
+    check.add_argument('--date', type=valid_date,
+                       help="проверить на дату ГГГГ-ММ-ДД по плану, действовавшему тогда "
+                            "(с --fleet — по текущему плану)")
+    check.set_defaults(handler=cmd_check)
+
+    add = commands.add_parser('add', help="добавить запись")
+    add.add_argument('--mileage', type=int, required=True)
+    add.add_argument('--date', help="ГГГГ-ММ-ДД (по умолчанию — сегодня)")
+    add.add_argument('--type', default="плановое ТО",
+                     choices=("плановое ТО", "внеплановый ремонт"))
+    add.add_argument('--vehicle', type=int, default=DEFAULT_VEHICLE_ID)
+    add.add_argument('description', nargs='+', help="описание работ")
+    add.set_defaults(handler=cmd_add)
+
+    history = commands.add_parser('history', help="история обслуживания")
+    history.add_argument('--limit', type=int, default=100)
+    history.add_argument('--all', action='store_true', help="вся история")
+    history.add_argument('--search', metavar='ТЕКСТ',
+                         help="поиск по описанию (начала слов), до --limit записей")
+    history.add_argument('--vehicle', type=int, default=DEFAULT_VEHICLE_ID)
+    history.set_defaults(handler=cmd_history)
+
+    forecast = commands.add_parser('forecast', help="прогноз дат планового ТО")
+    forecast.add_argument('--days', type=int,
+                          help="только работы со сроком в ближайшие N дней")
+    forecast.add_argument('--vehicle', type=int, help="один автомобиль (по умолчанию — весь парк)")
+    forecast.add_argument('--since', type=valid_date,
+                          help="оценивать пробег по записям с этой даты")
+    forecast.set_defaults(handler=cmd_forecast)
+
+    delete = commands.add_parser('delete', help="удалить запись по ID")
+    delete.add_argument('id', type=int)
+    delete.set_defaults(handler=cmd_delete)
+
+    config = commands.add_parser('config', help="показать или изменить план ТО")
+    config.add_argument('--allowance', type=float, help="допуск, %%")
+    config.add_argument('--set-work', nargs=2, metavar=('РАБОТА', 'ИНТЕРВАЛ'),
+                        help="добавить процедуру или изменить её интервал")
+    config.add_argument('--months', type=int, metavar='МЕСЯЦЕВ',
+                        help="с --set-work: интервал в месяцах (0 — только по пробегу)")
+    config.add_argument('--remove-work', metavar='РАБОТА', help="удалить процедуру")
+    config.add_argument('--history', action='store_true', help="все версии плана")
+    config.set_defaults(handler=cmd_config)
+    return parser
+
+
+def dump_diagnostics(path, indent):
+    from instrumentation import monitor
+
+    report = monitor.snapshot()
+    if path == '-':
+        json.dump(report, sys.stderr, ensure_ascii=False, indent=indent)
+        sys.stderr.write("\n")
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=indent)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    indent = 2 if args.pretty else None
+    if args.slow_ms is not None and not args.diagnostics:
+        parser.error("--slow-ms задаётся вместе с --diagnostics")
+    if args.diagnostics:
+        from instrumentation import monitor
+        monitor.enable(args.slow_ms)
+
+    try:
+        db = Database(args.db)
+        try:
+            result = args.handler(db, args)
+        finally:
+            db.close()
+            if args.diagnostics:
+                dump_diagnostics(args.diagnostics, indent)
+    except (CliError, RuntimeError, sqlite3.Error, OSError) as e:
+        json.dump({'error': str(e)}, sys.stderr, ensure_ascii=False)
+        sys.stderr.write("\n")
+        return 1
+
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=indent)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
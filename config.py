@@ -1,6 +1,36 @@
 # config.py
+"""Настройки плана ТО в файле car_config.json (рядом с программой).
+
+Действующий план хранится в базе (см. plan.py, python -m cli config
+меняет его там); из car_config.json берётся только первая версия плана
+для новой базы — read_settings() читает её, ничего не записывая.
+
+Класс ConfigService хранит настройки в файле: он отдаёт неизменяемые
+снимки с номером версии, сообщает подписчикам об изменениях и
+перечитывает файл, если его изменили со стороны. PlanService (plan.py)
+наследует его, заменяя файл таблицами базы.
+
+    service = ConfigService(path)
+    snapshot = service.snapshot()
+    snapshot.planned_work, snapshot.allowance, snapshot.version
+    unsubscribe = service.subscribe(on_change)  # on_change(snapshot)
+
+Процедура плана — (работа, интервал в км, интервал в месяцах или None):
+работу пора выполнять по тому сроку, который наступит раньше. В файле
+процедура без срока в месяцах записывается как [работа, км].
+
+Файл сохраняется атомарно (временный файл, fsync, os.replace), поэтому
+сбой во время записи не оставляет его обрезанным. Предыдущие версии
+хранятся в car_config.json.1 ... .BACKUP_COUNT; если файл всё же не
+читается, настройки берутся из самой свежей исправной копии.
+"""
 import json
 import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
 
 # Константы по умолчанию
 DEFAULT_PLANNED_WORK = [
@@ -12,65 +42,329 @@ DEFAULT_PLANNED_WORK = [
 # ИЗМЕНЕНО: допуск теперь 10% (в процентах)
 DEFAULT_ALLOWANCE = 10
 
-# Глобальные переменные
-PLANNED_WORK = []
-ALLOWANCE = DEFAULT_ALLOWANCE
+# Как и база, файл лежит рядом с программой, а не в текущем каталоге
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'car_config.json')
+BACKUP_COUNT = 3  # car_config.json.1 (самая свежая) ... car_config.json.3
+
+# Неизменяемый снимок настроек; version растёт при каждом изменении
+ConfigSnapshot = namedtuple('ConfigSnapshot', 'version planned_work allowance')
 
-CONFIG_FILE = 'car_config.json'
 
+def normalize_plan(planned_work):
+    """План как кортеж (работа, км, месяцы); у записей [работа, км] месяцев нет"""
+    normalized = []
+    for item in planned_work:
+        work, period, *rest = item
+        if len(rest) > 1:
+            raise ValueError(f"Лишние поля в процедуре: {work!r}")
+        normalized.append((work, period, rest[0] if rest else None))
+    return tuple(normalized)
 
-def save_config(planned_work=None, allowance=None):
-    """Сохраняет конфигурацию в JSON файл"""
-    global PLANNED_WORK, ALLOWANCE
 
-    # Используем переданные значения или текущие
-    work_to_save = planned_work if planned_work is not None else PLANNED_WORK
-    allowance_to_save = allowance if allowance is not None else ALLOWANCE
+def _positive_int(text):
+    """Целое > 0 из строки ("15 000" тоже), иначе None"""
+    try:
+        value = int(text.replace(" ", "").replace("\u00a0", ""))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def validate_plan_rows(rows):
+    """Проверяет строки редактора плана за один проход.
 
-    config = {
-        'PLANNED_WORK': work_to_save,
-        'ALLOWANCE': allowance_to_save
-    }
+    rows — [(работа, км, месяцы)] строками, как их ввёл пользователь;
+    строки без названия пропускаются, пустые месяцы — только по пробегу.
+    Возвращает (план [(работа, км, месяцы|None)], ошибки [(номер строки,
+    текст)]) — ошибки собираются по всем строкам сразу.
+    """
+    planned_work, errors, seen = [], [], {}
+    for index, (work, period, months) in enumerate(rows):
+        work = work.strip()
+        if not work:
+            continue
+        problems = []
+        if work in seen:
+            problems.append(f"повторяет строку {seen[work] + 1}")
+        else:
+            seen[work] = index
+        period = _positive_int(period)
+        if period is None:
+            problems.append("некорректный интервал (км)")
+        months = months.strip()
+        if months:
+            months = _positive_int(months)
+            if months is None:
+                problems.append("некорректный интервал в месяцах")
+        else:
+            months = None
+        if problems:
+            errors.append((index, f"{work}: {', '.join(problems)}"))
+        else:
+            planned_work.append((work, period, months))
+    return planned_work, errors
 
+
+def read_config_file(path):
+    """Читает и проверяет файл настроек, возвращает (план, допуск).
+
+    Обрезанный или испорченный файл вызывает ValueError (json.JSONDecodeError
+    тоже его подкласс).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("Настройки должны быть объектом JSON")
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        planned_work = normalize_plan(config.get('PLANNED_WORK', DEFAULT_PLANNED_WORK))
+    except (TypeError, ValueError):
+        raise ValueError("Некорректный список PLANNED_WORK")
+    for work, period, months in planned_work:
+        if (not isinstance(work, str) or not isinstance(period, int)
+                or not (months is None or isinstance(months, int) and months > 0)):
+            raise ValueError(f"Некорректная процедура: {work!r}")
+    allowance = config.get('ALLOWANCE', DEFAULT_ALLOWANCE)
+    if not isinstance(allowance, (int, float)):
+        raise ValueError(f"Некорректный допуск: {allowance!r}")
+    return planned_work, allowance
 
-        # Обновляем глобальные переменные
-        PLANNED_WORK[:] = work_to_save
-        ALLOWANCE = allowance_to_save
 
-        return True
-    except Exception as e:
-        print(f"Ошибка сохранения конфигурации: {e}")
-        return False
+def backup_path(path, number):
+    return f"{path}.{number}"
 
 
-def load_config():
-    """Загружает конфигурацию из JSON файла"""
-    global PLANNED_WORK, ALLOWANCE
+def read_settings(path=CONFIG_FILE, backup_count=BACKUP_COUNT):
+    """(план, допуск) из файла, а если он не читается — из самой свежей
+    исправной копии; настройки по умолчанию, если нет ни того, ни другого.
+    Ничего не записывает и не создаёт."""
+    for candidate in [path] + [backup_path(path, number)
+                               for number in range(1, backup_count + 1)]:
+        try:
+            return read_config_file(candidate)
+        except (OSError, ValueError):
+            continue
+    return normalize_plan(DEFAULT_PLANNED_WORK), DEFAULT_ALLOWANCE
+
+
+def rotate_backups(path, count=BACKUP_COUNT):
+    """Сдвигает резервные копии (.1 -> .2 ...) и копирует текущий файл в .1.
+
+    Испорченный текущий файл в копии не попадает, чтобы не вытеснить
+    исправные. Недописанная копия при чтении просто пропускается.
+    """
+    if count <= 0:
+        return
+    try:
+        read_config_file(path)
+    except (OSError, ValueError):
+        return
+    for number in range(count - 1, 0, -1):
+        if os.path.exists(backup_path(path, number)):
+            os.replace(backup_path(path, number), backup_path(path, number + 1))
+    shutil.copyfile(path, backup_path(path, 1))
 
-    if not os.path.exists(CONFIG_FILE):
-        # Если файла нет, сохраняем настройки по умолчанию
-        PLANNED_WORK[:] = DEFAULT_PLANNED_WORK[:]
-        ALLOWANCE = DEFAULT_ALLOWANCE
-        save_config()
-        return True
 
+def _fsync_directory(path):
+    """Закрепляет на диске переименование файла (на Windows не нужно)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
     try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, data, backup_count=0):
+    """Записывает байты во временный файл рядом, fsync и переименовывает.
+
+    Резервные копии сдвигаются только после того, как новые данные уже на
+    диске. При сбое на любом шаге старый файл остаётся нетронутым.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        rotate_backups(path, backup_count)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(path)
+
 
-        PLANNED_WORK[:] = config.get('PLANNED_WORK', DEFAULT_PLANNED_WORK)
-        ALLOWANCE = config.get('ALLOWANCE', DEFAULT_ALLOWANCE)
+def remove_stale_temp_files(path, max_age=60):
+    """Удаляет временные файлы, оставшиеся после аварийного завершения.
+
+    Свежие не трогаем: их может прямо сейчас дописывать другой процесс.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = os.path.basename(path) + '.'
+    now = time.time()
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.tmp'):
+            tmp_path = os.path.join(directory, name)
+            try:
+                if now - os.path.getmtime(tmp_path) > max_age:
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class ConfigService:
+    def __init__(self, path=CONFIG_FILE, watch_interval=1.0, backup_count=BACKUP_COUNT):
+        self.path = path
+        self.backup_count = backup_count
+        # Как часто snapshot() проверяет файл на диске, секунд. None — не
+        # проверять: тогда check_for_changes() вызывает владелец (окно Tk)
+        self.watch_interval = watch_interval
+        self._snapshot = None
+        self._stat = None
+        self._checked = 0.0
+        self._subscribers = []
+        self._lock = threading.RLock()
+
+    def snapshot(self):
+        """Текущие настройки; файл не перечитывается, если он не менялся"""
+        if self._snapshot is None:
+            self.reload()
+        elif (self.watch_interval is not None
+              and time.monotonic() - self._checked >= self.watch_interval):
+            self.check_for_changes()
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """callback(snapshot) вызывается после каждого изменения настроек
+        в потоке, который это изменение обнаружил. Возвращает функцию отписки."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    # Хранилище настроек. Подкласс с другим хранилищем (см. plan.py)
+    # переопределяет _prepare, _source_stat, _read, _initial, _write и _recover
+
+    def _prepare(self):
+        remove_stale_temp_files(self.path)
+
+    def _source_stat(self):
+        """Метка состояния хранилища: изменилась — пора перечитать"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self):
+        """(план, допуск) или None, если настройки ещё не сохранялись"""
+        if not os.path.exists(self.path):
+            return None
+        return read_config_file(self.path)
+
+    def _initial(self):
+        """Настройки, которые сохраняются, если хранилище пусто"""
+        return DEFAULT_PLANNED_WORK, DEFAULT_ALLOWANCE
+
+    def check_for_changes(self):
+        """Перечитывает настройки, если изменилась метка хранилища"""
+        self._checked = time.monotonic()
+        if self._snapshot is not None and self._source_stat() == self._stat:
+            return False
+        self.reload()
+        return True
+
+    def reload(self):
+        """Загружает конфигурацию из хранилища"""
+        with self._lock:
+            self._checked = time.monotonic()
+            if self._snapshot is None:
+                self._prepare()
+
+            stat = self._source_stat()
+            try:
+                loaded = self._read()
+            except (OSError, ValueError) as e:
+                print(f"Ошибка загрузки конфигурации: {e}")
+                self._stat = stat
+                if self._snapshot is not None:
+                    return False  # оставляем действующие настройки
+                return self._recover()
+
+            if loaded is None:
+                # Если файла нет, сохраняем настройки по умолчанию
+                return self.update(*self._initial())
+            self._stat = stat
+        self._publish(*loaded)
         return True
-    except Exception as e:
-        print(f"Ошибка загрузки конфигурации: {e}")
+
+    def _recover(self):
+        """Восстанавливает настройки из самой свежей исправной резервной копии"""
+        for number in range(1, self.backup_count + 1):
+            try:
+                planned_work, allowance = read_config_file(backup_path(self.path, number))
+            except (OSError, ValueError):
+                continue
+            print(f"Настройки восстановлены из {backup_path(self.path, number)}")
+            # Испорченный файл заменяется копией; резервные копии не сдвигаются
+            self._write(planned_work, allowance, rotate=False)
+            self._publish(planned_work, allowance)
+            return False
+
         # Используем значения по умолчанию при ошибке
-        PLANNED_WORK[:] = DEFAULT_PLANNED_WORK[:]
-        ALLOWANCE = DEFAULT_ALLOWANCE
+        self._publish(normalize_plan(DEFAULT_PLANNED_WORK), DEFAULT_ALLOWANCE)
         return False
 
+    def _write(self, planned_work, allowance, rotate=True):
+        config = {
+            'PLANNED_WORK': [[work, period] if months is None else [work, period, months]
+                             for work, period, months in planned_work],
+            'ALLOWANCE': allowance
+        }
+        data = json.dumps(config, ensure_ascii=False, indent=2).encode('utf-8')
+        try:
+            write_atomic(self.path, data, self.backup_count if rotate else 0)
+        except OSError as e:
+            print(f"Ошибка сохранения конфигурации: {e}")
+            return False
+        self._stat = self._source_stat()
+        return True
+
+    def update(self, planned_work=None, allowance=None):
+        """Сохраняет конфигурацию и рассылает новый снимок"""
+        with self._lock:
+            current = self._snapshot
+            # Используем переданные значения или текущие
+            if planned_work is None:
+                planned_work = current.planned_work if current else DEFAULT_PLANNED_WORK
+            if allowance is None:
+                allowance = current.allowance if current else DEFAULT_ALLOWANCE
+            planned_work = normalize_plan(planned_work)
+            if not self._write(planned_work, allowance):
+                return False
+        self._publish(planned_work, allowance)
+        return True
+
+    def _version(self, current):
+        return current.version + 1 if current else 1
 
-# При импорте загружаем конфигурацию
-load_config()
+    def _publish(self, planned_work, allowance):
+        with self._lock:
+            current = self._snapshot
+            if current is not None and (current.planned_work, current.allowance) == (
+                    planned_work, allowance):
+                return
+            version = self._version(current)
+            snapshot = self._snapshot = ConfigSnapshot(version, planned_work, allowance)
+            subscribers = list(self._subscribers)
+        if current is not None:
+            for callback in subscribers:
+                callback(snapshot)
@@ -0,0 +1,110 @@
+# connection.py
+"""Управление соединениями SQLite.
+
+База открывается по абсолютному пути в режиме WAL: читатели (история,
+проверка состояния) не ждут писателя, а писатель — читателей. Каждый
+поток получает своё соединение из пула; соединения освободившихся
+потоков используются повторно.
+"""
+import os
+import sqlite3
+import threading
+
+# По умолчанию база лежит рядом с программой, а не в текущем каталоге
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'car_logger.db')
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",   # в режиме WAL не теряет целостность при сбое
+    "PRAGMA cache_size = -16000",    # 16 МБ кэша страниц на соединение
+    "PRAGMA mmap_size = 268435456",  # чтение файла через отображение в память (256 МБ)
+    "PRAGMA temp_store = MEMORY",
+)
+
+BUSY_TIMEOUT = 5.0  # секунд ожидания блокировки записи
+
+
+class ConnectionPool:
+    def __init__(self, path=DEFAULT_DB_PATH, pragmas=PRAGMAS):
+        self.memory = path == ':memory:'
+        self.path = path if self.memory else os.path.abspath(path)
+        self.pragmas = pragmas
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.idle = []         # соединения, освобождённые потоками
+        self.connections = []  # все открытые соединения
+
+    def _open(self):
+        # Соединение может перейти к другому потоку после release(),
+        # поэтому проверку потока отключаем: один поток — одно соединение
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        if not self.memory:
+            for pragma in self.pragmas:
+                conn.execute(pragma)
+        return conn
+
+    def connection(self):
+        """Соединение текущего потока"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        with self.lock:
+            if self.memory and self.connections:
+                # База в памяти существует только внутри одного соединения;
+                # потоки получают его общим, поэтому обращаться к такой базе
+                # можно только из одного потока за раз (DatabaseWorker её не принимает)
+                conn = self.connections[0]
+            elif self.idle:
+                conn = self.idle.pop()
+            else:
+                conn = self._open()
+                self.connections.append(conn)
+        self.local.conn = conn
+        return conn
+
+    def release(self):
+        """Возвращает соединение текущего потока в пул"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        self.local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            if not self.memory:
+                self.idle.append(conn)
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+            self.idle.clear()
+        self.local = threading.local()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DEFAULT_DB_PATH, pragmas=PRAGMAS):
+    """Общий пул для файла базы: все объекты Database одного файла делят его.
+
+    pragmas учитываются только при создании пула.
+    """
+    if path == ':memory:':
+        return ConnectionPool(path, pragmas)
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key, pragmas)
+        return pool
+
+
+def close_pool(pool):
+    with _pools_lock:
+        if _pools.get(pool.path) is pool:
+            del _pools[pool.path]
+    pool.close()
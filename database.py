@@ -1,67 +1,743 @@
+import calendar
+import datetime
+import re
 import sqlite3
-from config import PLANNED_WORK, ALLOWANCE
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+from connection import DEFAULT_DB_PATH, PRAGMAS, get_pool, close_pool
+from migrations import migrate
+from config import normalize_plan
+from plan import PlanService
+
+DEFAULT_VEHICLE_ID = 1  # автомобиль, к которому относятся записи без явного выбора
+SEARCH_WORD = re.compile(r"\w+")
+SEARCH_RANK_LIMIT = 20000  # совпадений, которые ещё сортируются по релевантности
+CHECK_CACHE_SIZE = 128  # результатов check_services в памяти (по автомобилю и версиям)
+DAYS_PER_MONTH = 30  # для допуска по сроку в месяцах
+
+
+def add_months(date, months):
+    """Дата ГГГГ-ММ-ДД плюс months месяцев. Если такого числа в месяце нет,
+    берётся последний день: 31 января + 1 месяц = 28 (29) февраля."""
+    date = datetime.date.fromisoformat(date)
+    year, month = divmod(date.year * 12 + date.month - 1 + months, 12)
+    day = min(date.day, calendar.monthrange(year, month + 1)[1])
+    return datetime.date(year, month + 1, day).isoformat()
+
+
+def service_date_cutoff(day, months, allowance=0):
+    """Самая поздняя дата последнего ТО, при которой работа с интервалом
+    months месяцев уже требуется на дату day (с допуском allowance %).
+
+    add_months(дата ТО, months) - допуск <= day  <=>  дата ТО <= результат,
+    поэтому при проверке многих автомобилей каждая дата только сравнивается
+    со строкой, без вычислений с датами для каждой строки.
+    """
+    day = datetime.date.fromisoformat(day)
+    day += datetime.timedelta(days=int(months * DAYS_PER_MONTH * allowance / 100))
+    cutoff = datetime.date.fromisoformat(add_months(day.isoformat(), -months))
+    if day.day == calendar.monthrange(day.year, day.month)[1]:
+        # day — последний день месяца: в него попадают и сроки от более
+        # поздних чисел (31 января + 1 месяц = 28 февраля)
+        cutoff = cutoff.replace(day=calendar.monthrange(cutoff.year, cutoff.month)[1])
+    return cutoff.isoformat()
+
+
+def search_expression(text):
+    """Запрос FTS5 из введённого текста: все слова, каждое как начало слова.
+
+    "торм колод" -> '"торм"* AND "колод"*'. Возвращает None, если в тексте
+    нет ни одного слова. Слова берутся в кавычки, поэтому операторы
+    FTS5 (AND, OR, NEAR, *) во введённом тексте ищутся как обычные слова.
+    """
+    words = SEARCH_WORD.findall(text)
+    if not words:
+        return None
+    return " AND ".join(f'"{word}"*' for word in words)
 
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('car_logger.db')
-        self.create_table()
+    def __init__(self, path=DEFAULT_DB_PATH, pragmas=PRAGMAS):
+        # Файл открывается и обновляется при первом запросе, а не здесь
+        self.pool = get_pool(path, pragmas)
+        self._work_ids = {}  # кэш справочника работ: название -> ID
+        self._ready = False
+        self._lock = threading.RLock()
+        self.plan = PlanService(self)  # план ТО и допуск с историей изменений
+
+        # Кэш check_services: (автомобиль, версия плана, версии данных) -> результат.
+        # Версии данных — счётчики записей через этот объект (общий и по
+        # автомобилям) и PRAGMA data_version для изменений из других соединений
+        self._checks = OrderedDict()
+        self._check_hits = 0
+        self._check_misses = 0
+        self._data_version = 0
+        self._vehicle_versions = {}
+        self._seen_data_versions = {}  # соединение -> последнее PRAGMA data_version
+
+    @property
+    def conn(self):
+        """Соединение текущего потока (у каждого потока своё)"""
+        conn = self.pool.connection()
+        if not self._ready:
+            self._prepare(conn)
+        return conn
+
+    def _prepare(self, conn):
+        """Миграции и справочник работ плана — один раз, при первом запросе"""
+        with self._lock:
+            if self._ready:
+                return
+            migrate(conn)
+            self._ready = True
+        # План читается после снятия блокировки: PlanService.reload() держит
+        # свою блокировку и обращается к self.conn, поэтому при обратном
+        # порядке потоки ждали бы друг друга бесконечно
+        planned_work = self.plan.snapshot().planned_work
+        self.get_work_ids([work for work, _, _ in planned_work])
+
+    def data_changed(self, vehicle_id=None):
+        """Отмечает изменение журнала автомобиля (None — любых данных).
+
+        Методы Database вызывают его сами после commit; при записи напрямую
+        через db.conn его нужно вызвать вручную, иначе check_services может
+        вернуть результат из кэша. Проверка, начатая до commit, сохранит
+        результат под старой версией, и он больше не будет выдан.
+        """
+        with self._lock:
+            if vehicle_id is None:
+                self._data_version += 1
+            else:
+                self._vehicle_versions[vehicle_id] = self._vehicle_versions.get(vehicle_id, 0) + 1
+
+    def _data_versions(self, vehicle_id):
+        """Версии данных для ключа кэша проверки"""
+        conn = self.conn
+        # data_version меняется, когда базу изменило другое соединение
+        # (другой поток или процесс); свои изменения учитывает data_changed()
+        external = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            if self._seen_data_versions.get(conn) != external:
+                # Новое соединение тоже сбрасывает кэш: что изменилось
+                # до его открытия, неизвестно
+                self._seen_data_versions[conn] = external
+                self._data_version += 1
+            return self._data_version, self._vehicle_versions.get(vehicle_id, 0)
+
+    def check_cache_info(self):
+        """Статистика кэша проверок: {'hits', 'misses', 'size', 'maxsize'}"""
+        with self._lock:
+            return {'hits': self._check_hits, 'misses': self._check_misses,
+                    'size': len(self._checks), 'maxsize': CHECK_CACHE_SIZE}
+
+    def clear_check_cache(self):
+        with self._lock:
+            self._checks.clear()
+            self._check_hits = self._check_misses = 0
 
     def create_table(self):
+        """Создаёт или обновляет схему через миграции"""
+        migrate(self.conn)
+
+    def get_work_ids(self, names, commit=True):
+        """Возвращает {название работы: ID}, добавляя новые работы в справочник.
+
+        commit=False — новые работы остаются в транзакции вызывающего; при
+        её откате нужен rollback(), чтобы забыть их ID.
+        """
+        missing = [name for name in names if name not in self._work_ids]
+        if missing:
+            cursor = self.conn.cursor()
+            for name in missing:
+                # OR IGNORE: работу мог одновременно добавить другой поток
+                cursor.execute("INSERT OR IGNORE INTO works (name) VALUES (?)", (name,))
+                inserted = cursor.rowcount == 1
+                cursor.execute("SELECT id FROM works WHERE name = ?", (name,))
+                work_id = cursor.fetchone()[0]
+                if inserted:
+                    # Записи, внесённые раньше, чем работа попала в план
+                    cursor.execute(
+                        "UPDATE logs SET work_id = ? WHERE description = ? AND work_id IS NULL",
+                        (work_id, name)
+                    )
+                self._work_ids[name] = work_id
+            if commit:
+                self.conn.commit()
+                self.data_changed()
+        return {name: self._work_ids[name] for name in names}
+
+    def rename_work(self, old_name, new_name):
+        """Переименовывает работу, сохраняя связь с историей обслуживания"""
+        self.rename_works({old_name: new_name})
+
+    def rename_works(self, renames, commit=True):
+        """Переименовывает работы {старое название: новое}, сохраняя связь
+        с историей обслуживания.
+
+        Все переименования — одна транзакция по ID работ. Сначала работы
+        получают временные названия, поэтому цепочка (A -> B, B -> C) или
+        обмен названиями не смешивают истории. Истории объединяются, только
+        если новое название занято работой, которая сама не переименовывается.
+        commit=False — в транзакции вызывающего (новая версия плана, см. plan.py).
+        """
+        renames = {old: new for old, new in renames.items() if old != new}
+        if not renames:
+            return
+        try:
+            old_ids = self.get_work_ids(list(renames), commit=False)
+            cursor = self.conn.cursor()
+            for old_name in renames:
+                cursor.execute("UPDATE works SET name = ? WHERE id = ?",
+                               (f"\x01переименование {old_ids[old_name]}", old_ids[old_name]))
+            for old_name, new_name in renames.items():
+                old_id = old_ids[old_name]
+                cursor.execute("SELECT id FROM works WHERE name = ?", (new_name,))
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("UPDATE works SET name = ? WHERE id = ?", (new_name, old_id))
+                    continue
+                # Работа с таким названием уже есть — объединяем истории
+                cursor.execute("UPDATE logs SET work_id = ? WHERE work_id = ?", (row[0], old_id))
+                cursor.execute(
+                    "UPDATE OR REPLACE vehicle_plan SET work_id = ? WHERE work_id = ?",
+                    (row[0], old_id))
+                cursor.execute("UPDATE plan_items SET work_id = ? WHERE work_id = ?",
+                               (row[0], old_id))
+                cursor.execute("DELETE FROM works WHERE id = ?", (old_id,))
+        except Exception:
+            self.rollback()
+            raise
+        self._work_ids.clear()
+        if commit:
+            self.conn.commit()
+            self.data_changed()
+
+    def rollback(self):
+        """Откатывает транзакцию текущего потока и забывает ID работ из неё"""
+        self.conn.rollback()
+        self._work_ids.clear()
+
+    def add_vehicle(self, name, mileage=0):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mileage INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                type TEXT NOT NULL,
-                description TEXT NOT NULL
-            )
-        ''')
+        cursor.execute(
+            "INSERT INTO vehicles (name, mileage) VALUES (?, ?)", (name, mileage))
         self.conn.commit()
+        return cursor.lastrowid
 
-    def add_record(self, mileage, date, type_, description):
+    def get_vehicles(self):
+        """Возвращает [(id, название, текущий пробег)]"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, name, mileage FROM vehicles ORDER BY id")
+        return cursor.fetchall()
+
+    def set_vehicle_mileage(self, vehicle_id, mileage):
         cursor = self.conn.cursor()
         cursor.execute(
-            "INSERT INTO logs (mileage, date, type, description) VALUES (?, ?, ?, ?)",
-            (mileage, date, type_, description)
+            "UPDATE vehicles SET mileage = ? WHERE id = ?", (mileage, vehicle_id))
+        self.conn.commit()
+
+    def get_vehicle_plan(self, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Собственный план автомобиля [(работа, км, месяцы)] или [] для общего плана"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT works.name, vehicle_plan.period, vehicle_plan.months FROM vehicle_plan "
+            "JOIN works ON works.id = vehicle_plan.work_id "
+            "WHERE vehicle_plan.vehicle_id = ? ORDER BY vehicle_plan.position",
+            (vehicle_id,)
+        )
+        return cursor.fetchall()
+
+    def set_vehicle_plan(self, vehicle_id, planned_work):
+        """Задаёт собственный план автомобиля; пустой план — вернуться к общему.
+
+        Процедуры — (работа, км) или (работа, км, месяцы).
+        """
+        planned_work = normalize_plan(planned_work)
+        work_ids = self.get_work_ids([work for work, _, _ in planned_work])
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM vehicle_plan WHERE vehicle_id = ?", (vehicle_id,))
+        cursor.executemany(
+            "INSERT OR REPLACE INTO vehicle_plan "
+            "(vehicle_id, work_id, period, months, position) VALUES (?, ?, ?, ?, ?)",
+            [(vehicle_id, work_ids[work], period, months, position)
+             for position, (work, period, months) in enumerate(planned_work)]
+        )
+        self.conn.commit()
+        self.data_changed(vehicle_id)
+
+    def add_record(self, mileage, date, type_, description,
+                   vehicle_id=DEFAULT_VEHICLE_ID):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """INSERT INTO logs (mileage, date, type, description, work_id, vehicle_id)
+               VALUES (?, ?, ?, ?, (SELECT id FROM works WHERE name = ?), ?)""",
+            (mileage, date, type_, description, description, vehicle_id)
+        )
+        # Текущий пробег автомобиля — наибольший из внесённых
+        cursor.execute(
+            "UPDATE vehicles SET mileage = MAX(mileage, ?) WHERE id = ?",
+            (mileage, vehicle_id)
         )
         self.conn.commit()
+        self.data_changed(vehicle_id)
         return cursor.lastrowid
 
-    def get_all_records(self):
+    def add_records(self, records, batch_size=1000, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Добавляет записи (mileage, date, type, description) пачками.
+
+        Каждая пачка из batch_size строк вставляется одним executemany
+        в одной транзакции. Возвращает количество добавленных записей.
+        """
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM logs ORDER BY date DESC, mileage DESC")
-        return cursor.fetchall()
+        sql = ("INSERT INTO logs (mileage, date, type, description, work_id, vehicle_id) "
+               "VALUES (?, ?, ?, ?, (SELECT id FROM works WHERE name = ?), ?)")
+        added = 0
+        batch = []
+
+        def flush():
+            try:
+                cursor.executemany(sql, batch)
+                cursor.execute(
+                    "UPDATE vehicles SET mileage = MAX(mileage, ?) WHERE id = ?",
+                    (max(row[0] for row in batch), vehicle_id)
+                )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.data_changed(vehicle_id)
+
+        for mileage, date, type_, description in records:
+            batch.append((mileage, date, type_, description, description, vehicle_id))
+            if len(batch) >= batch_size:
+                flush()
+                added += len(batch)
+                batch.clear()
+        if batch:
+            flush()
+            added += len(batch)
+        return added
 
-    def get_last_service(self, description):
+    def get_records_page(self, limit=100, after=None, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Возвращает страницу истории и курсор для следующей страницы.
+
+        Страницы идут по ключу (date, mileage, id) в обратном порядке, поэтому
+        стоимость запроса не зависит от того, насколько далеко пролистана
+        история. after — курсор, полученный с предыдущей страницей; курсор
+        None означает, что записей больше нет.
+        """
+        cursor = self.conn.cursor()
+        if after is None:
+            cursor.execute(
+                "SELECT id, mileage, date, type, description FROM logs "
+                "WHERE vehicle_id = ? "
+                "ORDER BY date DESC, mileage DESC, id DESC LIMIT ?",
+                (vehicle_id, limit)
+            )
+        else:
+            cursor.execute(
+                "SELECT id, mileage, date, type, description FROM logs "
+                "WHERE vehicle_id = ? AND (date, mileage, id) < (?, ?, ?) "
+                "ORDER BY date DESC, mileage DESC, id DESC LIMIT ?",
+                (vehicle_id, *after, limit)
+            )
+        rows = cursor.fetchall()
+        if len(rows) < limit:
+            return rows, None
+        last = rows[-1]
+        return rows, (last[2], last[1], last[0])
+
+    def get_records_before(self, limit=100, before=None, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Записи истории перед курсором before (date, mileage, id) — для
+        прокрутки вверх; before=None — последние записи журнала (End).
+
+        Записи читаются по ключу в прямом порядке и возвращаются в порядке
+        истории (от новых к старым); стоимость не зависит от позиции.
+        """
+        cursor = self.conn.cursor()
+        if before is None:
+            cursor.execute(
+                "SELECT id, mileage, date, type, description FROM logs "
+                "WHERE vehicle_id = ? "
+                "ORDER BY date, mileage, id LIMIT ?",
+                (vehicle_id, limit)
+            )
+        else:
+            cursor.execute(
+                "SELECT id, mileage, date, type, description FROM logs "
+                "WHERE vehicle_id = ? AND (date, mileage, id) > (?, ?, ?) "
+                "ORDER BY date, mileage, id LIMIT ?",
+                (vehicle_id, *before, limit)
+            )
+        rows = cursor.fetchall()
+        rows.reverse()
+        return rows
+
+    def count_records(self, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Число записей автомобиля из сводной таблицы record_counts (триггеры)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT records FROM record_counts WHERE vehicle_id = ?", (vehicle_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def get_records_slice(self, offset, limit, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Возвращает записи истории с позиции offset (для перехода по прокрутке).
+
+        OFFSET пропускает записи по одной, поэтому во второй половине
+        журнала они отсчитываются с конца в обратном порядке: End и переход
+        к 90% стоят столько же, сколько Home и 10%. Число записей для отсчёта
+        читается в том же запросе, чтобы оно не разошлось с журналом.
+        """
+        cursor = self.conn.cursor()
+        if offset * 2 <= self.count_records(vehicle_id):
+            cursor.execute(
+                "SELECT id, mileage, date, type, description FROM logs "
+                "WHERE vehicle_id = ? "
+                "ORDER BY date DESC, mileage DESC, id DESC LIMIT ? OFFSET ?",
+                (vehicle_id, limit, offset)
+            )
+            return cursor.fetchall()
+        total = "(SELECT records FROM record_counts WHERE vehicle_id = ?)"
+        cursor.execute(
+            "SELECT id, mileage, date, type, description FROM logs "
+            "WHERE vehicle_id = ? ORDER BY date, mileage, id "
+            f"LIMIT MAX(0, MIN(?, {total} - ?)) OFFSET MAX(0, {total} - ? - ?)",
+            (vehicle_id, limit, vehicle_id, offset, vehicle_id, offset, limit)
+        )
+        rows = cursor.fetchall()
+        rows.reverse()
+        return rows
+
+    def _search(self, sql, params):
+        # Запросы поиска пишутся как logs_fts CROSS JOIN logs: иначе планировщик
+        # может перебирать журнал по vehicle_id и вызывать MATCH для каждой записи
+        try:
+            return self.conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if "no such table: logs_fts" in str(e):
+                raise RuntimeError("Поиск недоступен: SQLite собран без FTS5")
+            raise
+
+    def search_ranked(self, text):
+        """Сортировать ли результаты поиска по релевантности (bm25).
+
+        Да, если совпадений не больше SEARCH_RANK_LIMIT; для короткого
+        префикса вроде "за" bm25 пришлось бы считать для каждого совпадения.
+        Совпадения считаются только до порога, поэтому решение не зависит
+        от размера журнала.
+        """
+        expression = search_expression(text)
+        if expression is None:
+            return True
+        matches = self._search(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM logs_fts WHERE logs_fts MATCH ? LIMIT ?)",
+            (expression, SEARCH_RANK_LIMIT + 1)
+        ).fetchone()[0]
+        return matches <= SEARCH_RANK_LIMIT
+
+    def search_records(self, text, limit=100, offset=0, vehicle_id=DEFAULT_VEHICLE_ID,
+                       ranked=None):
+        """Ищет записи, в описании которых есть слова, начинающиеся с введённых.
+
+        Результаты упорядочены по релевантности (bm25), при равной — от новых
+        к старым; limit и offset задают страницу. Регистр не важен. Если
+        совпадений слишком много (см. search_ranked), результаты идут просто
+        от последних внесённых записей. ranked — уже выбранный порядок
+        (search_ranked), чтобы не выбирать его заново для каждой страницы.
+        """
+        expression = search_expression(text)
+        if expression is None:
+            return []
+        if ranked is None:
+            ranked = self.search_ranked(text)
+        if ranked:
+            order = "logs_fts.rank, logs.date DESC, logs.mileage DESC, logs.id DESC"
+        else:
+            order = "logs_fts.rowid DESC"
+        return self._search(
+            "SELECT logs.id, logs.mileage, logs.date, logs.type, logs.description "
+            "FROM logs_fts CROSS JOIN logs ON logs.id = logs_fts.rowid "
+            "WHERE logs_fts MATCH ? AND logs.vehicle_id = ? "
+            f"ORDER BY {order} LIMIT ? OFFSET ?",
+            (expression, vehicle_id, limit, offset)
+        ).fetchall()
+
+    def count_search(self, text, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Число записей, которые найдёт search_records"""
+        expression = search_expression(text)
+        if expression is None:
+            return 0
+        return self._search(
+            "SELECT COUNT(*) FROM logs_fts CROSS JOIN logs ON logs.id = logs_fts.rowid "
+            "WHERE logs_fts MATCH ? AND logs.vehicle_id = ?",
+            (expression, vehicle_id)
+        ).fetchone()[0]
+
+    def iter_records(self, chunk_size=500, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Перебирает историю постранично, не загружая её целиком"""
+        after = None
+        while True:
+            rows, after = self.get_records_page(chunk_size, after, vehicle_id)
+            yield from rows
+            if after is None:
+                break
+
+    def iter_record_chunks(self, chunk_size=10000):
+        """Отдаёт весь журнал (всех автомобилей) блоками по chunk_size записей.
+
+        Курсор читает таблицу по мере выборки (fetchmany), поэтому в памяти
+        одновременно находится только один блок.
+        """
         cursor = self.conn.cursor()
         cursor.execute(
-            "SELECT mileage FROM logs WHERE description = ? ORDER BY mileage DESC LIMIT 1",
-            (description,)
+            "SELECT id, vehicle_id, mileage, date, type, description FROM logs ORDER BY id")
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def get_all_records(self, vehicle_id=DEFAULT_VEHICLE_ID):
+        return list(self.iter_records(vehicle_id=vehicle_id))
+
+    def get_last_service(self, description, vehicle_id=DEFAULT_VEHICLE_ID):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT mileage FROM last_service "
+            "WHERE vehicle_id = ? AND work_id = (SELECT id FROM works WHERE name = ?)",
+            (vehicle_id, description)
         )
         result = cursor.fetchone()
         return result[0] if result else 0
 
-    def check_services(self, current_mileage):
-        results = []
-        for work_desc, period in PLANNED_WORK:
-            last_mileage = self.get_last_service(work_desc)
-            next_service = last_mileage + period
-            admission = int(period * ALLOWANCE / 100)
+    def get_last_services(self, planned_work, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Возвращает [(работа, км, месяцы, пробег последнего ТО, дата последнего ТО)]
+        одним запросом; для работ, которые не выполнялись, пробег 0 и дата None."""
+        if not planned_work:
+            return []
+
+        # План передаётся как таблица VALUES с целыми ID работ, поэтому все
+        # работы проверяются одним запросом к сводной таблице last_service,
+        # которую триггеры поддерживают в актуальном состоянии
+        work_ids = self.get_work_ids([work_desc for work_desc, _, _ in planned_work])
+        values = ", ".join("(?, ?)" for _ in planned_work)
+        params = []
+        for position, (work_desc, _, _) in enumerate(planned_work):
+            params.extend((position, work_ids[work_desc]))
+        params.append(vehicle_id)
+
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            WITH plan(position, work_id) AS (VALUES {values})
+            SELECT plan.position, COALESCE(last_service.mileage, 0), last_service.date
+            FROM plan
+            LEFT JOIN last_service
+                ON last_service.vehicle_id = ? AND last_service.work_id = plan.work_id
+            ORDER BY plan.position
+        """, params)
+        return [planned_work[position] + (last_mileage, last_date)
+                for position, last_mileage, last_date in cursor.fetchall()]
+
+    def check_services(self, current_mileage, vehicle_id=DEFAULT_VEHICLE_ID, date=None):
+        """Работы, которые пора выполнить, на дату date (ГГГГ-ММ-ДД, по умолчанию
+        сегодня) по плану и допуску, действовавшим на эту дату.
+
+        Возвращает [(работа, последнее ТО (км), следующее ТО (км), статус,
+        срок по времени или None)]. Работа с интервалом в месяцах требуется,
+        когда наступит любой из сроков — по пробегу или по дате (если работа
+        ещё не выполнялась, срока по дате нет); допуск действует для обоих.
+
+        Результаты кэшируются (см. check_cache_info): пока не изменились план
+        и журнал автомобиля, повторная проверка не обращается к базе.
+        """
+        today = date or datetime.date.today().isoformat()
+        # Один снимок настроек на всю проверку: план и допуск согласованы
+        settings = self.plan.snapshot() if date is None else self.plan.at(date)
+        # Версии читаются до запроса: если журнал изменится во время проверки,
+        # результат окажется под устаревшим ключом
+        key = (vehicle_id, settings.version) + self._data_versions(vehicle_id)
+        with self._lock:
+            entry = self._checks.get(key)
+            if entry is not None:
+                self._checks.move_to_end(key)
+                self._check_hits += 1
+            else:
+                self._check_misses += 1
+
+        if entry is None:
+            planned_work = self.get_vehicle_plan(vehicle_id) or settings.planned_work
+            services = []
+            for (work_desc, period, months, last_mileage,
+                 last_date) in self.get_last_services(planned_work, vehicle_id):
+                next_service = last_mileage + period
+                admission = int(period * settings.allowance / 100)
+                due_date = soon_date = None
+                if months is not None and last_date is not None:
+                    due_date = add_months(last_date, months)
+                    soon_date = (datetime.date.fromisoformat(due_date) - datetime.timedelta(
+                        days=int(months * DAYS_PER_MONTH * settings.allowance / 100))).isoformat()
+                services.append((work_desc, last_mileage, next_service, next_service - admission,
+                                 due_date, soon_date))
+            # Статус меняется только на этих порогах пробега и дат, поэтому
+            # любые пробег и дата между соседними порогами дают тот же результат
+            thresholds = sorted({value for service in services for value in service[2:4]})
+            dates = sorted({value for service in services for value in service[4:]
+                            if value is not None})
+            entry = (services, thresholds, dates, {})
+            with self._lock:
+                self._checks[key] = entry
+                if len(self._checks) > CHECK_CACHE_SIZE:
+                    self._checks.popitem(last=False)
+
+        services, thresholds, dates, by_bucket = entry
+        bucket = (bisect_right(thresholds, current_mileage), bisect_right(dates, today))
+        results = by_bucket.get(bucket)
+        if results is None:
+            results = []
+            for work_desc, last_mileage, next_service, soon, due_date, soon_date in services:
+                urgent = current_mileage >= next_service or (
+                    due_date is not None and today >= due_date)
+                if urgent or current_mileage >= soon or (
+                        soon_date is not None and today >= soon_date):
+                    status = "СРОЧНО!" if urgent else "Скоро потребуется"
+                    results.append((work_desc, last_mileage, next_service, status, due_date))
+            by_bucket[bucket] = results
+        return list(results)
 
-            if current_mileage >= next_service - admission:
-                status = "СРОЧНО!" if current_mileage >= next_service else "Скоро потребуется"
-                results.append((work_desc, last_mileage, next_service, status))
+    def _fleet_plan_cte(self, planned_work):
+        """CTE plan и last: план каждого автомобиля с пробегом и датой последнего ТО.
 
-        return results
+        Для каждого автомобиля берётся его собственный план или общий план
+        planned_work. Возвращает (текст WITH ..., параметры).
+        """
+        common_ids = self.get_work_ids([work for work, _, _ in planned_work])
+        common = [(position, common_ids[work], period, months)
+                  for position, (work, period, months) in enumerate(planned_work)]
+        # VALUES не может быть пустым, поэтому пустой общий план — строка-заглушка
+        values = ", ".join("(?, ?, ?, ?)" for _ in common) or "(NULL, NULL, NULL, NULL)"
+        params = [value for row in common for value in row]
+        return f"""
+            WITH common(position, work_id, period, months) AS (VALUES {values}),
+            plan AS (
+                SELECT vehicles.id AS vehicle_id, common.position,
+                       common.work_id, common.period, common.months
+                FROM vehicles CROSS JOIN common
+                WHERE common.work_id IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM vehicle_plan
+                    WHERE vehicle_plan.vehicle_id = vehicles.id
+                )
+                UNION ALL
+                SELECT vehicle_id, position, work_id, period, months FROM vehicle_plan
+            ),
+            last AS (
+                SELECT plan.*, COALESCE(last_service.mileage, 0) AS last_mileage,
+                       last_service.date AS last_date
+                FROM plan
+                LEFT JOIN last_service
+                    ON last_service.vehicle_id = plan.vehicle_id
+                   AND last_service.work_id = plan.work_id
+            )""", params
+
+    def check_fleet(self, today=None):
+        """Проверяет все автомобили парка одним запросом.
+
+        Для каждого автомобиля берётся его собственный план или общий план
+        (db.plan), а текущий пробег — из таблицы vehicles; сроки в месяцах
+        отсчитываются до today (по умолчанию сегодня). Возвращает
+        [(vehicle_id, автомобиль, пробег, работа, последнее ТО, следующее ТО,
+        статус, срок по времени или None)].
+        """
+        today = today or datetime.date.today().isoformat()
+        settings = self.plan.snapshot()
+        cte, params = self._fleet_plan_cte(settings.planned_work)
+
+        # Даты-границы считаются один раз на каждый интервал в месяцах,
+        # а для каждой строки плана остаётся сравнение строк
+        months = {months for _, _, months in settings.planned_work if months is not None}
+        months.update(row[0] for row in self.conn.execute(
+            "SELECT DISTINCT months FROM vehicle_plan WHERE months IS NOT NULL"))
+        cutoffs = [(interval, service_date_cutoff(today, interval),
+                    service_date_cutoff(today, interval, settings.allowance))
+                   for interval in sorted(months)]
+        values = ", ".join("(?, ?, ?)" for _ in cutoffs) or "(NULL, NULL, NULL)"
+        params.extend(value for row in cutoffs for value in row)
+        params.append(settings.allowance)
+
+        cursor = self.conn.cursor()
+        cursor.execute(f"""{cte},
+            cutoffs(months, urgent_before, soon_before) AS (VALUES {values}),
+            allowance(percent) AS (VALUES (?))
+            SELECT vehicles.id, vehicles.name, vehicles.mileage, works.name,
+                   last.last_mileage, last.last_mileage + last.period,
+                   CASE WHEN vehicles.mileage >= last.last_mileage + last.period
+                          OR last.last_date <= cutoffs.urgent_before
+                        THEN 'СРОЧНО!' ELSE 'Скоро потребуется' END,
+                   last.months, last.last_date
+            FROM last
+            JOIN vehicles ON vehicles.id = last.vehicle_id
+            JOIN works ON works.id = last.work_id
+            LEFT JOIN cutoffs ON cutoffs.months = last.months
+            WHERE vehicles.mileage >= last.last_mileage + last.period
+                - CAST(last.period * (SELECT percent FROM allowance) / 100 AS INTEGER)
+               OR last.last_date <= cutoffs.soon_before
+            ORDER BY vehicles.id, last.position
+        """, params)
+        return [(*row, None if months is None or last_date is None
+                 else add_months(last_date, months))
+                for *row, months, last_date in cursor.fetchall()]
+
+    def get_fleet_plan(self):
+        """План всего автопарка: [(vehicle_id, работа, км, месяцы, последнее ТО (км),
+        дата последнего ТО)]"""
+        cte, params = self._fleet_plan_cte(self.plan.snapshot().planned_work)
+        cursor = self.conn.cursor()
+        cursor.execute(f"""{cte}
+            SELECT last.vehicle_id, works.name, last.period, last.months,
+                   last.last_mileage, last.last_date
+            FROM last
+            JOIN works ON works.id = last.work_id
+            ORDER BY last.vehicle_id, last.position
+        """, params)
+        return cursor.fetchall()
+
+    def get_mileage_trends(self, since=None):
+        """Суммы для оценки среднесуточного пробега методом наименьших квадратов.
+
+        По каждому автомобилю: (vehicle_id, название, текущий пробег, число
+        записей, последний день, Σx, Σy, Σx², Σxy), где x — день записи
+        (julianday), y — пробег. since — учитывать записи с этой даты.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT vehicles.id, vehicles.name, vehicles.mileage,
+                   COUNT(points.day), MAX(points.day),
+                   SUM(points.day), SUM(points.mileage),
+                   SUM(points.day * points.day), SUM(points.day * points.mileage)
+            FROM vehicles
+            LEFT JOIN (
+                SELECT vehicle_id, julianday(date) AS day, mileage FROM logs
+                WHERE date >= ?
+            ) AS points ON points.vehicle_id = vehicles.id
+            GROUP BY vehicles.id
+            ORDER BY vehicles.id
+        """, (since or '',))
+        return cursor.fetchall()
 
     def delete_record(self, record_id):
         """Удаляет запись по ID"""
         cursor = self.conn.cursor()
+        cursor.execute("SELECT vehicle_id FROM logs WHERE id = ?", (record_id,))
+        row = cursor.fetchone()
         cursor.execute("DELETE FROM logs WHERE id = ?", (record_id,))
         self.conn.commit()
+        if cursor.rowcount and row is not None:
+            self.data_changed(row[0])
         return cursor.rowcount  # Возвращает количество удаленных строк
 
     def close(self):
-        self.conn.close()
+        close_pool(self.pool)
+        with self._lock:
+            self._checks.clear()
+            self._seen_data_versions.clear()
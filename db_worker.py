@@ -0,0 +1,107 @@
+# db_worker.py
+"""Фоновый поток для обращений к базе данных из интерфейса.
+
+Запросы выполняются в небольшом пуле потоков; каждый поток берёт своё
+соединение SQLite из пула Database (см. connection.py), поэтому чтение
+истории не ждёт сохранения записи. Результаты передаются обратно
+в поток Tk через root.after, поэтому окно не зависает на медленном
+диске или большом журнале.
+
+    task = worker.call('check_services', mileage,
+                       on_result=show_results, on_error=show_error)
+    ...
+    task.cancel()  # например, при закрытии диалога
+"""
+import queue
+
+
+class DbTask:
+    """Запрос к базе; после отмены его результат не будет доставлен"""
+
+    def __init__(self, future, on_result, on_error):
+        self.future = future
+        self.on_result = on_result
+        self.on_error = on_error
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        self.future.cancel()  # если запрос ещё не начал выполняться
+
+    def done(self):
+        return self.future.done()
+
+
+class DatabaseWorker:
+    POLL_INTERVAL = 15  # мс между проверками готовых результатов
+
+    def __init__(self, root, db, max_workers=3):
+        if db.pool.memory:
+            # У базы в памяти одно соединение на все потоки: запросы пула
+            # шли бы одновременно через него, смешивая транзакции
+            raise ValueError("База в памяти (:memory:) не работает с DatabaseWorker")
+        self.root = root
+        self.db = db
+        self.max_workers = max_workers
+        self.executor = None  # создаётся при первом запросе
+        self.completed = queue.Queue()
+        self.pending = 0
+        self.polling = False
+
+    def _run(self, func, args, kwargs):
+        if isinstance(func, str):
+            func = getattr(self.db, func)
+            return func(*args, **kwargs)
+        return func(self.db, *args, **kwargs)
+
+    def call(self, func, *args, on_result=None, on_error=None, **kwargs):
+        """Ставит запрос в очередь.
+
+        func — имя метода Database или функция, принимающая db первым
+        аргументом. on_result/on_error вызываются в потоке Tk.
+        """
+        if self.executor is None:
+            # concurrent.futures тянет за собой logging — импортируем по требованию
+            from concurrent.futures import ThreadPoolExecutor
+            # Один писатель и несколько читателей одновременно (режим WAL)
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                               thread_name_prefix="db")
+        future = self.executor.submit(self._run, func, args, kwargs)
+        task = DbTask(future, on_result, on_error)
+        # Колбэк выполняется в рабочем потоке — только кладём задачу в очередь
+        future.add_done_callback(lambda _: self.completed.put(task))
+        self.pending += 1
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        return task
+
+    def _poll(self):
+        while True:
+            try:
+                task = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            self._deliver(task)
+
+        if self.pending:
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        else:
+            self.polling = False
+
+    def _deliver(self, task):
+        if task.cancelled or task.future.cancelled():
+            return
+        error = task.future.exception()
+        if error is not None:
+            if task.on_error is not None:
+                task.on_error(error)
+            return
+        if task.on_result is not None:
+            task.on_result(task.future.result())
+
+    def close(self):
+        """Дожидается текущих запросов; соединения закрывает владелец db"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
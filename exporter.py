@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Потоковый экспорт журнала в CSV, JSON Lines и колоночный формат.
+
+Журнал читается блоками фиксированного размера, поэтому объём памяти
+не зависит от размера таблицы.
+
+Запуск: python exporter.py out.csv [--format csv|jsonl|columnar]
+
+Колоночный формат (.clog) — последовательность блоков:
+  заголовок    b"CLOG1\\n", длина JSON-описания (uint32) и само описание
+  блок         число строк (uint32), затем столбцы по порядку:
+                 int64   — массив значений;
+                 string  — словарь уникальных строк блока (число строк,
+                           смещения uint32, байты UTF-8) и коды uint32
+  конец        блок с числом строк 0
+Все числа записываются в порядке little-endian.
+"""
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+COLUMNS = ('id', 'vehicle_id', 'mileage', 'date', 'type', 'description')
+COLUMN_TYPES = ('int64', 'int64', 'int64', 'string', 'string', 'string')
+
+COLUMNAR_MAGIC = b"CLOG1\n"
+
+
+def _to_bytes(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def write_csv(chunks, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield len(chunk)
+
+
+def write_json_lines(chunks, f):
+    for chunk in chunks:
+        f.write("".join(
+            json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + "\n"
+            for row in chunk))
+        yield len(chunk)
+
+
+def _write_string_column(f, values):
+    """Словарное кодирование: повторяющиеся описания хранятся один раз"""
+    dictionary = {}
+    codes = array('I', (dictionary.setdefault(value, len(dictionary)) for value in values))
+
+    encoded = [value.encode('utf-8') for value in dictionary]
+    offsets = array('I', [0])
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+
+    f.write(struct.pack('<I', len(encoded)))
+    f.write(_to_bytes(offsets))
+    f.write(b"".join(encoded))
+    f.write(_to_bytes(codes))
+
+
+def write_columnar(chunks, f):
+    header = json.dumps({'columns': list(zip(COLUMNS, COLUMN_TYPES))}).encode('utf-8')
+    f.write(COLUMNAR_MAGIC)
+    f.write(struct.pack('<I', len(header)))
+    f.write(header)
+
+    for chunk in chunks:
+        f.write(struct.pack('<I', len(chunk)))
+        for index, column_type in enumerate(COLUMN_TYPES):
+            values = [row[index] for row in chunk]
+            if column_type == 'int64':
+                f.write(_to_bytes(array('q', values)))
+            else:
+                _write_string_column(f, [str(value) for value in values])
+        yield len(chunk)
+
+    f.write(struct.pack('<I', 0))
+
+
+def read_columnar(path):
+    """Читает файл .clog и отдаёт записи в виде кортежей"""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError("Файл не в колоночном формате журнала")
+        (header_size,) = struct.unpack('<I', f.read(4))
+        column_types = [t for _, t in json.loads(f.read(header_size))['columns']]
+
+        while True:
+            (rows,) = struct.unpack('<I', f.read(4))
+            if rows == 0:
+                return
+            columns = []
+            for column_type in column_types:
+                if column_type == 'int64':
+                    columns.append(_from_bytes('q', f.read(8 * rows)))
+                    continue
+                (size,) = struct.unpack('<I', f.read(4))
+                offsets = _from_bytes('I', f.read(4 * (size + 1)))
+                blob = f.read(offsets[-1])
+                dictionary = [blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                              for i in range(size)]
+                codes = _from_bytes('I', f.read(4 * rows))
+                columns.append([dictionary[code] for code in codes])
+            yield from zip(*columns)
+
+
+FORMATS = {
+    'csv': ('.csv', write_csv, 'w'),
+    'jsonl': ('.jsonl', write_json_lines, 'w'),
+    'columnar': ('.clog', write_columnar, 'wb'),
+}
+
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    for name, (format_extension, _, _) in FORMATS.items():
+        if extension == format_extension:
+            return name
+    raise ValueError(f"Неизвестный формат экспорта: {extension}")
+
+
+def export_file(db, path, format_=None, chunk_size=10000):
+    """Экспортирует журнал в файл.
+
+    Возвращает словарь со статистикой: exported, seconds, rows_per_second.
+    """
+    format_ = format_ or guess_format(path)
+    _, writer, mode = FORMATS[format_]
+    options = {} if 'b' in mode else {'encoding': 'utf-8', 'newline': ''}
+
+    start = time.perf_counter()
+    exported = 0
+    with open(path, mode, **options) as f:
+        for written in writer(db.iter_record_chunks(chunk_size), f):
+            exported += written
+    seconds = time.perf_counter() - start
+
+    return {
+        'exported': exported,
+        'seconds': seconds,
+        'rows_per_second': exported / seconds if seconds > 0 else 0.0,
+    }
+
+
+def format_summary(result):
+    return "\n".join([
+        f"Экспортировано записей: {result['exported']}",
+        f"Скорость: {result['rows_per_second']:,.0f} записей/с".replace(",", " "),
+    ])
+
+
+def main():
+    from connection import DEFAULT_DB_PATH
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Экспорт журнала обслуживания")
+    parser.add_argument('path', help="файл .csv, .jsonl или .clog")
+    parser.add_argument('--format', choices=sorted(FORMATS),
+                        help="формат (по умолчанию — по расширению файла)")
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help="записей, читаемых из базы за раз")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="файл базы данных")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        print(format_summary(export_file(db, args.path, args.format, args.chunk_size)))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
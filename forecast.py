@@ -0,0 +1,126 @@
+# forecast.py
+"""Прогноз календарных дат планового ТО по всему автопарку.
+
+Среднесуточный пробег каждого автомобиля оценивается методом наименьших
+квадратов по истории (дата, пробег) из журнала. Суммы для оценки считает
+SQLite одним запросом, а наклоны, сроки и даты для всех пар
+(автомобиль, работа) вычисляются разом массивами NumPy. У работ с
+интервалом в месяцах берётся более ранний из сроков — по пробегу или
+по календарю.
+
+NumPy нужен только для прогноза и импортируется при первом вызове.
+"""
+import datetime
+
+JULIAN_UNIX_EPOCH = 2440587.5  # julianday('1970-01-01')
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Для прогноза нужен пакет numpy (pip install numpy)")
+    return numpy
+
+
+def _julian_day(date):
+    """Юлианский день даты ГГГГ-ММ-ДД, как julianday() в SQLite"""
+    return datetime.date.fromisoformat(date).toordinal() - 719163 + JULIAN_UNIX_EPOCH
+
+
+def calendar_due_days(np, last_dates, months):
+    """Юлианские дни сроков по календарю — как database.add_months для каждой
+    пары (дата последнего ТО, интервал в месяцах); NaN, если срока нет."""
+    last = np.array(last_dates, dtype='datetime64[D]')  # None -> NaT
+    months = np.array([0 if value is None else value for value in months], dtype=np.int64)
+    month = last.astype('datetime64[M]')
+    target = month + months
+    # Число месяца сохраняется, но не больше числа дней в новом месяце
+    due = np.minimum(target.astype('datetime64[D]') + (last - month.astype('datetime64[D]')),
+                     (target + 1).astype('datetime64[D]') - 1)
+    known = ~np.isnat(last) & (months > 0)
+    return np.where(known, due.astype(np.int64) + JULIAN_UNIX_EPOCH, np.nan)
+
+
+def estimate_daily_mileage(trends):
+    """Среднесуточный пробег по суммам из Database.get_mileage_trends().
+
+    Возвращает (ID автомобилей, пробег в день, последний день записи) —
+    массивы NumPy; где оценка невозможна (меньше двух дат, пробег не
+    растёт), пробег в день равен NaN.
+    """
+    np = _numpy()
+    columns = list(zip(*trends)) if trends else [()] * 9
+    ids = np.array(columns[0], dtype=np.int64)
+    n = np.array(columns[3], dtype=float)
+    last_day, sx, sy, sxx, sxy = (
+        np.array([np.nan if value is None else value for value in column], dtype=float)
+        for column in columns[4:9])
+
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = (n * sxy - sx * sy) / denominator
+    rate[~(n >= 2) | ~(denominator > 0) | ~(rate > 0)] = np.nan
+    return ids, rate, last_day
+
+
+def forecast_fleet(db, today=None, horizon_days=None, vehicle_id=None, since=None):
+    """Прогнозирует даты ТО для всех работ плана всех автомобилей.
+
+    Возвращает [(vehicle_id, автомобиль, пробег, работа, следующее ТО (км),
+    км в день, дата ГГГГ-ММ-ДД, дней осталось)] по возрастанию срока; если
+    нет ни оценки пробега, ни срока в месяцах, дата и срок равны None (в
+    конце списка).
+    horizon_days — только работы, срок которых наступит не позже чем через
+    столько дней; since — оценивать пробег по записям начиная с этой даты.
+    """
+    np = _numpy()
+    today = today or datetime.date.today().isoformat()
+    trends = db.get_mileage_trends(since)
+    plan = db.get_fleet_plan()
+    if vehicle_id is not None:
+        trends = [row for row in trends if row[0] == vehicle_id]
+        plan = [row for row in plan if row[0] == vehicle_id]
+    if not trends or not plan:
+        return []
+
+    ids, rate, last_day = estimate_daily_mileage(trends)
+    mileage = np.array([row[2] for row in trends], dtype=float)
+
+    plan_vehicle, works, period, months, last_service, last_dates = zip(*plan)
+    # Строки трендов упорядочены по ID автомобиля — индекс ищем бинарным поиском
+    index = np.searchsorted(ids, np.array(plan_vehicle, dtype=np.int64))
+    next_service = np.array(last_service, dtype=np.int64) + np.array(period, dtype=np.int64)
+
+    # Текущий пробег относим к дню последней записи и продлеваем тренд
+    due_day = last_day[index] + (next_service - mileage[index]) / rate[index]
+    # Срок по календарю (интервал в месяцах) — если он наступит раньше
+    due_day = np.fmin(due_day, calendar_due_days(np, last_dates, months))
+    today_day = _julian_day(today)
+    days_left = np.ceil(due_day - today_day)
+    known = np.isfinite(days_left)
+
+    selected = np.ones(len(plan), dtype=bool)
+    if horizon_days is not None:
+        selected = known & (days_left <= horizon_days)
+    order = np.lexsort((index, np.where(known, days_left, np.inf)))
+    order = order[selected[order]]
+
+    # В списки Python переводим только выбранные строки и целыми столбцами
+    vehicle = index[order]
+    rates = np.round(rate[vehicle], 1).tolist()
+    days = days_left[order]
+    dates = np.floor(np.where(np.isfinite(days), due_day[order], 0) - JULIAN_UNIX_EPOCH)
+    dates = dates.astype('datetime64[D]').astype(str).tolist()
+    known_days = np.isfinite(days).tolist()
+    names = [row[1] for row in trends]
+    return [
+        (vehicle_id, names[v], current, works[i], due,
+         None if rate_ != rate_ else rate_,  # NaN — оценки нет
+         date if has_date else None,
+         int(left) if has_date else None)
+        for vehicle_id, v, current, i, due, rate_, date, has_date, left in zip(
+            ids[vehicle].tolist(), vehicle.tolist(), mileage[vehicle].astype(np.int64).tolist(),
+            order.tolist(), next_service[order].tolist(), rates, dates, known_days,
+            days.tolist())
+    ]
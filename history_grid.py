@@ -0,0 +1,310 @@
+# history_grid.py
+"""Виртуализированная таблица истории обслуживания.
+
+В Treeview живёт ровно столько строк, сколько помещается на экране:
+при прокрутке строки не создаются заново, а получают новые значения.
+Записи читаются из базы окнами (видимая часть плюс буфер) через
+фоновый DatabaseWorker, поэтому время открытия и память не зависят
+от размера журнала, а прокрутка не блокирует окно. Прокрутка вниз и
+вверх продолжает чтение по ключу (date, mileage, id) от края кэша, End
+читает последние записи в обратном порядке, а число записей берётся из
+сводной таблицы record_counts.
+
+set_query() переключает таблицу на результаты полнотекстового поиска
+(Database.search_records): они читаются теми же окнами по смещению, а
+порядок результатов (search_ranked) выбирается один раз на запрос.
+"""
+from tkinter import ttk
+
+from database import DEFAULT_VEHICLE_ID
+
+
+class VirtualHistoryGrid:
+    COLUMNS = ('mileage', 'date', 'type', 'description', 'actions')
+    BUFFER_ROWS = 50  # записей, читаемых сверх видимой части
+
+    def __init__(self, parent, worker, total, records, height=15, on_action=None,
+                 vehicle_id=DEFAULT_VEHICLE_ID, on_total=None, on_error=None):
+        """total и records — число записей и первые записи, уже прочитанные
+        при открытии окна (см. load_first_window)"""
+        self.worker = worker
+        self.vehicle_id = vehicle_id
+        self.on_action = on_action  # вызывается с записью при клике на "Действия"
+        self.on_total = on_total    # вызывается с числом записей после перечитывания
+        self.on_error = on_error    # вызывается с исключением, если перечитать не удалось
+        self.query = ""             # текст поиска; пустой — вся история
+        self.ranked = None          # порядок результатов поиска (Database.search_ranked)
+
+        self.total = total
+        self.offset = 0           # индекс первой видимой записи
+        self.cache_start = 0      # индекс первой записи в кэше
+        self.cache = list(records)  # записи (id, mileage, date, type, description)
+        self.visible_rows = height
+        self.row_records = {}     # iid строки Treeview -> запись
+        self.task = None          # выполняющийся запрос окна записей
+
+        self.tree = ttk.Treeview(parent, columns=self.COLUMNS,
+                                 show='headings', height=height)
+
+        self.tree.heading('mileage', text='Пробег (км)', anchor='center')
+        self.tree.heading('date', text='Дата', anchor='center')
+        self.tree.heading('type', text='Тип', anchor='center')
+        self.tree.heading('description', text='Описание работ', anchor='w')
+        self.tree.heading('actions', text='Действия', anchor='center')
+
+        self.tree.column('mileage', width=100, anchor='center')
+        self.tree.column('date', width=100, anchor='center')
+        self.tree.column('type', width=120, anchor='center')
+        self.tree.column('description', width=400, anchor='w')
+        self.tree.column('actions', width=80, anchor='center')
+
+        # Цвета строк назначаются сразу при заполнении строки
+        self.tree.tag_configure('even', background='#F5F5F5')
+        self.tree.tag_configure('odd', background='#FFFFFF')
+
+        self.vsb = ttk.Scrollbar(parent, orient='vertical', command=self.on_scrollbar)
+
+        self.tree.bind("<Button-1>", self.on_click)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", self.on_mousewheel)
+        self.tree.bind("<Button-5>", self.on_mousewheel)
+        self.tree.bind("<Up>", lambda e: self.scroll_to(self.offset - 1))
+        self.tree.bind("<Down>", lambda e: self.scroll_to(self.offset + 1))
+        self.tree.bind("<Prior>", lambda e: self.scroll_to(self.offset - self.visible_rows))
+        self.tree.bind("<Next>", lambda e: self.scroll_to(self.offset + self.visible_rows))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(self.total))
+        self.tree.bind("<Configure>", self.on_resize)
+
+        self.refresh()
+
+    def grid(self, row=0, column=0):
+        self.tree.grid(row=row, column=column, sticky='nsew')
+        self.vsb.grid(row=row, column=column + 1, sticky='ns')
+
+    # --- Данные -------------------------------------------------------------
+
+    @classmethod
+    def load_first_window(cls, db, height=15, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Читает (число записей, первые записи) для открытия таблицы"""
+        return (db.count_records(vehicle_id),
+                db.get_records_slice(0, height + 2 * cls.BUFFER_ROWS, vehicle_id))
+
+    def read_slice(self):
+        """Функция (db, start, limit) -> записи для текущего режима таблицы"""
+        query, vehicle_id, ranked = self.query, self.vehicle_id, self.ranked
+        if query:
+            return lambda db, start, limit: db.search_records(
+                query, limit, start, vehicle_id, ranked)
+        return lambda db, start, limit: db.get_records_slice(start, limit, vehicle_id)
+
+    def is_cached(self, offset):
+        cache_end = self.cache_start + len(self.cache)
+        need_end = min(offset + self.visible_rows, self.total)
+        return self.cache_start <= offset and need_end <= cache_end
+
+    def request_window(self, offset):
+        """Запрашивает в фоне записи [offset, offset + видимые)"""
+        if self.task is not None:
+            self.task.cancel()  # нужна только последняя позиция прокрутки
+
+        cache_end = self.cache_start + len(self.cache)
+        vehicle_id = self.vehicle_id
+        keyset = not self.query and self.cache
+        if keyset and self.cache_start <= offset <= cache_end:
+            # Прокрутка вниз: продолжаем по ключу от последней записи кэша
+            last = self.cache[-1]
+            after = (last[2], last[1], last[0])
+            limit = self.visible_rows + self.BUFFER_ROWS
+            self.task = self.worker.call(
+                lambda db: db.get_records_page(limit, after, vehicle_id)[0],
+                on_result=lambda page: self.extend_cache(page, offset, limit))
+        elif keyset and offset < self.cache_start <= offset + self.visible_rows + self.BUFFER_ROWS:
+            # Прокрутка вверх: по ключу в обратном порядке от первой записи кэша
+            first = self.cache[0]
+            before = (first[2], first[1], first[0])
+            limit = min(self.cache_start, self.cache_start - offset + self.BUFFER_ROWS)
+            self.task = self.worker.call(
+                lambda db: db.get_records_before(limit, before, vehicle_id),
+                on_result=lambda page: self.prepend_cache(page, offset, limit))
+        elif not self.query and offset + self.visible_rows >= self.total:
+            # End: последние записи журнала по ключу в обратном порядке
+            limit = self.visible_rows + 2 * self.BUFFER_ROWS
+            start = max(0, self.total - limit)
+            self.task = self.worker.call(
+                lambda db: db.get_records_before(limit, None, vehicle_id),
+                on_result=lambda rows: self.replace_cache(start, rows, limit))
+        else:
+            # Переход в произвольное место (ползунок, Home): get_records_slice
+            # отсчитывает позицию от ближайшего конца журнала
+            start = max(0, offset - self.BUFFER_ROWS)
+            limit = self.visible_rows + 2 * self.BUFFER_ROWS
+            read_slice = self.read_slice()
+            self.task = self.worker.call(
+                lambda db: read_slice(db, start, limit),
+                on_result=lambda rows: self.replace_cache(start, rows, limit))
+
+    def extend_cache(self, page, offset, limit):
+        self.task = None
+        self.cache.extend(page)
+        if len(page) < limit:
+            # Дошли до конца журнала (записи могли удалить после подсчёта)
+            self.total = self.cache_start + len(self.cache)
+        # Держим в кэше не больше видимой части и двух буферов
+        excess = len(self.cache) - (self.visible_rows + 2 * self.BUFFER_ROWS)
+        if excess > 0 and offset - self.cache_start >= excess:
+            del self.cache[:excess]
+            self.cache_start += excess
+        self.render()
+
+    def prepend_cache(self, page, offset, limit):
+        self.task = None
+        if len(page) < limit:
+            # Выше оказалось меньше записей, чем по счёту: журнал изменился
+            self.invalidate()
+            return
+        self.cache[:0] = page
+        self.cache_start -= len(page)
+        # Держим в кэше буфер над видимой частью, её саму и буфер под ней
+        del self.cache[offset - self.cache_start + self.visible_rows + self.BUFFER_ROWS:]
+        self.render()
+
+    def replace_cache(self, start, rows, limit, total=None):
+        self.task = None
+        if total is not None:
+            self.total = total
+        if len(rows) < limit:
+            self.total = start + len(rows)
+        self.cache = rows
+        self.cache_start = start
+        self.render()
+        if total is not None and self.on_total is not None:
+            self.on_total(self.total)
+
+    def invalidate(self):
+        """Перечитывает данные после изменения журнала"""
+        if self.task is not None:
+            self.task.cancel()
+        start = max(0, self.offset - self.BUFFER_ROWS)
+        limit = self.visible_rows + 2 * self.BUFFER_ROWS
+        query, vehicle_id, ranked = self.query, self.vehicle_id, self.ranked
+        if query:
+            def load(db):
+                # Порядок результатов выбирается один раз на запрос, а не
+                # для каждого окна прокрутки
+                order = db.search_ranked(query) if ranked is None else ranked
+                return (db.count_search(query, vehicle_id), order,
+                        db.search_records(query, limit, start, vehicle_id, order))
+        else:
+            def load(db):
+                return (db.count_records(vehicle_id), None,
+                        db.get_records_slice(start, limit, vehicle_id))
+
+        def loaded(result):
+            total, self.ranked, rows = result
+            self.replace_cache(start, rows, limit, total)
+
+        self.task = self.worker.call(load, on_result=loaded, on_error=self.on_error)
+
+    def set_query(self, query):
+        """Показывает результаты поиска по описаниям (пустой текст — всю историю)"""
+        query = query.strip()
+        if query == self.query:
+            return
+        self.query = query
+        self.ranked = None
+        self.offset = 0
+        self.invalidate()
+
+    def cancel(self):
+        """Отменяет незавершённый запрос (при закрытии окна)"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    # --- Отрисовка ----------------------------------------------------------
+
+    def refresh(self):
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        if not self.is_cached(self.offset):
+            # Пока записи загружаются, остаются видны предыдущие строки
+            self.request_window(self.offset)
+            return
+        self.render()
+
+    def render(self):
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        if not self.is_cached(self.offset):
+            # Пока ждали ответ, окно прокрутили дальше
+            self.request_window(self.offset)
+            return
+
+        # Записей в кэше может оказаться меньше, если журнал изменился
+        available = self.cache_start + len(self.cache) - self.offset
+        rows = max(0, min(self.visible_rows, self.total, available))
+        items = self.tree.get_children()
+
+        # Создаём недостающие строки или удаляем лишние (только при изменении размера)
+        for index in range(len(items), rows):
+            self.tree.insert('', 'end', iid=f"row{index}")
+        for iid in items[rows:]:
+            self.tree.delete(iid)
+            self.row_records.pop(iid, None)
+
+        # Переиспользуем существующие строки: меняем только значения и теги
+        for index in range(rows):
+            position = self.offset + index
+            record = self.cache[position - self.cache_start]
+            iid = f"row{index}"
+            stripe = 'even' if position % 2 == 0 else 'odd'
+            self.tree.item(iid,
+                           values=(record[1], record[2], record[3],
+                                   record[4], "❌ Удалить"),
+                           tags=(stripe,))
+            self.row_records[iid] = record
+
+        if self.total:
+            self.vsb.set(self.offset / self.total,
+                         min(1.0, (self.offset + rows) / self.total))
+        else:
+            self.vsb.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.total - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+        return "break"
+
+    # --- События ------------------------------------------------------------
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.scroll_to(float(value) * self.total)
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll_to(self.offset + int(value) * step)
+
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:  # Вверх
+            return self.scroll_to(self.offset - 3)
+        return self.scroll_to(self.offset + 3)  # Вниз
+
+    def on_resize(self, event):
+        rowheight = int(ttk.Style().lookup(self.tree.cget('style') or 'Treeview',
+                                           'rowheight') or 20)
+        # Одна строка по высоте занята заголовками
+        rows = max(1, event.height // rowheight - 1)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+
+    def on_click(self, event):
+        if self.tree.identify("region", event.x, event.y) != "cell":
+            return
+        # Колонка "actions" — пятая
+        if self.tree.identify_column(event.x) != "#5":
+            return
+        record = self.row_records.get(self.tree.identify_row(event.y))
+        if record is not None and self.on_action is not None:
+            self.on_action(record)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Массовый импорт записей обслуживания из CSV и JSON.
+
+Файлы читаются потоково, каждая строка проверяется так же, как в
+диалоге "Добавить запись", а вставка идёт пачками через executemany.
+
+Запуск: python importer.py records.csv [--batch-size 1000]
+
+Поддерживаемые форматы:
+  .csv   — заголовок mileage,date,type,description
+  .jsonl — по одному объекту {"mileage": ..., "date": ..., ...} в строке
+  .json  — массив таких объектов
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import re
+import time
+
+from connection import DEFAULT_DB_PATH
+from database import Database, DEFAULT_VEHICLE_ID
+
+RECORD_TYPES = ("плановое ТО", "внеплановый ремонт")
+MAX_MILEAGE = 2 ** 63 - 1  # наибольшее целое SQLite (INTEGER)
+
+
+def validate_record(row):
+    """Проверяет запись и возвращает (mileage, date, type, description)"""
+    if not isinstance(row, dict):
+        raise ValueError(f"Запись должна быть объектом, а не {type(row).__name__}")
+    value = row.get('mileage')
+    try:
+        # В JSON пробег может прийти числом: true и 1000.5 не пробег
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        mileage = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"Некорректный пробег: {value!r}")
+    if mileage < 0:
+        raise ValueError("Пробег не может быть отрицательным")
+    if mileage > MAX_MILEAGE:
+        # Иначе OverflowError в executemany прервал бы весь импорт
+        raise ValueError(f"Некорректный пробег: {value!r}")
+
+    date = str(row.get('date') or '').strip()
+    try:
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        raise ValueError(f"Неверный формат даты: {date!r}")
+
+    type_ = str(row.get('type') or RECORD_TYPES[0]).strip()
+    if type_ not in RECORD_TYPES:
+        raise ValueError(f"Неизвестный тип обслуживания: {type_!r}")
+
+    description = str(row.get('description') or '').strip()
+    if not description:
+        raise ValueError("Пустое описание работ")
+
+    return mileage, date, type_, description
+
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_json_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_json_array(path, chunk_size=65536):
+    """Читает массив JSON-объектов по одному, не загружая файл целиком"""
+    decoder = json.JSONDecoder()
+    separators = re.compile(r'[\s,]*')
+    with open(path, 'r', encoding='utf-8') as f:
+        # Пропускаем всё до открывающей скобки массива
+        buffer = ''
+        while '[' not in buffer:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("Файл не содержит JSON-массива")
+            buffer += chunk
+        position = buffer.index('[') + 1
+
+        eof = False
+        while True:
+            position = separators.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Объект обрезан границей блока — дочитываем файл
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+
+
+def read_records(path):
+    """Выбирает способ чтения по расширению файла"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return read_csv(path)
+    if extension in ('.jsonl', '.ndjson'):
+        return read_json_lines(path)
+    if extension == '.json':
+        return read_json_array(path)
+    raise ValueError(f"Неподдерживаемый формат файла: {extension}")
+
+
+def import_file(db, path, batch_size=1000, vehicle_id=DEFAULT_VEHICLE_ID):
+    """Импортирует файл в базу.
+
+    Возвращает словарь со статистикой: imported, errors (список строк
+    вида "запись N: причина"), seconds и rows_per_second. Некорректные
+    записи пропускаются и попадают в errors.
+    """
+    errors = []
+
+    def valid_records():
+        for number, row in enumerate(read_records(path), start=1):
+            try:
+                yield validate_record(row)
+            except ValueError as e:
+                errors.append(f"запись {number}: {e}")
+
+    start = time.perf_counter()
+    imported = db.add_records(valid_records(), batch_size=batch_size,
+                              vehicle_id=vehicle_id)
+    seconds = time.perf_counter() - start
+
+    return {
+        'imported': imported,
+        'errors': errors,
+        'seconds': seconds,
+        'rows_per_second': imported / seconds if seconds > 0 else 0.0,
+    }
+
+
+def format_summary(result):
+    lines = [
+        f"Импортировано записей: {result['imported']}",
+        f"Скорость: {result['rows_per_second']:,.0f} записей/с".replace(",", " "),
+    ]
+    if result['errors']:
+        lines.append(f"Пропущено с ошибками: {len(result['errors'])}")
+        lines.extend(result['errors'][:10])
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Импорт записей обслуживания")
+    parser.add_argument('path', help="файл .csv, .json или .jsonl")
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help="записей в одной транзакции")
+    parser.add_argument('--vehicle', type=int, default=DEFAULT_VEHICLE_ID,
+                        help="ID автомобиля, к которому относятся записи")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="файл базы данных")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    try:
+        print(format_summary(import_file(db, args.path, args.batch_size, args.vehicle)))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# instrumentation.py
+"""Статистика вызовов Database и построения окон (окно «Диагностика»).
+
+По умолчанию сбор выключен и методы Database не обёрнуты — накладных
+расходов нет. monitor.enable() подменяет открытые методы класса Database
+обёртками, которые считают вызовы, ошибки, время (гистограмма по
+LATENCY_BUCKETS) и число возвращённых строк; monitor.disable() возвращает
+исходные методы. Окна CarLoggerApp отмечены декоратором dialog: пока сбор
+выключен, он только проверяет флаг.
+
+Если задан порог slow_ms, SQL-запросы вызова Database, который длился
+дольше, попадают в журнал медленных вызовов вместе с EXPLAIN QUERY PLAN
+(и в logging, логгер "car_logger.slow").
+
+    monitor.enable(slow_ms=50)
+    ...
+    monitor.snapshot()  # {'calls': {метод: статистика}, 'slow': [...]}
+
+Сбор включается в окне «Диагностика», ключом python -m cli --diagnostics
+или переменными окружения CAR_LOGGER_DIAGNOSTICS=1 и CAR_LOGGER_SLOW_MS.
+"""
+import datetime
+import functools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+LATENCY_BUCKETS = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000)  # мс, верхние границы
+SLOW_LOG_SIZE = 50  # сколько последних медленных вызовов хранить
+EXPLAIN_LIMIT = 10  # разных запросов одного вызова с планом
+EXPLAINED = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+EXCLUDED = {'close'}  # методы Database, которые не оборачиваются
+
+
+def count_rows(result):
+    """Число строк результата: длина списка или списка в начале кортежа
+    (как у get_records_page); для остальных значений — None"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return None
+
+
+class CallStats:
+    __slots__ = ('calls', 'errors', 'total_ms', 'max_ms', 'rows', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)  # последняя — дольше всех границ
+
+    def add(self, ms, rows, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows or 0
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and ms > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile(self, fraction):
+        """Оценка сверху: граница корзины, до которой набирается доля вызовов"""
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.histogram):
+            seen += count
+            if seen >= fraction * self.calls:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}"]
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+            'histogram_ms': dict(zip(labels, self.histogram)),
+        }
+
+
+class Monitor:
+    def __init__(self):
+        self.enabled = False
+        self.slow_ms = None
+        self.stats = {}                       # "Класс.метод" -> CallStats
+        self.slow = deque(maxlen=SLOW_LOG_SIZE)
+        self.lock = threading.Lock()
+        self.local = threading.local()        # SQL внешнего вызова текущего потока
+        self._originals = {}                  # исходные методы Database
+
+    def enable(self, slow_ms=None):
+        """Включает сбор; slow_ms — порог журнала медленных вызовов (None — без него)"""
+        import inspect
+        from database import Database
+
+        with self.lock:
+            self.slow_ms = slow_ms
+            if self.enabled:
+                return
+            for name, method in list(vars(Database).items()):
+                if (name.startswith('_') or name in EXCLUDED
+                        or not inspect.isfunction(method)):
+                    continue
+                self._originals[name] = method
+                if inspect.isgeneratorfunction(method):
+                    setattr(Database, name, self._wrap_generator(name, method))
+                else:
+                    setattr(Database, name, self._wrap(name, method))
+            self.enabled = True
+
+    def disable(self):
+        """Возвращает исходные методы Database; собранная статистика остаётся"""
+        from database import Database
+
+        with self.lock:
+            for name, method in self._originals.items():
+                setattr(Database, name, method)
+            self._originals.clear()
+            self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.slow.clear()
+
+    def record(self, name, ms, rows, failed):
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = CallStats()
+            stats.add(ms, rows, failed)
+
+    def snapshot(self):
+        """Статистика для окна «Диагностика» и python -m cli --diagnostics"""
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'slow_ms': self.slow_ms,
+                'calls': {name: stats.to_dict() for name, stats in sorted(self.stats.items())},
+                'slow': list(self.slow),
+            }
+
+    def _wrap(self, name, method):
+        key = f"Database.{name}"
+
+        @functools.wraps(method)
+        def wrapper(db, *args, **kwargs):
+            local = self.local
+            # SQL собирается только для внешнего вызова: вложенные попадут в него же
+            statements = None
+            if self.slow_ms is not None and getattr(local, 'statements', None) is None:
+                conn = db.conn
+                statements = local.statements = []
+                conn.set_trace_callback(statements.append)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(db, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                ms = (time.perf_counter() - start) * 1000
+                if statements is not None:
+                    conn.set_trace_callback(None)
+                    local.statements = None
+                self.record(key, ms, None if failed else count_rows(result), failed)
+                slow_ms = self.slow_ms
+                if statements is not None and slow_ms is not None and ms >= slow_ms:
+                    self._log_slow(key, ms, conn, statements)
+
+        return wrapper
+
+    def _wrap_generator(self, name, method):
+        # Время генератора — от первого запроса до исчерпания или закрытия,
+        # включая работу того, кто читает строки
+        key = f"Database.{name}"
+
+        @functools.wraps(method)
+        def wrapper(db, *args, **kwargs):
+            start = time.perf_counter()
+            rows = 0
+            failed = True
+            try:
+                for item in method(db, *args, **kwargs):
+                    rows += len(item) if isinstance(item, list) else 1
+                    yield item
+                failed = False
+            except GeneratorExit:
+                failed = False  # читатель остановился сам
+                raise
+            finally:
+                self.record(key, (time.perf_counter() - start) * 1000, rows, failed)
+
+        return wrapper
+
+    def _log_slow(self, name, ms, conn, statements):
+        queries = []
+        for sql in dict.fromkeys(statements):
+            if not sql.lstrip().upper().startswith(EXPLAINED):
+                continue  # BEGIN/COMMIT и строки "-- TRIGGER"
+            if len(queries) == EXPLAIN_LIMIT:
+                break
+            try:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            except sqlite3.Error as e:
+                plan = [f"EXPLAIN не выполнен: {e}"]
+            queries.append({'sql': " ".join(sql.split()), 'plan': plan})
+        entry = {
+            'name': name,
+            'ms': round(ms, 3),
+            'at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'queries': queries,
+        }
+        with self.lock:
+            self.slow.append(entry)
+
+        import logging  # только при медленном вызове: модуль не нужен при запуске
+        lines = [f"{name}: {ms:.1f} мс"]
+        for query in queries:
+            lines.append(f"  {query['sql']}")
+            lines.extend(f"    {step}" for step in query['plan'])
+        logging.getLogger("car_logger.slow").warning("\n".join(lines))
+
+    def enable_from_environment(self):
+        """Включает сбор, если задана переменная CAR_LOGGER_DIAGNOSTICS"""
+        if not os.environ.get('CAR_LOGGER_DIAGNOSTICS'):
+            return
+        slow_ms = os.environ.get('CAR_LOGGER_SLOW_MS')
+        try:
+            self.enable(float(slow_ms) if slow_ms else None)
+        except ValueError:
+            self.enable()
+
+
+monitor = Monitor()
+
+
+def dialog(method):
+    """Декоратор окна CarLoggerApp: при включённом сборе записывает время
+    от вызова до завершения update_idletasks (окно построено и размещено)"""
+    key = f"CarLoggerApp.{method.__name__}"
+
+    @functools.wraps(method)
+    def wrapper(app, *args, **kwargs):
+        if not monitor.enabled:
+            return method(app, *args, **kwargs)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = method(app, *args, **kwargs)
+            app.root.update_idletasks()
+            failed = False
+            return result
+        finally:
+            monitor.record(key, (time.perf_counter() - start) * 1000, None, failed)
+
+    return wrapper
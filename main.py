@@ -1,19 +1,80 @@
 #!/usr/bin/env python3
+"""Графический интерфейс журнала.
+
+Запуск: python main.py [--profile-startup]
+
+Конфигурация читается, а база открывается при первом обращении; модули
+импорта, экспорта и окна истории загружаются при открытии своих окон.
+
+Статистика вызовов базы и окон (меню «Сервис» → «Диагностика») с запуска:
+CAR_LOGGER_DIAGNOSTICS=1 [CAR_LOGGER_SLOW_MS=50] python main.py
+"""
+import time
+
+START = time.perf_counter()  # для --profile-startup
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
 import sys
 
-from config import PLANNED_WORK, ALLOWANCE
+import instrumentation
 from database import Database
+from db_worker import DatabaseWorker
 
 
 class CarLoggerApp:
-    def __init__(self):
-        self.db = Database()
+    PLAN_WATCH_INTERVAL = 1000  # мс между проверками плана ТО в базе
+    SEARCH_DELAY = 300          # мс тишины после ввода, прежде чем искать в истории
+    DIAGNOSTICS_REFRESH = 1000  # мс между обновлениями окна «Диагностика»
+
+    def __init__(self, on_phase=None, db=None):
+        # on_phase(название) отмечает окончание этапа запуска (--profile-startup);
+        # db — другая база (например, в benchmark.py --dialogs)
+        mark = on_phase or (lambda name: None)
+        self.db = db or Database()  # соединение откроется при первом запросе
         self.root = tk.Tk()
+        mark("создание окна Tk")
+        # Запросы из диалогов выполняются в фоновом потоке
+        self.worker = DatabaseWorker(self.root, self.db)
         self.setup_windows_style()
         self.setup_ui()
+        mark("построение главного окна")
+        # План проверяет окно: запрос идёт в фоновом потоке (первый — вместе
+        # с миграциями), а подписчики вызываются в потоке Tk
+        self.db.plan.watch_interval = None
+        self.plan = None  # снимок плана, переданный окнам; None — ещё загружается
+        self.plan_subscribers = []
+        self.root.after(0, self.watch_plan)
+
+    def watch_plan(self):
+        """Загружает план и подхватывает изменения, сделанные вне программы"""
+        def done(result):
+            if isinstance(result, Exception):
+                print(f"Ошибка проверки плана ТО: {result}")
+            else:
+                self.publish_plan(self.db.plan.snapshot())
+            self.root.after(self.PLAN_WATCH_INTERVAL, self.watch_plan)
+
+        self.worker.call(lambda db: db.plan.check_for_changes(),
+                         on_result=done, on_error=done)
+
+    def publish_plan(self, snapshot):
+        """Передаёт новый снимок плана подписанным окнам (в потоке Tk)"""
+        if self.plan is not None and self.plan.version == snapshot.version:
+            return
+        self.plan = snapshot
+        for callback in list(self.plan_subscribers):
+            callback(snapshot)
+
+    def subscribe_plan(self, dialog, callback):
+        """Подписывает окно на изменения плана и допуска до его закрытия"""
+        self.plan_subscribers.append(callback)
+
+        def unsubscribe(event):
+            if event.widget is dialog and callback in self.plan_subscribers:
+                self.plan_subscribers.remove(callback)
+        dialog.bind("<Destroy>", unsubscribe, add="+")
 
     def setup_windows_style(self):
         """Настройка стилей для Windows"""
@@ -80,6 +141,7 @@ class CarLoggerApp:
             ("➕ Добавить запись", self.add_record),
             ("📋 История обслуживания", self.view_history),
             ("📋 Список плановых ТО", self.view_services),
+            ("📈 Прогноз ТО", self.view_forecast),
             ("⚙️ Настроить список ТО", self.configure_services),  # НОВАЯ КНОПКА
             ("❌ Выход", self.root.quit)
         ]
@@ -118,7 +180,16 @@ class CarLoggerApp:
         menubar = tk.Menu(self.root)
         self.root.config(menu=menubar)
 
-        # Меню "Настройки"
+        # Меню "Файл"
+        file_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Файл", menu=file_menu)
+        file_menu.add_command(label="Импорт записей...", command=self.import_records)
+        file_menu.add_command(label="Экспорт журнала...", command=self.export_records)
+
+        # Меню "Сервис"
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Сервис", menu=tools_menu)
+        tools_menu.add_command(label="Диагностика...", command=self.view_diagnostics)
 
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Помощь", menu=help_menu)
@@ -130,6 +201,61 @@ class CarLoggerApp:
             "Автомобильный сервисный журнал\nВерсия 1.0\n\nУчет и контроль обслуживания автомобиля\n\n© 2026"
         )
 
+    def import_records(self):
+        """Импорт записей из CSV/JSON файла"""
+        from tkinter import filedialog
+        from importer import import_file, format_summary
+
+        path = filedialog.askopenfilename(
+            parent=self.root,
+            title="Импорт записей",
+            filetypes=[("CSV и JSON", "*.csv *.json *.jsonl"),
+                       ("Все файлы", "*.*")]
+        )
+        if not path:
+            return
+
+        try:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            result = import_file(self.db, path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось импортировать файл: {str(e)}")
+            return
+        finally:
+            self.root.config(cursor="")
+
+        messagebox.showinfo("Импорт завершён", format_summary(result))
+
+    def export_records(self):
+        """Экспорт журнала в CSV, JSON Lines или колоночный формат"""
+        from tkinter import filedialog
+        from exporter import export_file, format_summary as export_summary
+
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="Экспорт журнала",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"),
+                       ("JSON Lines", "*.jsonl"),
+                       ("Колоночный формат", "*.clog")]
+        )
+        if not path:
+            return
+
+        try:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            result = export_file(self.db, path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось экспортировать журнал: {str(e)}")
+            return
+        finally:
+            self.root.config(cursor="")
+
+        messagebox.showinfo("Экспорт завершён", export_summary(result))
+
+    @instrumentation.dialog
     def check_status(self):
         dialog = tk.Toplevel(self.root)
         dialog.title("Проверка состояния")
@@ -170,182 +296,234 @@ class CarLoggerApp:
         result_frame = tk.Frame(main_container, bg="white")
         result_frame.pack(fill="both", expand=True, pady=10)
 
+        # Индикатор выполнения запроса
+        busy_label = tk.Label(input_frame, text="⏳ Проверка...",
+                              font=("Arial", 10), fg="#1976D2", bg="white")
+
+        # Выполняющийся запрос к базе (отменяется при закрытии окна)
+        check_task = {'task': None}
+        # Пробег последней проверки: при смене плана или допуска она повторяется
+        last_check = {'mileage': None}
+
+        def set_busy(busy):
+            if busy:
+                busy_label.pack(anchor="w")
+                check_button.config(state="disabled")
+                dialog.config(cursor="watch")
+            else:
+                busy_label.pack_forget()
+                check_button.config(state="normal")
+                dialog.config(cursor="")
+
         def perform_check():
             try:
                 mileage = int(mileage_var.get())
                 if mileage < 0:
                     raise ValueError("Пробег не может быть отрицательным")
-
-                # Очищаем предыдущие результаты
-                for widget in result_frame.winfo_children():
-                    widget.destroy()
-
-                # Проверяем состояние
-                services = self.db.check_services(mileage)
-
-                if not services:
-                    success_frame = tk.Frame(result_frame, bg="#E8F5E9")
-                    success_frame.pack(
-                        fill="both", expand=True, padx=10, pady=10)
-
-                    tk.Label(success_frame,
-                             text="✅ ВСЕ СИСТЕМЫ В НОРМЕ",
-                             font=("Arial", 14, "bold"),
-                             fg="#2E7D32",
-                             bg="#E8F5E9",
-                             pady=20
-                             ).pack()
-
-                    tk.Label(success_frame,
-                             text="Сервисное обслуживание не требуется.",
-                             font=("Arial", 12),
-                             fg="#388E3C",
-                             bg="#E8F5E9",
-                             pady=10
-                             ).pack()
-
-                    tk.Label(success_frame,
-                             text=f"Текущий пробег: {mileage:,} км",
-                             font=("Arial", 11),
-                             fg="#666666",
-                             bg="#E8F5E9"
-                             ).pack()
-
-                else:
-                    # Создаем контейнер для Treeview
-                    container = tk.Frame(result_frame, bg="white")
-                    container.pack(fill='both', expand=True)
-
-                    # Заголовок результата
-                    tk.Label(container,
-                             text=f"⚠️ ТРЕБУЕТСЯ ОБСЛУЖИВАНИЕ (пробег: {mileage:,} км)",
-                             font=("Arial", 13, "bold"),
-                             fg="#D32F2F",
-                             bg="white",
-                             pady=5
-                             ).pack(anchor="w")
-
-                    # Создаем Treeview
-                    tree_frame = tk.Frame(container, bg="white")
-                    tree_frame.pack(fill='both', expand=True, pady=10)
-
-                    # Настраиваем стиль Treeview
-                    style = ttk.Style()
-                    style.configure("Status.Treeview",
-                                    font=("Arial", 11),
-                                    rowheight=35,
-                                    background="#FFFFFF",
-                                    fieldbackground="#FFFFFF")
-                    style.configure("Status.Treeview.Heading",
-                                    font=("Arial", 12, "bold"),
-                                    background="#FF9800",
-                                    foreground="white")
-
-                    # Создаем Treeview с цветовым кодированием
-                    tree = ttk.Treeview(tree_frame,
-                                        columns=('work', 'last_service',
-                                                 'next_service', 'status'),
-                                        show='headings',
-                                        style="Status.Treeview",
-                                        height=8)
-
-                    # Настраиваем столбцы
-                    tree.heading('work', text='Работа', anchor='w')
-                    tree.heading('last_service',
-                                 text='Последнее ТО (км)', anchor='center')
-                    tree.heading('next_service',
-                                 text='Следующее ТО (км)', anchor='center')
-                    tree.heading('status', text='Статус', anchor='center')
-
-                    tree.column('work', width=380, anchor='w')
-                    tree.column('last_service', width=150, anchor='center')
-                    tree.column('next_service', width=150, anchor='center')
-                    tree.column('status', width=120, anchor='center')
-
-                    # Добавляем данные
-                    for work_desc, last_mileage, next_service, status in services:
-                        tree.insert('', 'end', values=(
-                            work_desc,
-                            f"{last_mileage:,}",
-                            f"{next_service:,}",
-                            status
-                        ))
-
-                    # Добавляем теги для цветового оформления
-                    tree.tag_configure(
-                        'urgent', background='#FFEBEE', foreground='#C62828')
-                    tree.tag_configure(
-                        'soon', background='#FFF3E0', foreground='#EF6C00')
-
-                    # Применяем теги к строкам
-                    for i, item in enumerate(tree.get_children()):
-                        values = tree.item(item)['values']
-                        status = values[3]
-                        if status == "СРОЧНО!":
-                            tree.item(item, tags=('urgent',))
-                        else:
-                            tree.item(item, tags=('soon',))
-
-                    # Добавляем скроллбар
-                    vsb = ttk.Scrollbar(
-                        tree_frame, orient='vertical', command=tree.yview)
-                    tree.configure(yscrollcommand=vsb.set)
-
-                    tree.grid(row=0, column=0, sticky='nsew')
-                    vsb.grid(row=0, column=1, sticky='ns')
-
-                    tree_frame.grid_rowconfigure(0, weight=1)
-                    tree_frame.grid_columnconfigure(0, weight=1)
-
-                    # Легенда
-                    legend_frame = tk.Frame(container, bg="white")
-                    legend_frame.pack(fill='x', pady=10)
-
-                    tk.Label(legend_frame, text="Легенда:",
-                             font=("Arial", 10, "bold"),
-                             bg="white").pack(side='left', padx=5)
-
-                    urgent_sample = tk.Label(legend_frame, text="█",
-                                             bg="#FFEBEE", fg="#C62828", font=("Arial", 10))
-                    urgent_sample.pack(side='left', padx=(10, 2))
-                    tk.Label(legend_frame, text="Требуется срочно",
-                             font=("Arial", 9),
-                             bg="white").pack(side='left', padx=(0, 15))
-
-                    soon_sample = tk.Label(legend_frame, text="█",
-                                           bg="#FFF3E0", fg="#EF6C00", font=("Arial", 10))
-                    soon_sample.pack(side='left', padx=(10, 2))
-                    tk.Label(legend_frame, text="Скоро потребуется",
-                             font=("Arial", 9),
-                             bg="white").pack(side='left')
-
-                    # Статистика
-                    urgent_count = sum(
-                        1 for _, _, _, status in services if status == "СРОЧНО!")
-                    soon_count = sum(
-                        1 for _, _, _, status in services if status == "Скоро потребуется")
-
-                    stats_frame = tk.Frame(container, bg="white")
-                    stats_frame.pack(fill='x', pady=5)
-
-                    tk.Label(stats_frame,
-                             text=f"Всего работ: {len(services)} | Срочных: {urgent_count} | Скоро: {soon_count}",
-                             font=("Arial", 10, "bold"),
-                             fg="#1976D2",
-                             bg="white"
-                             ).pack()
-
             except ValueError:
                 messagebox.showerror(
                     "Ошибка", "Введите корректный пробег (положительное число)")
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка: {str(e)}")
+                return
+
+            run_check(mileage)
+
+        def run_check(mileage):
+            # Проверяем состояние в фоновом потоке
+            if check_task['task'] is not None:
+                check_task['task'].cancel()
+            set_busy(True)
+            last_check['mileage'] = mileage
+            check_task['task'] = self.worker.call(
+                'check_services', mileage,
+                on_result=lambda services: show_results(mileage, services),
+                on_error=show_error)
+
+        def on_config_changed(snapshot):
+            if last_check['mileage'] is not None:
+                run_check(last_check['mileage'])
+
+        self.subscribe_plan(dialog, on_config_changed)
+
+        def show_error(error):
+            set_busy(False)
+            messagebox.showerror("Ошибка", f"Ошибка: {str(error)}")
+
+        # Виджеты результата создаются один раз; при каждой проверке
+        # меняются только текст и строки таблицы, которые изменились
+        success_frame = tk.Frame(result_frame, bg="#E8F5E9")
+
+        tk.Label(success_frame,
+                 text="✅ ВСЕ СИСТЕМЫ В НОРМЕ",
+                 font=("Arial", 14, "bold"),
+                 fg="#2E7D32",
+                 bg="#E8F5E9",
+                 pady=20
+                 ).pack()
+
+        tk.Label(success_frame,
+                 text="Сервисное обслуживание не требуется.",
+                 font=("Arial", 12),
+                 fg="#388E3C",
+                 bg="#E8F5E9",
+                 pady=10
+                 ).pack()
+
+        success_mileage = tk.Label(success_frame,
+                                   font=("Arial", 11),
+                                   fg="#666666",
+                                   bg="#E8F5E9")
+        success_mileage.pack()
+
+        # Контейнер для Treeview
+        container = tk.Frame(result_frame, bg="white")
+
+        # Заголовок результата
+        header_label = tk.Label(container,
+                                font=("Arial", 13, "bold"),
+                                fg="#D32F2F",
+                                bg="white",
+                                pady=5)
+        header_label.pack(anchor="w")
+
+        tree_frame = tk.Frame(container, bg="white")
+        tree_frame.pack(fill='both', expand=True, pady=10)
+
+        # Настраиваем стиль Treeview
+        style = ttk.Style()
+        style.configure("Status.Treeview",
+                        font=("Arial", 11),
+                        rowheight=35,
+                        background="#FFFFFF",
+                        fieldbackground="#FFFFFF")
+        style.configure("Status.Treeview.Heading",
+                        font=("Arial", 12, "bold"),
+                        background="#FF9800",
+                        foreground="white")
+
+        # Treeview с цветовым кодированием
+        tree = ttk.Treeview(tree_frame,
+                            columns=('work', 'last_service',
+                                     'next_service', 'next_date', 'status'),
+                            show='headings',
+                            style="Status.Treeview",
+                            height=8)
+
+        # Настраиваем столбцы
+        tree.heading('work', text='Работа', anchor='w')
+        tree.heading('last_service',
+                     text='Последнее ТО (км)', anchor='center')
+        tree.heading('next_service',
+                     text='Следующее ТО (км)', anchor='center')
+        tree.heading('next_date', text='Срок (дата)', anchor='center')
+        tree.heading('status', text='Статус', anchor='center')
+
+        tree.column('work', width=300, anchor='w')
+        tree.column('last_service', width=130, anchor='center')
+        tree.column('next_service', width=130, anchor='center')
+        tree.column('next_date', width=110, anchor='center')
+        tree.column('status', width=120, anchor='center')
+
+        # Теги для цветового оформления
+        tree.tag_configure(
+            'urgent', background='#FFEBEE', foreground='#C62828')
+        tree.tag_configure(
+            'soon', background='#FFF3E0', foreground='#EF6C00')
+
+        # Скроллбар
+        vsb = ttk.Scrollbar(
+            tree_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+
+        tree.grid(row=0, column=0, sticky='nsew')
+        vsb.grid(row=0, column=1, sticky='ns')
+
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        # Легенда
+        legend_frame = tk.Frame(container, bg="white")
+        legend_frame.pack(fill='x', pady=10)
+
+        tk.Label(legend_frame, text="Легенда:",
+                 font=("Arial", 10, "bold"),
+                 bg="white").pack(side='left', padx=5)
+
+        urgent_sample = tk.Label(legend_frame, text="█",
+                                 bg="#FFEBEE", fg="#C62828", font=("Arial", 10))
+        urgent_sample.pack(side='left', padx=(10, 2))
+        tk.Label(legend_frame, text="Требуется срочно",
+                 font=("Arial", 9),
+                 bg="white").pack(side='left', padx=(0, 15))
+
+        soon_sample = tk.Label(legend_frame, text="█",
+                               bg="#FFF3E0", fg="#EF6C00", font=("Arial", 10))
+        soon_sample.pack(side='left', padx=(10, 2))
+        tk.Label(legend_frame, text="Скоро потребуется",
+                 font=("Arial", 9),
+                 bg="white").pack(side='left')
+
+        # Статистика
+        stats_frame = tk.Frame(container, bg="white")
+        stats_frame.pack(fill='x', pady=5)
+
+        stats_label = tk.Label(stats_frame,
+                               font=("Arial", 10, "bold"),
+                               fg="#1976D2",
+                               bg="white")
+        stats_label.pack()
+
+        # Строки, показанные в таблице: работа -> (значения, тег)
+        shown_rows = {}
+
+        def update_rows(services):
+            """Меняет в таблице только добавленные, изменённые и удалённые строки"""
+            rows = {}
+            for work_desc, last_mileage, next_service, status, next_date in services:
+                values = (work_desc, f"{last_mileage:,}", f"{next_service:,}",
+                          next_date or "—", status)
+                rows[work_desc] = (values, 'urgent' if status == "СРОЧНО!" else 'soon')
+
+            for work_desc in shown_rows.keys() - rows.keys():
+                tree.delete(work_desc)
+            for index, (work_desc, (values, tag)) in enumerate(rows.items()):
+                shown = shown_rows.get(work_desc)
+                if shown is None:
+                    tree.insert('', index, iid=work_desc, values=values, tags=(tag,))
+                elif shown != (values, tag):
+                    tree.item(work_desc, values=values, tags=(tag,))
+            # Порядок работ меняется только вместе с планом
+            if list(rows) != list(tree.get_children()):
+                for index, work_desc in enumerate(rows):
+                    tree.move(work_desc, '', index)
+            shown_rows.clear()
+            shown_rows.update(rows)
+
+        def show_results(mileage, services):
+            set_busy(False)
+            update_rows(services)
+
+            if not services:
+                container.pack_forget()
+                success_mileage.config(text=f"Текущий пробег: {mileage:,} км")
+                success_frame.pack(fill="both", expand=True, padx=10, pady=10)
+                return
+
+            success_frame.pack_forget()
+            header_label.config(
+                text=f"⚠️ ТРЕБУЕТСЯ ОБСЛУЖИВАНИЕ (пробег: {mileage:,} км)")
+            urgent_count = sum(
+                1 for _, _, _, status, _ in services if status == "СРОЧНО!")
+            soon_count = sum(
+                1 for _, _, _, status, _ in services if status == "Скоро потребуется")
+            stats_label.config(
+                text=f"Всего работ: {len(services)} | Срочных: {urgent_count} | Скоро: {soon_count}")
+            container.pack(fill='both', expand=True)
 
         # Кнопки в отдельном фрейме внизу
         button_frame = tk.Frame(dialog, bg="white")
         button_frame.pack(pady=10, padx=20, fill="x")
 
-        tk.Button(
+        check_button = tk.Button(
             button_frame,
             text="🔍 Проверить",
             command=perform_check,
@@ -354,12 +532,21 @@ class CarLoggerApp:
             font=("Arial", 11, "bold"),
             padx=25,
             pady=8
-        ).pack(side="left", padx=5)
+        )
+        check_button.pack(side="left", padx=5)
+
+        # При закрытии окна незавершённая проверка отменяется
+        def close_dialog():
+            if check_task['task'] is not None:
+                check_task['task'].cancel()
+            dialog.destroy()
+
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
 
         tk.Button(
             button_frame,
             text="Закрыть",
-            command=dialog.destroy,
+            command=close_dialog,
             bg="#f44336",
             fg="white",
             font=("Arial", 11),
@@ -371,6 +558,7 @@ class CarLoggerApp:
         button_frame.pack_propagate(False)
         button_frame.configure(height=50)
 
+    @instrumentation.dialog
     def add_record(self):
         dialog = tk.Toplevel(self.root)
         dialog.title("Добавить запись")
@@ -424,11 +612,17 @@ class CarLoggerApp:
         # Выпадающий список для плановых ТО
         planned_work_var = tk.StringVar()
         planned_work_combo = ttk.Combobox(desc_frame, textvariable=planned_work_var,
-                                          values=[work for work,
-                                                  _ in PLANNED_WORK],
                                           state="readonly",
                                           font=("Arial", 11))
 
+        def fill_works(snapshot):
+            planned_work_combo.config(values=[work for work, _, _ in snapshot.planned_work])
+
+        # Если план ещё загружается, список заполнится, когда он будет готов
+        if self.plan is not None:
+            fill_works(self.plan)
+        self.subscribe_plan(dialog, fill_works)
+
         # Текстовое поле для ручного ввода
         manual_desc_text = tk.Text(desc_frame, height=4, font=("Arial", 10))
 
@@ -453,6 +647,9 @@ class CarLoggerApp:
         # Инициализируем состояние
         toggle_description_input()
 
+        # Выполняющийся запрос сохранения
+        save_task = {'task': None}
+
         def save():
             try:
                 mileage = int(mileage_entry.get())
@@ -483,21 +680,30 @@ class CarLoggerApp:
                             "Ошибка", "Введите описание работ")
                         return
 
-                # Сохраняем в БД
-                record_id = self.db.add_record(
-                    mileage, date, type_, description)
-
                 # Форматируем пробег с разделителями тысяч
                 formatted_mileage = f"{mileage:,} км".replace(",", " ")
 
-                messagebox.showinfo(
-                    "Успех",
-                    f"Пробег: {formatted_mileage}\n"
-                    f"Дата: {date}\n"
-                    f"Тип: {type_}\n"
-                    f"Описание: {description}"
-                )
-                dialog.destroy()
+                def on_saved(record_id):
+                    messagebox.showinfo(
+                        "Успех",
+                        f"Пробег: {formatted_mileage}\n"
+                        f"Дата: {date}\n"
+                        f"Тип: {type_}\n"
+                        f"Описание: {description}"
+                    )
+                    dialog.destroy()
+
+                def on_failed(error):
+                    save_button.config(state="normal")
+                    dialog.config(cursor="")
+                    messagebox.showerror("Ошибка", f"Ошибка: {str(error)}")
+
+                # Сохраняем в БД в фоновом потоке
+                save_button.config(state="disabled")
+                dialog.config(cursor="watch")
+                save_task['task'] = self.worker.call(
+                    'add_record', mileage, date, type_, description,
+                    on_result=on_saved, on_error=on_failed)
 
             except ValueError as e:
                 messagebox.showerror(
@@ -509,7 +715,7 @@ class CarLoggerApp:
         button_frame = tk.Frame(dialog, bg="white")
         button_frame.pack(pady=10)
 
-        tk.Button(
+        save_button = tk.Button(
             button_frame,
             text="Сохранить",
             command=save,
@@ -517,19 +723,31 @@ class CarLoggerApp:
             fg="white",
             font=("Arial", 11, "bold"),
             padx=20
-        ).pack(side="left", padx=5)
+        )
+        save_button.pack(side="left", padx=5)
+
+        # При закрытии окна ответ на незавершённое сохранение не нужен
+        def close_dialog():
+            if save_task['task'] is not None:
+                save_task['task'].cancel()
+            dialog.destroy()
+
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
 
         tk.Button(
             button_frame,
             text="Отмена",
-            command=dialog.destroy,
+            command=close_dialog,
             bg="#f44336",
             fg="white",
             font=("Arial", 11),
             padx=20
         ).pack(side="left", padx=5)
 
+    @instrumentation.dialog
     def view_history(self):
+        from history_grid import VirtualHistoryGrid
+
         dialog = tk.Toplevel(self.root)
         dialog.title("История обслуживания")
         dialog.geometry("950x650")
@@ -545,16 +763,45 @@ class CarLoggerApp:
         main_frame = tk.Frame(dialog, bg="white")
         main_frame.pack(fill="both", expand=True, padx=20, pady=10)
 
-        try:
-            records = self.db.get_all_records()
+        # Индикатор загрузки, пока первые записи читаются в фоне
+        busy_label = tk.Label(main_frame, text="⏳ Загрузка истории...",
+                              font=("Arial", 12), fg="#1976D2", bg="white", pady=20)
+        busy_label.pack()
+        dialog.config(cursor="watch")
+
+        # Незавершённые запросы отменяются при закрытии окна
+        state = {'task': None, 'grid': None, 'search': None}
+
+        def close_dialog():
+            if state['task'] is not None:
+                state['task'].cancel()
+            if state['search'] is not None:
+                dialog.after_cancel(state['search'])
+            if state['grid'] is not None:
+                state['grid'].cancel()
+            dialog.destroy()
+
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+
+        def show_error(error):
+            busy_label.destroy()
+            dialog.config(cursor="")
+            messagebox.showerror(
+                "Ошибка", f"Не удалось загрузить историю: {str(error)}")
 
-            if not records:
+        def show_history(result):
+            state['task'] = None
+            total, records = result
+            busy_label.destroy()
+            dialog.config(cursor="")
+
+            if not total:
                 tk.Label(main_frame, text="История пуста",
                          font=("Arial", 14), pady=20, bg="white").pack()
 
                 tk.Button(main_frame,
                           text="Закрыть",
-                          command=dialog.destroy,
+                          command=close_dialog,
                           bg="#f44336",
                           fg="white",
                           font=("Arial", 11),
@@ -562,6 +809,44 @@ class CarLoggerApp:
                           pady=5).pack(pady=10)
                 return
 
+            # Поиск по описаниям: запрос уходит, когда ввод затих на SEARCH_DELAY мс
+            search_frame = tk.Frame(main_frame, bg="white")
+            search_frame.pack(fill='x', pady=(0, 10))
+
+            tk.Label(search_frame, text="🔎 Поиск:",
+                     font=("Arial", 11),
+                     bg="white").pack(side='left')
+
+            search_var = tk.StringVar()
+            search_entry = tk.Entry(search_frame, textvariable=search_var,
+                                    font=("Arial", 11), width=40)
+            search_entry.pack(side='left', padx=5)
+
+            found_label = tk.Label(search_frame, font=("Arial", 10),
+                                   fg="#1976D2", bg="white")
+            found_label.pack(side='left', padx=10)
+
+            def run_search():
+                state['search'] = None
+                grid.set_query(search_var.get())
+
+            def on_search_input(*args):
+                if state['search'] is not None:
+                    dialog.after_cancel(state['search'])
+                state['search'] = dialog.after(self.SEARCH_DELAY, run_search)
+
+            search_var.trace_add('write', on_search_input)
+            search_entry.bind("<Escape>", lambda e: search_var.set(""))
+
+            def show_found(total):
+                if grid.query:
+                    found_label.config(text=f"Найдено: {total:,}" if total else "Ничего не найдено")
+                else:
+                    found_label.config(text="")
+
+            def show_load_error(error):
+                messagebox.showerror("Ошибка", f"Не удалось загрузить записи: {str(error)}")
+
             # Контейнер для Treeview
             container = tk.Frame(main_frame, bg="white")
             container.pack(fill='both', expand=True)
@@ -576,103 +861,44 @@ class CarLoggerApp:
                             background="#4CAF50",
                             foreground="white")
 
-            # Создаем Treeview с дополнительной колонкой для действий
-            tree = ttk.Treeview(container,
-                                columns=('mileage', 'date', 'type',
-                                         'description', 'actions'),
-                                show='headings',
-                                height=15)
-
-            # Настраиваем столбцы
-            tree.heading('mileage', text='Пробег (км)', anchor='center')
-            tree.heading('date', text='Дата', anchor='center')
-            tree.heading('type', text='Тип', anchor='center')
-            tree.heading('description', text='Описание работ', anchor='w')
-            tree.heading('actions', text='Действия', anchor='center')
-
-            tree.column('mileage', width=100, anchor='center')
-            tree.column('date', width=100, anchor='center')
-            tree.column('type', width=120, anchor='center')
-            tree.column('description', width=400, anchor='w')
-            tree.column('actions', width=80, anchor='center')
-
-            # Добавляем данные (без ID!)
-            for record in records:
+            # Функция удаления записи по клику в колонке "Действия"
+            def on_delete(record):
                 # record содержит: (id, mileage, date, type, description)
-                # Мы пропускаем первый элемент (id) и добавляем остальные
-                tree.insert('', 'end',
-                            values=(record[1], record[2],
-                                    record[3], record[4], "❌ Удалить"),
-                            tags=(str(record[0]),))  # Сохраняем ID в теге!
-
-            # Добавляем цвета для строк
-            tree.tag_configure('even', background='#F5F5F5')
-            tree.tag_configure('odd', background='#FFFFFF')
-
-            for i, item in enumerate(tree.get_children()):
-                tag = 'even' if i % 2 == 0 else 'odd'
-                # Добавляем оба тега: четность и ID
-                current_tags = list(tree.item(item, 'tags'))
-                current_tags.append(tag)
-                tree.item(item, tags=tuple(current_tags))
-
-            # Функция обработки кликов по Treeview
-            def on_treeview_click(event):
-                region = tree.identify("region", event.x, event.y)
-                if region == "cell":
-                    column = tree.identify_column(event.x)
-                    # Колонка "actions" (теперь пятая, а не шестая)
-                    if column == "#5":
-                        item = tree.identify_row(event.y)
-                        if item:
-                            # Получаем ID из тега (первый элемент тега - это ID)
-                            tags = tree.item(item, 'tags')
-                            if tags and len(tags) > 0:
-                                # Ищем тег, который является числом (ID)
-                                for tag in tags:
-                                    if tag and tag.isdigit():
-                                        record_id = int(tag)
-                                        break
-                                else:
-                                    messagebox.showerror(
-                                        "Ошибка", "Не удалось найти ID записи")
-                                    return
-
-                            # Получаем значения строки для показа в сообщении
-                            values = tree.item(item, 'values')
-                            # values содержит: (mileage, date, type, description, "❌ Удалить")
-                            description = values[3]  # Описание работы
-                            mileage = values[0]      # Пробег
-                            date = values[1]         # Дата
-                            type_ = values[2]        # Тип
-
-                            response = messagebox.askyesno(
-                                "Подтверждение удаления",
-                                f"Удалить запись: '{description}'?\n\n"
-                                f"• Пробег: {mileage} км\n"
-                                f"• Дата: {date}\n"
-                                f"• Тип: {type_}"
-                            )
-
-                            if response:
-                                if self.db.delete_record(record_id):
-                                    tree.delete(item)
-                                    messagebox.showinfo(
-                                        "Успех", f"Запись '{description}' удалена")
-                                else:
-                                    messagebox.showerror(
-                                        "Ошибка", "Не удалось удалить запись")
-
-            # Привязываем обработчик кликов
-            tree.bind("<Button-1>", on_treeview_click)
-
-            # Добавляем скроллбар
-            vsb = ttk.Scrollbar(
-                container, orient='vertical', command=tree.yview)
-            tree.configure(yscrollcommand=vsb.set)
-
-            tree.grid(row=0, column=0, sticky='nsew')
-            vsb.grid(row=0, column=1, sticky='ns')
+                record_id, mileage, date, type_, description = record
+
+                response = messagebox.askyesno(
+                    "Подтверждение удаления",
+                    f"Удалить запись: '{description}'?\n\n"
+                    f"• Пробег: {mileage} км\n"
+                    f"• Дата: {date}\n"
+                    f"• Тип: {type_}"
+                )
+
+                if not response:
+                    return
+
+                def on_deleted(deleted):
+                    state['task'] = None
+                    if deleted:
+                        grid.invalidate()
+                        messagebox.showinfo(
+                            "Успех", f"Запись '{description}' удалена")
+                    else:
+                        messagebox.showerror(
+                            "Ошибка", "Не удалось удалить запись")
+
+                state['task'] = self.worker.call(
+                    'delete_record', record_id,
+                    on_result=on_deleted,
+                    on_error=lambda e: messagebox.showerror(
+                        "Ошибка", f"Не удалось удалить запись: {str(e)}"))
+
+            # Виртуализированная таблица: в Treeview только видимые строки
+            grid = VirtualHistoryGrid(container, self.worker, total, records,
+                                      height=15, on_action=on_delete,
+                                      on_total=show_found, on_error=show_load_error)
+            grid.grid(row=0, column=0)
+            state['grid'] = grid
 
             container.grid_rowconfigure(0, weight=1)
             container.grid_columnconfigure(0, weight=1)
@@ -690,17 +916,18 @@ class CarLoggerApp:
             # Кнопка закрытия
             tk.Button(main_frame,
                       text="Закрыть",
-                      command=dialog.destroy,
+                      command=close_dialog,
                       bg="#f44336",
                       fg="white",
                       font=("Arial", 11),
                       padx=20,
                       pady=5).pack(pady=10)
 
-        except Exception as e:
-            messagebox.showerror(
-                "Ошибка", f"Не удалось загрузить историю: {str(e)}")
+        state['task'] = self.worker.call(
+            VirtualHistoryGrid.load_first_window,
+            on_result=show_history, on_error=show_error)
 
+    @instrumentation.dialog
     def view_services(self):
         dialog = tk.Toplevel(self.root)
         dialog.title("Процедуры планового ТО")
@@ -723,7 +950,7 @@ class CarLoggerApp:
 
         # Информация
         tk.Label(main_container,
-                 text="Полный перечень регулярных технических процедур с рекомендованными интервалами пробега",
+                 text="Регулярные технические процедуры: работа нужна по пробегу или по времени — что наступит раньше",
                  font=("Arial", 11),
                  bg="white").pack(pady=5)
 
@@ -745,7 +972,7 @@ class CarLoggerApp:
 
         # Создаем Treeview
         tree = ttk.Treeview(tree_container,
-                            columns=('code', 'procedure', 'interval'),
+                            columns=('code', 'procedure', 'interval', 'months'),
                             show='headings',
                             style="Services.Treeview",
                             height=12)
@@ -754,22 +981,28 @@ class CarLoggerApp:
         tree.heading('code', text='Код', anchor='center')
         tree.heading('procedure', text='Процедура', anchor='w')
         tree.heading('interval', text='Интервал (км)', anchor='center')
+        tree.heading('months', text='Интервал (мес.)', anchor='center')
 
-        tree.column('code', width=80, anchor='center')
-        tree.column('procedure', width=500, anchor='w')
-        tree.column('interval', width=150, anchor='center')
-
-        # Добавляем данные
-        for code, (work, interval) in enumerate(PLANNED_WORK):
-            tree.insert('', 'end', values=(code, work, f"{interval:,}"))
+        tree.column('code', width=70, anchor='center')
+        tree.column('procedure', width=400, anchor='w')
+        tree.column('interval', width=130, anchor='center')
+        tree.column('months', width=130, anchor='center')
 
         # Добавляем цвета для строк
         tree.tag_configure('even', background='#F5F5F5')
         tree.tag_configure('odd', background='#FFFFFF')
 
-        for i, item in enumerate(tree.get_children()):
-            tag = 'even' if i % 2 == 0 else 'odd'
-            tree.item(item, tags=(tag,))
+        def fill(snapshot):
+            tree.delete(*tree.get_children())
+            for code, (work, interval, months) in enumerate(snapshot.planned_work):
+                tag = 'even' if code % 2 == 0 else 'odd'
+                tree.insert('', 'end', values=(code, work, f"{interval:,}", months or "—"),
+                            tags=(tag,))
+
+        if self.plan is not None:
+            fill(self.plan)
+        # Список обновляется, когда план загрузится или изменится, пока окно открыто
+        self.subscribe_plan(dialog, fill)
 
         # Добавляем вертикальный скроллбар
         vsb = ttk.Scrollbar(
@@ -801,8 +1034,145 @@ class CarLoggerApp:
             pady=8
         ).pack(expand=True)
 
+    @instrumentation.dialog
+    def view_forecast(self):
+        """Прогноз дат планового ТО по всему автопарку"""
+        from forecast import forecast_fleet
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Прогноз ТО")
+        dialog.geometry("1000x650")
+        dialog.transient(self.root)
+
+        dialog.configure(bg="white")
+        self.center_dialog(dialog, 1000, 650)
+
+        tk.Label(dialog, text="Прогноз дат планового ТО",
+                 font=("Arial", 16, "bold"),
+                 bg="white").pack(pady=10)
+
+        main_frame = tk.Frame(dialog, bg="white")
+        main_frame.pack(fill="both", expand=True, padx=20, pady=10)
+
+        # Период прогноза
+        filter_frame = tk.Frame(main_frame, bg="white")
+        filter_frame.pack(fill="x", pady=5)
+        tk.Label(filter_frame, text="Показать работы на ближайшие:",
+                 font=("Arial", 11), bg="white").pack(side="left")
+        horizons = {"30 дней": 30, "90 дней": 90, "365 дней": 365, "все": None}
+        horizon_var = tk.StringVar(value="90 дней")
+        horizon_box = ttk.Combobox(filter_frame, textvariable=horizon_var,
+                                   values=list(horizons), state="readonly", width=10)
+        horizon_box.pack(side="left", padx=5)
+
+        busy_label = tk.Label(filter_frame, text="⏳ Расчёт...",
+                              font=("Arial", 10), fg="#1976D2", bg="white")
+
+        tree_frame = tk.Frame(main_frame, bg="white")
+        tree_frame.pack(fill="both", expand=True, pady=10)
+
+        columns = ('vehicle', 'work', 'next_service', 'rate', 'due_date', 'days')
+        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=14)
+        headings = (("Автомобиль", 170, 'w'), ("Работа", 330, 'w'),
+                    ("Следующее ТО (км)", 130, 'center'), ("Км в день", 90, 'center'),
+                    ("Дата", 100, 'center'), ("Дней", 70, 'center'))
+        for column, (text, width, anchor) in zip(columns, headings):
+            tree.heading(column, text=text, anchor=anchor)
+            tree.column(column, width=width, anchor=anchor)
+
+        tree.tag_configure('overdue', background='#FFEBEE', foreground='#C62828')
+        tree.tag_configure('soon', background='#FFF3E0', foreground='#EF6C00')
+        tree.tag_configure('unknown', foreground='#9E9E9E')
+
+        vsb = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.grid(row=0, column=0, sticky='nsew')
+        vsb.grid(row=0, column=1, sticky='ns')
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        summary_label = tk.Label(main_frame, text="", font=("Arial", 10, "bold"),
+                                 fg="#1976D2", bg="white")
+        summary_label.pack(pady=5)
+
+        # Выполняющийся расчёт (отменяется при закрытии окна)
+        state = {'task': None}
+
+        def show_forecast(rows):
+            state['task'] = None
+            busy_label.pack_forget()
+            dialog.config(cursor="")
+            tree.delete(*tree.get_children())
+            for (_, vehicle, _, work, next_service, rate, due_date, days) in rows:
+                if days is None:
+                    tag = 'unknown'
+                elif days < 0:
+                    tag = 'overdue'
+                else:
+                    tag = 'soon' if days <= 30 else ''
+                tree.insert('', 'end', tags=(tag,), values=(
+                    vehicle, work, f"{next_service:,}",
+                    "—" if rate is None else f"{rate:,.1f}",
+                    due_date or "нет данных",
+                    "—" if days is None else days))
+            overdue = sum(1 for row in rows if row[7] is not None and row[7] < 0)
+            summary_label.config(
+                text=f"Работ в прогнозе: {len(rows)} | Просрочено: {overdue}")
+
+        def show_error(error):
+            state['task'] = None
+            busy_label.pack_forget()
+            dialog.config(cursor="")
+            messagebox.showerror("Ошибка", f"Не удалось построить прогноз: {str(error)}")
+
+        def refresh(*args):
+            if state['task'] is not None:
+                state['task'].cancel()
+            busy_label.pack(side="left", padx=10)
+            dialog.config(cursor="watch")
+            state['task'] = self.worker.call(
+                forecast_fleet, horizon_days=horizons[horizon_var.get()],
+                on_result=show_forecast, on_error=show_error)
+
+        horizon_box.bind("<<ComboboxSelected>>", refresh)
+        # Прогноз пересчитывается при изменении плана ТО
+        self.subscribe_plan(dialog, refresh)
+
+        def close_dialog():
+            if state['task'] is not None:
+                state['task'].cancel()
+            dialog.destroy()
+
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+
+        tk.Button(dialog,
+                  text="Закрыть",
+                  command=close_dialog,
+                  bg="#f44336",
+                  fg="white",
+                  font=("Arial", 11, "bold"),
+                  padx=30,
+                  pady=8).pack(pady=10)
+
+        refresh()
+
+    @instrumentation.dialog
     def configure_services(self):
-        """Настройка списка планового ТО"""
+        """Настройка списка планового ТО.
+
+        Все процедуры — строки одной таблицы; ячейка редактируется полем
+        ввода, которое кладётся поверх неё, поэтому число виджетов не
+        зависит от длины списка.
+        """
+        from config import validate_plan_rows
+
+        # Действующие план и допуск
+        settings = self.plan
+        if settings is None:
+            messagebox.showinfo("План ТО",
+                                "План ТО ещё загружается из базы, попробуйте через несколько секунд")
+            return
+
         dialog = tk.Toplevel(self.root)
         dialog.title("Настройка планового ТО")
         dialog.geometry("1100x800")
@@ -813,11 +1183,6 @@ class CarLoggerApp:
         dialog.configure(bg="white")
         self.center_dialog(dialog, 1100, 800)
 
-        # Сохраняем оригинальные данные для сравнения
-        original_work = PLANNED_WORK[:]  # Копия списка
-        original_allowance = ALLOWANCE
-
-        # Контейнер с прокруткой
         main_container = tk.Frame(dialog, bg="white")
         main_container.pack(fill="both", expand=True, padx=20, pady=10)
 
@@ -829,118 +1194,194 @@ class CarLoggerApp:
 
         # Инструкция
         tk.Label(main_container,
-                 text="Редактируйте список процедур и интервалы обслуживания:",
-                 font=("Arial", 11),
+                 text="Двойной щелчок, Enter или F2 — изменить ячейку, Tab — следующая ячейка, "
+                      "Delete — удалить выбранные.\nCtrl+V — вставить список процедур "
+                      "(работа, км, месяцы через Tab или «;», например из таблицы).",
+                 font=("Arial", 10),
                  bg="white").pack(pady=5)
 
-        # Фрейм для списка процедур с двойной прокруткой
-        list_frame = tk.Frame(main_container, bg="white")
-        list_frame.pack(fill="both", expand=True, pady=10)
+        # Таблица процедур
+        tree_frame = tk.Frame(main_container, bg="white")
+        tree_frame.pack(fill="both", expand=True, pady=10)
 
-        # Создаем Canvas с прокруткой
-        canvas = tk.Canvas(list_frame, bg="white", highlightthickness=0)
-        v_scrollbar = tk.Scrollbar(
-            list_frame, orient="vertical", command=canvas.yview)
-
-        scrollable_frame = tk.Frame(canvas, bg="white")
+        style = ttk.Style()
+        style.configure("Plan.Treeview", font=("Arial", 11), rowheight=28)
+        style.configure("Plan.Treeview.Heading", font=("Arial", 12, "bold"))
 
-        # Конфигурация скроллинга
-        def configure_scroll_region(e):
-            canvas.configure(scrollregion=canvas.bbox("all"))
+        columns = ('work', 'interval', 'months')
+        tree = ttk.Treeview(tree_frame, columns=columns, show='headings',
+                            style="Plan.Treeview", height=16)
+        tree.heading('work', text='Процедура', anchor='w')
+        tree.heading('interval', text='Интервал (км)', anchor='center')
+        tree.heading('months', text='Интервал (мес.)', anchor='center')
+        tree.column('work', width=700, anchor='w')
+        tree.column('interval', width=150, anchor='center')
+        tree.column('months', width=150, anchor='center')
+        tree.tag_configure('invalid', background='#FFEBEE', foreground='#C62828')
 
-        scrollable_frame.bind("<Configure>", configure_scroll_region)
+        # Значения ячеек как их ввёл пользователь: строка таблицы -> [работа, км, месяцы]
+        rows = {}
+        # Исходные названия, чтобы переименование не теряло историю
+        original_names = {}
 
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=v_scrollbar.set)
+        def add_row(work="", interval=10000, months=None, index='end'):
+            values = [work, str(interval), "" if months is None else str(months)]
+            item = tree.insert('', index, values=values)
+            rows[item] = values
+            original_names[item] = work
+            return item
 
-        # Безопасная функция для скролла с проверкой существования виджета
-        def on_mousewheel(event):
+        # Добавляем существующие процедуры
+        for work, interval, months in settings.planned_work:
+            add_row(work, interval, months)
+
+        # Поле редактирования — одно на всю таблицу, кладётся поверх ячейки
+        editor = tk.Entry(tree, font=("Arial", 11), relief="solid", borderwidth=1)
+        editing = {'item': None, 'column': None}
+
+        def start_edit(item, column):
+            finish_edit()
+            tree.see(item)
+            tree.update_idletasks()  # bbox известен только для размещённой строки
+            bbox = tree.bbox(item, column)
+            if not bbox:
+                return
+            x, y, width, height = bbox
+            editing['item'], editing['column'] = item, column
+            editor.delete(0, 'end')
+            editor.insert(0, rows[item][columns.index(column)])
+            editor.select_range(0, 'end')
+            editor.place(x=x, y=y, width=width, height=height)
+            editor.focus_set()
+
+        def finish_edit(save=True):
+            item, column = editing['item'], editing['column']
+            if item is None:
+                return
+            editing['item'] = None
+            editor.place_forget()
+            if save and tree.exists(item):
+                rows[item][columns.index(column)] = editor.get().strip()
+                tree.item(item, values=rows[item], tags=())
+            tree.focus_set()
+
+        def move_edit(step):
+            """Сохраняет ячейку и открывает соседнюю (Tab — следующую, Shift+Tab — предыдущую)"""
+            item, column = editing['item'], editing['column']
+            finish_edit()
+            items = tree.get_children()
+            position = items.index(item) * len(columns) + columns.index(column) + step
+            if 0 <= position < len(items) * len(columns):
+                row, cell = divmod(position, len(columns))
+                tree.selection_set(items[row])
+                start_edit(items[row], columns[cell])
+            return "break"
+
+        editor.bind("<Return>", lambda e: finish_edit())
+        editor.bind("<KP_Enter>", lambda e: finish_edit())
+        editor.bind("<Escape>", lambda e: finish_edit(save=False))
+        editor.bind("<Tab>", lambda e: move_edit(1))
+        editor.bind("<Shift-Tab>", lambda e: move_edit(-1))
+        editor.bind("<ISO_Left_Tab>", lambda e: move_edit(-1))
+
+        def on_editor_focus_out(event):
+            # Фокус ушёл из поля (щелчок по кнопке, другое окно); при переходе
+            # к соседней ячейке поле к этому времени снова в фокусе
+            if dialog.focus_get() is not editor:
+                finish_edit()
+
+        editor.bind("<FocusOut>", on_editor_focus_out)
+
+        def on_double_click(event):
+            item = tree.identify_row(event.y)
+            column = tree.identify_column(event.x)
+            if item and tree.identify_region(event.x, event.y) == 'cell':
+                start_edit(item, columns[int(column[1:]) - 1])
+
+        def edit_focused(event=None):
+            item = tree.focus()
+            if item:
+                start_edit(item, 'work')
+            return "break"
+
+        # При прокрутке и изменении размера поле уже не над своей ячейкой
+        def on_scroll(*args):
+            finish_edit()
+            tree.yview(*args)
+
+        vsb = ttk.Scrollbar(tree_frame, orient='vertical', command=on_scroll)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.grid(row=0, column=0, sticky='nsew')
+        vsb.grid(row=0, column=1, sticky='ns')
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        def add_procedure():
+            item = add_row()
+            tree.selection_set(item)
+            tree.focus(item)
+            start_edit(item, 'work')
+
+        def delete_selected(event=None):
+            finish_edit(save=False)
+            selected = tree.selection()
+            if not selected:
+                return "break"
+            following = tree.next(selected[-1])
+            tree.delete(*selected)
+            for item in selected:
+                rows.pop(item, None)
+                original_names.pop(item, None)
+            if following and tree.exists(following):
+                tree.selection_set(following)
+                tree.focus(following)
+            return "break"
+
+        def paste_rows(event=None):
+            """Вставляет список процедур из буфера обмена: по строке на процедуру,
+            поля через Tab или «;». Процедуры с тем же названием обновляются"""
+            finish_edit()
             try:
-                if event.num == 4 or event.delta == 120:  # Вверх
-                    canvas.yview_scroll(-1, "units")
-                elif event.num == 5 or event.delta == -120:  # Вниз
-                    canvas.yview_scroll(1, "units")
+                text = dialog.clipboard_get()
             except tk.TclError:
-                # Виджет уже уничтожен, игнорируем ошибку
-                pass
-
-        # Словарь для хранения ID привязанных событий (для их последующего удаления)
-        bound_events = {}
-
-        # Функция для привязки событий скролла
-        def bind_scroll_events():
-            if not hasattr(dialog, '_events_bound'):
-                # Windows/Mac
-                bound_events['mousewheel'] = canvas.bind_all(
-                    "<MouseWheel>", on_mousewheel)
-                # Linux
-                bound_events['button4'] = canvas.bind_all(
-                    "<Button-4>", on_mousewheel)
-                bound_events['button5'] = canvas.bind_all(
-                    "<Button-5>", on_mousewheel)
-                dialog._events_bound = True
-
-        # Функция для отвязки событий скролла
-        def unbind_scroll_events():
-            try:
-                if hasattr(dialog, '_events_bound'):
-                    canvas.unbind_all("<MouseWheel>")
-                    canvas.unbind_all("<Button-4>")
-                    canvas.unbind_all("<Button-5>")
-                    delattr(dialog, '_events_bound')
-            except:
-                pass
-
-        # Привязываем события
-        bind_scroll_events()
-
-        # Размещаем элементы
-        canvas.pack(side="left", fill="both", expand=True)
-        v_scrollbar.pack(side="right", fill="y")
-
-        # Переменные для хранения данных
-        entries = []
-
-        # Функция для добавления новой строки
-        def add_row(work="", interval=10000):
-            row_frame = tk.Frame(scrollable_frame, bg="white")
-            row_frame.pack(fill="x", pady=2, padx=5)
-
-            # Поле для названия работы
-            work_var = tk.StringVar(value=work)
-            work_entry = tk.Entry(row_frame, textvariable=work_var,
-                                  font=("Arial", 11), width=90)
-            work_entry.pack(side="left", padx=(0, 15))
-
-            # Поле для интервала
-            interval_var = tk.StringVar(value=str(interval))
-            interval_entry = tk.Entry(row_frame, textvariable=interval_var,
-                                      font=("Arial", 11), width=12)
-            interval_entry.pack(side="left", padx=(0, 5))
-
-            tk.Label(row_frame, text="км", bg="white",
-                     font=("Arial", 11)).pack(side="left")
-
-            # Кнопка удаления
-            delete_btn = tk.Button(row_frame, text="❌",
-                                   font=("Arial", 9),
-                                   bg="#f44336",
-                                   fg="white",
-                                   width=3,
-                                   command=lambda: delete_row(row_frame, work_var, interval_var))
-            delete_btn.pack(side="left", padx=(15, 0))
-
-            entries.append((work_var, interval_var, row_frame))
-
-        # Функция удаления строки
-        def delete_row(row_frame, work_var, interval_var):
-            row_frame.destroy()
-            if (work_var, interval_var, row_frame) in entries:
-                entries.remove((work_var, interval_var, row_frame))
-
-        # Добавляем существующие процедуры
-        for work, interval in PLANNED_WORK:
-            add_row(work, interval)
+                status_label.config(text="Буфер обмена пуст")
+                return "break"
+
+            by_name = {values[0]: item for item, values in rows.items()}
+            added = updated = 0
+            last = None
+            for line in text.splitlines():
+                if not line.strip():
+                    continue
+                fields = [field.strip() for field in
+                          line.split('\t' if '\t' in line else ';')] + ["", ""]
+                work, interval, months = fields[:3]
+                if not work:
+                    continue
+                item = by_name.get(work)
+                if item is None:
+                    item = by_name[work] = tree.insert('', 'end')
+                    original_names[item] = ""
+                    added += 1
+                else:
+                    updated += 1
+                rows[item] = [work, interval, months]
+                tree.item(item, values=rows[item], tags=())
+                last = item
+            if last is not None:
+                tree.see(last)
+            status_label.config(text=f"Вставлено процедур: {added}, обновлено: {updated}")
+            return "break"
+
+        tree.bind("<Button-1>", lambda e: finish_edit(), add="+")
+        tree.bind("<Double-1>", on_double_click)
+        tree.bind("<Return>", edit_focused)
+        tree.bind("<F2>", edit_focused)
+        tree.bind("<Delete>", delete_selected)
+        tree.bind("<Control-v>", paste_rows)
+        tree.bind("<Control-V>", paste_rows)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>", "<Configure>"):
+            tree.bind(sequence, lambda e: finish_edit(), add="+")
 
         # Настройка допуска
         allowance_frame = tk.Frame(main_container, bg="white")
@@ -949,7 +1390,7 @@ class CarLoggerApp:
         tk.Label(allowance_frame, text="Допуск для предупреждения:",
                  font=("Arial", 11), bg="white").pack(side="left", padx=(0, 10))
 
-        allowance_var = tk.StringVar(value=str(ALLOWANCE))
+        allowance_var = tk.StringVar(value=str(settings.allowance))
         allowance_entry = tk.Entry(allowance_frame, textvariable=allowance_var,
                                    font=("Arial", 11), width=8)
         allowance_entry.pack(side="left", padx=(0, 5))
@@ -966,7 +1407,6 @@ class CarLoggerApp:
             )
 
             if response:
-                unbind_scroll_events()
                 dialog.destroy()
 
         # Устанавливаем обработчик закрытия окна
@@ -976,45 +1416,71 @@ class CarLoggerApp:
         controls_frame = tk.Frame(main_container, bg="white")
         controls_frame.pack(fill="x", pady=10)
 
-        # Кнопка добавления новой процедуры
         tk.Button(controls_frame,
                   text="➕ Добавить процедуру",
                   font=("Arial", 10, "bold"),
                   bg="#4CAF50",
                   fg="white",
-                  command=lambda: add_row()).pack(side="left", padx=5)
+                  command=add_procedure).pack(side="left", padx=5)
+
+        tk.Button(controls_frame,
+                  text="❌ Удалить выбранные",
+                  font=("Arial", 10),
+                  bg="#f44336",
+                  fg="white",
+                  command=delete_selected).pack(side="left", padx=5)
+
+        tk.Button(controls_frame,
+                  text="📋 Вставить список",
+                  font=("Arial", 10),
+                  bg="#1976D2",
+                  fg="white",
+                  command=paste_rows).pack(side="left", padx=5)
+
+        status_label = tk.Label(controls_frame, font=("Arial", 10),
+                                fg="#1976D2", bg="white")
+        status_label.pack(side="left", padx=10)
 
         # Фрейм для кнопок сохранения/закрытия
         save_frame = tk.Frame(dialog, bg="white", height=60)
         save_frame.pack(side="bottom", fill="x", pady=10, padx=20)
         save_frame.pack_propagate(False)
 
-        # Функция сохранения (возвращает True при успешном сохранении)
-        def save_configuration():
-            try:
-                new_planned_work = []
+        # Выполняющийся запрос сохранения; после закрытия окна его результат
+        # не доставляется (новый план окна получат через watch_plan)
+        save_task = {'task': None}
+        dialog.bind("<Destroy>", lambda e: save_task['task'].cancel()
+                    if e.widget is dialog and save_task['task'] is not None else None, add="+")
 
-                for work_var, interval_var, _ in entries:
-                    work = work_var.get().strip()
-                    if not work:
-                        continue  # Пропускаем пустые строки
-
-                    try:
-                        interval = int(interval_var.get())
-                        if interval <= 0:
-                            raise ValueError(
-                                "Интервал должен быть положительным числом")
-                    except ValueError:
-                        messagebox.showerror("Ошибка",
-                                             f"Некорректный интервал для: {work}")
-                        return False
-
-                    new_planned_work.append((work, interval))
+        # Функция сохранения; close — закрыть окно, когда план сохранится
+        def save_configuration(close=False):
+            finish_edit()
+            if save_task['task'] is not None and not save_task['task'].done():
+                return
+            try:
+                items = tree.get_children()
+                # Все строки проверяются сразу; ошибочные подсвечиваются
+                new_planned_work, errors = validate_plan_rows([rows[item] for item in items])
+                invalid = {items[index] for index, _ in errors}
+                for item in items:
+                    tree.item(item, tags=('invalid',) if item in invalid else ())
+
+                if errors:
+                    first = items[errors[0][0]]
+                    tree.selection_set(first)
+                    tree.see(first)
+                    messages = [message for _, message in errors[:10]]
+                    if len(errors) > 10:
+                        messages.append(f"... и ещё {len(errors) - 10}")
+                    messagebox.showerror(
+                        "Ошибка", f"Исправьте строки ({len(errors)}):\n" + "\n".join(messages),
+                        parent=dialog)
+                    return
 
                 if not new_planned_work:
                     messagebox.showerror(
-                        "Ошибка", "Список процедур не может быть пустым")
-                    return False
+                        "Ошибка", "Список процедур не может быть пустым", parent=dialog)
+                    return
 
                 # Получаем допуск
                 try:
@@ -1023,54 +1489,76 @@ class CarLoggerApp:
                         raise ValueError("Допуск должен быть между 1 и 99%")
                 except ValueError:
                     messagebox.showerror("Ошибка",
-                                         "Некорректное значение допуска (должно быть от 1 до 99%)")
-                    return False
-
-                # Сохраняем в конфигурацию
-                from config import save_config
-                if save_config(new_planned_work, allowance):
-                    # Обновляем глобальные переменные для текущей сессии
-                    global PLANNED_WORK, ALLOWANCE
-                    PLANNED_WORK[:] = new_planned_work
-                    ALLOWANCE = allowance
-
-                    messagebox.showinfo("Успех",
-                                        "Конфигурация успешно сохранена!")
-                    return True
-                else:
-                    messagebox.showerror(
-                        "Ошибка", "Не удалось сохранить конфигурацию")
-                    return False
+                                         "Некорректное значение допуска (должно быть от 1 до 99%)",
+                                         parent=dialog)
+                    return
+
+                # Переименованные процедуры сохраняют ID, а с ним и историю;
+                # переименования и новая версия плана — одна транзакция
+                renames = {}
+                saved_names = {}
+                for item in items:
+                    original, work = original_names.get(item), rows[item][0].strip()
+                    if original and work and original != work:
+                        renames[original] = work
+                    if work:
+                        saved_names[item] = work
 
             except Exception as e:
                 messagebox.showerror(
-                    "Ошибка", f"Ошибка при сохранении: {str(e)}")
-                return False
+                    "Ошибка", f"Ошибка при сохранении: {str(e)}", parent=dialog)
+                return
 
-        # Функция для сохранения и закрытия
-        def save_and_close():
-            if save_configuration():
-                unbind_scroll_events()
-                dialog.destroy()
+            def set_busy(busy):
+                for button in (save_button, save_close_button):
+                    button.config(state="disabled" if busy else "normal")
+                dialog.config(cursor="watch" if busy else "")
 
-        # Кнопки
-        tk.Button(save_frame,
-                  text="💾 Сохранить",
-                  font=("Arial", 11, "bold"),
-                  bg="#4CAF50",
-                  fg="white",
-                  padx=30,
-                  pady=8,
-                  command=save_configuration).pack(side="left", padx=10)
+            def on_saved(saved):
+                set_busy(False)
+                if not saved:
+                    messagebox.showerror(
+                        "Ошибка", "Не удалось сохранить конфигурацию", parent=dialog)
+                    return
+                original_names.update(saved_names)
+                # Открытые окна получают новый снимок
+                self.publish_plan(self.db.plan.snapshot())
+                messagebox.showinfo("Успех",
+                                    "Конфигурация успешно сохранена!", parent=dialog)
+                if close:
+                    dialog.destroy()
+
+            def on_failed(error):
+                set_busy(False)
+                messagebox.showerror(
+                    "Ошибка", f"Ошибка при сохранении: {str(error)}", parent=dialog)
 
-        tk.Button(save_frame,
-                  text="💾 Сохранить и закрыть",
-                  font=("Arial", 11),
-                  bg="#2196F3",
-                  fg="white",
-                  padx=20,
-                  pady=8,
-                  command=save_and_close).pack(side="left", padx=10)
+            # Новая версия плана записывается в базу в фоновом потоке
+            set_busy(True)
+            save_task['task'] = self.worker.call(
+                lambda db: db.plan.update(new_planned_work, allowance, renames=renames),
+                on_result=on_saved, on_error=on_failed)
+
+        # Кнопки
+        save_button = tk.Button(save_frame,
+                                text="💾 Сохранить",
+                                font=("Arial", 11, "bold"),
+                                bg="#4CAF50",
+                                fg="white",
+                                padx=30,
+                                pady=8,
+                                command=save_configuration)
+        save_button.pack(side="left", padx=10)
+
+        save_close_button = tk.Button(save_frame,
+                                      text="💾 Сохранить и закрыть",
+                                      font=("Arial", 11),
+                                      bg="#2196F3",
+                                      fg="white",
+                                      padx=20,
+                                      pady=8,
+                                      command=lambda: save_configuration(close=True))
+        save_close_button.pack(side="left", padx=10)
 
         tk.Button(save_frame,
                   text="❌ Закрыть",
@@ -1081,9 +1569,149 @@ class CarLoggerApp:
                   pady=8,
                   command=close_window).pack(side="right", padx=10)
 
-        # Привязываем события после создания всех виджетов
-        dialog.update_idletasks()
-        bind_scroll_events()
+        tree.focus_set()
+
+    def view_diagnostics(self):
+        """Статистика вызовов базы и окон, журнал медленных запросов"""
+        monitor = instrumentation.monitor
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Диагностика")
+        dialog.geometry("1000x700")
+        dialog.transient(self.root)
+
+        dialog.configure(bg="white")
+        self.center_dialog(dialog, 1000, 700)
+
+        tk.Label(dialog, text="Диагностика",
+                 font=("Arial", 16, "bold"),
+                 bg="white").pack(pady=10)
+
+        main_frame = tk.Frame(dialog, bg="white")
+        main_frame.pack(fill="both", expand=True, padx=20, pady=5)
+
+        # Включение сбора и порог медленных запросов
+        settings_frame = tk.Frame(main_frame, bg="white")
+        settings_frame.pack(fill="x", pady=5)
+
+        enabled_var = tk.BooleanVar(value=monitor.enabled)
+        tk.Checkbutton(settings_frame, text="Собирать статистику",
+                       variable=enabled_var, font=("Arial", 11), bg="white",
+                       command=lambda: apply_settings()).pack(side="left")
+
+        tk.Label(settings_frame, text="Медленные вызовы дольше, мс:",
+                 font=("Arial", 11), bg="white").pack(side="left", padx=(20, 5))
+        slow_var = tk.StringVar(value="" if monitor.slow_ms is None else f"{monitor.slow_ms:g}")
+        slow_entry = tk.Entry(settings_frame, textvariable=slow_var,
+                              font=("Arial", 11), width=8)
+        slow_entry.pack(side="left")
+        tk.Label(settings_frame, text="(пусто — не записывать)",
+                 font=("Arial", 9), fg="gray", bg="white").pack(side="left", padx=5)
+        slow_entry.bind("<Return>", lambda e: apply_settings())
+
+        # Таблица вызовов
+        tree_frame = tk.Frame(main_frame, bg="white")
+        tree_frame.pack(fill="both", expand=True, pady=10)
+
+        columns = ('name', 'calls', 'errors', 'avg', 'p95', 'max', 'rows')
+        tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=12)
+        headings = (("Метод или окно", 330, 'w'), ("Вызовов", 80, 'center'),
+                    ("Ошибок", 70, 'center'), ("Среднее, мс", 100, 'center'),
+                    ("95%, мс", 90, 'center'), ("Макс., мс", 90, 'center'),
+                    ("Строк", 90, 'center'))
+        for column, (text, width, anchor) in zip(columns, headings):
+            tree.heading(column, text=text, anchor=anchor)
+            tree.column(column, width=width, anchor=anchor)
+        tree.tag_configure('errors', foreground='#C62828')
+
+        vsb = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.grid(row=0, column=0, sticky='nsew')
+        vsb.grid(row=0, column=1, sticky='ns')
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        # Журнал медленных вызовов с планами запросов
+        tk.Label(main_frame, text="Медленные вызовы (EXPLAIN QUERY PLAN):",
+                 font=("Arial", 11, "bold"), bg="white").pack(anchor="w")
+        slow_text = tk.Text(main_frame, height=10, font=("Courier", 9),
+                            wrap="none", state="disabled")
+        slow_text.pack(fill="both", expand=True, pady=5)
+
+        # Обновление по таймеру, пока окно открыто
+        state = {'after': None, 'slow': None}
+
+        def refresh():
+            report = monitor.snapshot()
+            shown = set(tree.get_children())
+            for name, stats in report['calls'].items():
+                values = (name, stats['calls'], stats['errors'],
+                          f"{stats['avg_ms']:.2f}", f"{stats['p95_ms']:.2f}",
+                          f"{stats['max_ms']:.2f}", stats['rows'])
+                tags = ('errors',) if stats['errors'] else ()
+                if name in shown:
+                    tree.item(name, values=values, tags=tags)
+                else:
+                    tree.insert('', 'end', iid=name, values=values, tags=tags)
+            for name in shown - report['calls'].keys():
+                tree.delete(name)
+
+            # Текст журнала меняется только при новых записях
+            slow = report['slow']
+            key = (len(slow), slow[-1]['at'] if slow else None)
+            if key != state['slow']:
+                state['slow'] = key
+                lines = []
+                for entry in reversed(slow):
+                    lines.append(f"{entry['at']}  {entry['name']}: {entry['ms']:.1f} мс")
+                    for query in entry['queries']:
+                        lines.append(f"  {query['sql']}")
+                        lines.extend(f"    {step}" for step in query['plan'])
+                slow_text.config(state="normal")
+                slow_text.delete("1.0", "end")
+                slow_text.insert("1.0", "\n".join(lines) if lines else "Нет записей")
+                slow_text.config(state="disabled")
+
+            state['after'] = dialog.after(self.DIAGNOSTICS_REFRESH, refresh)
+
+        def apply_settings():
+            text = slow_var.get().strip()
+            try:
+                slow_ms = float(text) if text else None
+                if slow_ms is not None and slow_ms < 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Ошибка", "Порог должен быть неотрицательным числом",
+                                     parent=dialog)
+                return
+            if enabled_var.get():
+                monitor.enable(slow_ms)
+            else:
+                monitor.disable()
+
+        def reset():
+            monitor.reset()
+            tree.delete(*tree.get_children())
+            state['slow'] = None
+
+        def close_dialog():
+            if state['after'] is not None:
+                dialog.after_cancel(state['after'])
+            dialog.destroy()
+
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+
+        button_frame = tk.Frame(dialog, bg="white")
+        button_frame.pack(pady=10)
+
+        tk.Button(button_frame, text="Сбросить", command=reset,
+                  bg="#1976D2", fg="white", font=("Arial", 11),
+                  padx=20, pady=5).pack(side="left", padx=5)
+        tk.Button(button_frame, text="Закрыть", command=close_dialog,
+                  bg="#f44336", fg="white", font=("Arial", 11),
+                  padx=20, pady=5).pack(side="left", padx=5)
+
+        refresh()
 
     def center_dialog(self, dialog, width, height):
         x = self.root.winfo_x() + (self.root.winfo_width() - width) // 2
@@ -1092,10 +1720,82 @@ class CarLoggerApp:
 
     def run(self):
         self.root.mainloop()
+        self.worker.close()
         self.db.close()
 
 
+def profile_startup():
+    """Печатает время импорта модулей и этапов запуска"""
+    imported = time.perf_counter()
+    import os
+    import subprocess
+
+    # Отдельный процесс: в этом модули уже загружены
+    print("Импорт main.py (python -X importtime), мс:")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    children, modules = [], []
+    for line in result.stderr.splitlines():
+        # "import time: собственное | суммарное | имя"; вложенность — отступом,
+        # вложенные модули печатаются перед импортировавшим их
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entry = (int(parts[1]) / 1000, name.strip())
+        if depth == 1:
+            children.append(entry)
+        elif depth == 0:
+            if entry[1] == "main":
+                modules = [entry] + children
+            children = []
+    for ms, name in sorted(modules, reverse=True)[:12]:
+        print(f"  {name:<30} {ms:>7.1f}")
+
+    print("Этапы запуска, мс:")
+    print(f"  {'импорт main.py':<30} {(imported - START) * 1000:>7.1f}")
+    last = time.perf_counter()
+
+    def mark(name):
+        nonlocal last
+        now = time.perf_counter()
+        print(f"  {name:<30} {(now - last) * 1000:>7.1f}")
+        last = now
+
+    try:
+        app = CarLoggerApp(on_phase=mark)
+    except tk.TclError as e:
+        print(f"  окно не создано (нет дисплея?): {e}")
+        app = None
+        db = Database()
+    else:
+        app.root.update_idletasks()
+        mark("первая отрисовка")
+        db = app.db
+
+    print("При первом обращении, мс:")
+    last = time.perf_counter()
+    db.conn
+    mark("открытие и миграция базы")
+    db.plan.snapshot()
+    mark("загрузка плана ТО")
+
+    if app is not None:
+        app.worker.close()
+        app.root.destroy()
+    db.close()
+
+
 def main():
+    if "--profile-startup" in sys.argv[1:]:
+        profile_startup()
+        return
+
+    # Сбор статистики с запуска (CAR_LOGGER_DIAGNOSTICS=1), см. instrumentation.py
+    instrumentation.monitor.enable_from_environment()
     try:
         app = CarLoggerApp()
         print("Приложение запущено успешно!")
@@ -0,0 +1,414 @@
+# migrations.py
+"""Версионные миграции схемы базы данных.
+
+Номер применённой миграции хранится в PRAGMA user_version, поэтому
+существующие файлы car_logger.db обновляются на месте при открытии.
+Новые миграции добавляются только в конец списка MIGRATIONS.
+"""
+import sqlite3
+
+
+def create_logs(conn):
+    """Таблица журнала (для старых файлов уже существует)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mileage INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT NOT NULL
+        )
+    ''')
+
+
+def index_last_service(conn):
+    """Покрывающий индекс для поиска последнего ТО по описанию"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_description_mileage
+        ON logs (description, mileage)
+    ''')
+
+
+def index_history(conn):
+    """Покрывающий индекс для истории (ORDER BY date DESC, mileage DESC)"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_date_mileage
+        ON logs (date, mileage, type, description)
+    ''')
+
+
+def create_works(conn):
+    """Справочник работ: logs ссылается на работу по целому ID.
+
+    ID заполняются по существующим описаниям плановых работ, а индекс
+    по описанию заменяется более компактным индексом по work_id.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS works (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute("ALTER TABLE logs ADD COLUMN work_id INTEGER REFERENCES works (id)")
+    conn.execute('''
+        INSERT OR IGNORE INTO works (name)
+        SELECT DISTINCT description FROM logs WHERE type = 'плановое ТО'
+    ''')
+    conn.execute('''
+        UPDATE logs SET work_id = (
+            SELECT id FROM works WHERE works.name = logs.description
+        )
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_logs_description_mileage")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_work_mileage
+        ON logs (work_id, mileage)
+    ''')
+
+
+def index_history_keyset(conn):
+    """Индекс истории с id в ключе для постраничного чтения (date, mileage, id)"""
+    conn.execute("DROP INDEX IF EXISTS idx_logs_date_mileage")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_history
+        ON logs (date, mileage, id, type, description)
+    ''')
+
+
+def create_vehicles(conn):
+    """Автопарк: журнал ведётся по каждому автомобилю отдельно.
+
+    Существующие записи относятся к автомобилю с ID 1. Собственный план
+    ТО автомобиля хранится в vehicle_plan; если строк нет — действует
+    общий план из конфигурации.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vehicles (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            mileage INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vehicle_plan (
+            vehicle_id INTEGER NOT NULL REFERENCES vehicles (id),
+            work_id INTEGER NOT NULL REFERENCES works (id),
+            period INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (vehicle_id, work_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO vehicles (id, name, mileage)
+        VALUES (1, 'Основной автомобиль', (SELECT COALESCE(MAX(mileage), 0) FROM logs))
+    ''')
+    conn.execute('''
+        ALTER TABLE logs ADD COLUMN vehicle_id INTEGER NOT NULL DEFAULT 1
+        REFERENCES vehicles (id)
+    ''')
+
+    # Все выборки теперь идут в разрезе автомобиля
+    conn.execute("DROP INDEX IF EXISTS idx_logs_work_mileage")
+    conn.execute("DROP INDEX IF EXISTS idx_logs_history")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_vehicle_work
+        ON logs (vehicle_id, work_id, mileage)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_vehicle_history
+        ON logs (vehicle_id, date, mileage, id, type, description)
+    ''')
+
+
+def create_last_service(conn):
+    """Сводная таблица "последнее ТО по работе", поддерживаемая триггерами.
+
+    Проверка состояния читает не более одной строки на работу плана
+    независимо от размера журнала. При удалении записи с наибольшим
+    пробегом значение пересчитывается по индексу (vehicle_id, work_id, mileage).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS last_service (
+            vehicle_id INTEGER NOT NULL,
+            work_id INTEGER NOT NULL,
+            mileage INTEGER NOT NULL,
+            PRIMARY KEY (vehicle_id, work_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO last_service (vehicle_id, work_id, mileage)
+        SELECT vehicle_id, work_id, MAX(mileage) FROM logs
+        WHERE work_id IS NOT NULL
+        GROUP BY vehicle_id, work_id
+    ''')
+
+    add_service = '''
+        INSERT INTO last_service (vehicle_id, work_id, mileage)
+        VALUES (NEW.vehicle_id, NEW.work_id, NEW.mileage)
+        ON CONFLICT (vehicle_id, work_id)
+        DO UPDATE SET mileage = MAX(mileage, excluded.mileage);
+    '''
+    remove_service = '''
+        DELETE FROM last_service
+        WHERE vehicle_id = OLD.vehicle_id AND work_id = OLD.work_id
+          AND mileage = OLD.mileage;
+        INSERT OR IGNORE INTO last_service (vehicle_id, work_id, mileage)
+        SELECT OLD.vehicle_id, OLD.work_id, MAX(mileage) FROM logs
+        WHERE vehicle_id = OLD.vehicle_id AND work_id = OLD.work_id
+        HAVING MAX(mileage) IS NOT NULL;
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_last_service_insert
+        AFTER INSERT ON logs WHEN NEW.work_id IS NOT NULL
+        BEGIN {add_service} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_last_service_delete
+        AFTER DELETE ON logs WHEN OLD.work_id IS NOT NULL
+        BEGIN {remove_service} END
+    ''')
+    # Изменение записи — это удаление старого значения и добавление нового
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_last_service_update_old
+        AFTER UPDATE OF vehicle_id, work_id, mileage ON logs
+        WHEN OLD.work_id IS NOT NULL
+        BEGIN {remove_service} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_last_service_update_new
+        AFTER UPDATE OF vehicle_id, work_id, mileage ON logs
+        WHEN NEW.work_id IS NOT NULL
+        BEGIN {add_service} END
+    ''')
+
+
+def create_plan_history(conn):
+    """План ТО и допуск в базе: каждое сохранение плана — новая версия.
+
+    Версии только добавляются, поэтому проверку можно выполнить по плану,
+    действовавшему на любую дату. Первая версия переносится из
+    car_config.json при первом обращении к плану (см. plan.py).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS plan_changes (
+            id INTEGER PRIMARY KEY,
+            changed_at TEXT NOT NULL,
+            allowance REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS plan_items (
+            change_id INTEGER NOT NULL REFERENCES plan_changes (id),
+            position INTEGER NOT NULL,
+            work_id INTEGER NOT NULL REFERENCES works (id),
+            period INTEGER NOT NULL,
+            PRIMARY KEY (change_id, position)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_plan_changes_changed_at
+        ON plan_changes (changed_at)
+    ''')
+    # История не переписывается; work_id в plan_items меняется только
+    # при объединении работ (Database.rename_work)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS plan_changes_append_only_update
+        BEFORE UPDATE ON plan_changes
+        BEGIN SELECT RAISE(ABORT, 'История плана ТО не изменяется'); END
+    ''')
+    for table in ('plan_changes', 'plan_items'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_append_only_delete
+            BEFORE DELETE ON {table}
+            BEGIN SELECT RAISE(ABORT, 'История плана ТО не изменяется'); END
+        ''')
+
+
+def create_search_index(conn):
+    """Полнотекстовый индекс FTS5 по описаниям работ, поддерживаемый триггерами.
+
+    Индекс хранит только слова (content='logs'): текст берётся из журнала.
+    Токенизатор unicode61 не различает регистр, в том числе у кириллицы;
+    префиксные индексы ускоряют поиск по началу слова. Если SQLite собран
+    без FTS5, миграция ничего не создаёт, а поиск сообщает о недоступности.
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5 (
+                description,
+                content = 'logs', content_rowid = 'id',
+                tokenize = 'unicode61',
+                prefix = '2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e):
+            raise
+        return
+    conn.execute("INSERT INTO logs_fts (logs_fts) VALUES ('rebuild')")
+
+    add_text = "INSERT INTO logs_fts (rowid, description) VALUES (NEW.id, NEW.description);"
+    remove_text = (
+        "INSERT INTO logs_fts (logs_fts, rowid, description) "
+        "VALUES ('delete', OLD.id, OLD.description);")
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_fts_insert
+        AFTER INSERT ON logs
+        BEGIN {add_text} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_fts_delete
+        AFTER DELETE ON logs
+        BEGIN {remove_text} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_fts_update
+        AFTER UPDATE OF description ON logs
+        BEGIN {remove_text} {add_text} END
+    ''')
+
+
+def add_month_intervals(conn):
+    """Интервалы ТО в месяцах ("что наступит раньше") и дата последнего ТО.
+
+    У процедур плана появляется необязательный столбец months, а сводная
+    таблица last_service хранит кроме наибольшего пробега и дату последнего
+    выполнения работы. Триггеры пересоздаются: при удалении записи оба
+    значения пересчитываются по индексам (vehicle_id, work_id, mileage) и
+    (vehicle_id, work_id, date).
+    """
+    conn.execute("ALTER TABLE plan_items ADD COLUMN months INTEGER")
+    conn.execute("ALTER TABLE vehicle_plan ADD COLUMN months INTEGER")
+    conn.execute("ALTER TABLE last_service ADD COLUMN date TEXT")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_logs_vehicle_work_date
+        ON logs (vehicle_id, work_id, date)
+    ''')
+    conn.execute('''
+        UPDATE last_service SET date = (
+            SELECT MAX(date) FROM logs
+            WHERE logs.vehicle_id = last_service.vehicle_id
+              AND logs.work_id = last_service.work_id
+        )
+    ''')
+
+    add_service = '''
+        INSERT INTO last_service (vehicle_id, work_id, mileage, date)
+        VALUES (NEW.vehicle_id, NEW.work_id, NEW.mileage, NEW.date)
+        ON CONFLICT (vehicle_id, work_id)
+        DO UPDATE SET mileage = MAX(mileage, excluded.mileage),
+                      date = MAX(COALESCE(date, ''), excluded.date);
+    '''
+    remove_service = '''
+        DELETE FROM last_service
+        WHERE vehicle_id = OLD.vehicle_id AND work_id = OLD.work_id
+          AND (mileage = OLD.mileage OR date = OLD.date);
+        INSERT OR IGNORE INTO last_service (vehicle_id, work_id, mileage, date)
+        SELECT OLD.vehicle_id, OLD.work_id, last.mileage, last.date FROM (
+            SELECT (SELECT MAX(mileage) FROM logs
+                    WHERE vehicle_id = OLD.vehicle_id AND work_id = OLD.work_id) AS mileage,
+                   (SELECT MAX(date) FROM logs
+                    WHERE vehicle_id = OLD.vehicle_id AND work_id = OLD.work_id) AS date
+        ) AS last
+        WHERE last.mileage IS NOT NULL;
+    '''
+    triggers = {
+        'logs_last_service_insert': (
+            "AFTER INSERT ON logs WHEN NEW.work_id IS NOT NULL", add_service),
+        'logs_last_service_delete': (
+            "AFTER DELETE ON logs WHEN OLD.work_id IS NOT NULL", remove_service),
+        'logs_last_service_update_old': (
+            "AFTER UPDATE OF vehicle_id, work_id, mileage, date ON logs "
+            "WHEN OLD.work_id IS NOT NULL", remove_service),
+        'logs_last_service_update_new': (
+            "AFTER UPDATE OF vehicle_id, work_id, mileage, date ON logs "
+            "WHEN NEW.work_id IS NOT NULL", add_service),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {event} BEGIN {body} END")
+
+
+def create_record_counts(conn):
+    """Число записей каждого автомобиля в сводной таблице, поддерживаемой триггерами.
+
+    Окно истории узнаёт размер журнала одной строкой, а не подсчётом
+    COUNT(*), время которого растёт с журналом.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS record_counts (
+            vehicle_id INTEGER PRIMARY KEY,
+            records INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO record_counts (vehicle_id, records)
+        SELECT vehicle_id, COUNT(*) FROM logs GROUP BY vehicle_id
+    ''')
+
+    add_record = '''
+        INSERT INTO record_counts (vehicle_id, records) VALUES (NEW.vehicle_id, 1)
+        ON CONFLICT (vehicle_id) DO UPDATE SET records = records + 1;
+    '''
+    remove_record = '''
+        UPDATE record_counts SET records = records - 1 WHERE vehicle_id = OLD.vehicle_id;
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_record_counts_insert
+        AFTER INSERT ON logs
+        BEGIN {add_record} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_record_counts_delete
+        AFTER DELETE ON logs
+        BEGIN {remove_record} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS logs_record_counts_update
+        AFTER UPDATE OF vehicle_id ON logs
+        WHEN OLD.vehicle_id IS NOT NEW.vehicle_id
+        BEGIN {remove_record} {add_record} END
+    ''')
+
+
+MIGRATIONS = [
+    create_logs,
+    index_last_service,
+    index_history,
+    create_works,
+    index_history_keyset,
+    create_vehicles,
+    create_last_service,
+    create_plan_history,
+    create_search_index,
+    add_month_intervals,
+    create_record_counts,
+]
+
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Применяет недостающие миграции, каждую в отдельной транзакции"""
+    version = get_version(conn)
+    if version > len(MIGRATIONS):
+        raise RuntimeError(
+            f"База данных создана более новой версией программы "
+            f"(схема {version}, поддерживается {len(MIGRATIONS)})")
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        # IMMEDIATE сразу берёт блокировку записи; версию перечитываем под ней,
+        # так как базу мог одновременно обновить другой процесс
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_version(conn) < number:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    return get_version(conn)
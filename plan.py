@@ -0,0 +1,122 @@
+# plan.py
+"""План ТО и допуск, хранящиеся в базе данных, с историей изменений.
+
+PlanService даёт тот же интерфейс, что и config.ConfigService (снимки,
+подписчики, check_for_changes), но читает и пишет таблицы plan_changes и
+plan_items. Номер версии снимка — ID изменения в базе, поэтому он не
+сбрасывается при перезапуске. Текущий план загружается один раз; затем
+snapshot() лишь сверяет MAX(id), чтобы заметить изменения из других
+процессов (например, python -m cli config).
+
+    plan = db.plan.snapshot()        # действующий план
+    plan = db.plan.at('2024-05-01')  # план, действовавший на дату
+"""
+import datetime
+
+import config
+from config import ConfigService, ConfigSnapshot
+
+
+class PlanService(ConfigService):
+    def __init__(self, db, watch_interval=1.0):
+        super().__init__(path=None, watch_interval=watch_interval, backup_count=0)
+        self.db = db
+        self._renames = {}  # переименования для сохраняемой версии (см. update)
+
+    def _prepare(self):
+        pass
+
+    def _source_stat(self):
+        return self.db.conn.execute("SELECT MAX(id) FROM plan_changes").fetchone()[0]
+
+    def _version(self, current):
+        return self._stat
+
+    def _items(self, change_id):
+        cursor = self.db.conn.execute(
+            "SELECT works.name, plan_items.period, plan_items.months FROM plan_items "
+            "JOIN works ON works.id = plan_items.work_id "
+            "WHERE plan_items.change_id = ? ORDER BY plan_items.position",
+            (change_id,)
+        )
+        return tuple(cursor.fetchall())
+
+    def _read(self):
+        row = self.db.conn.execute(
+            "SELECT id, allowance FROM plan_changes ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None:
+            return None
+        return self._items(row[0]), row[1]
+
+    def _initial(self):
+        # Первая версия плана переносится из car_config.json; если файла
+        # нет, он не создаётся — берётся план по умолчанию
+        return config.read_settings()
+
+    def _recover(self):
+        self._publish(*self._initial())
+        return False
+
+    def update(self, planned_work=None, allowance=None, renames=None):
+        """Сохраняет новую версию плана. renames — {старое название: новое}:
+        переименования работ (Database.rename_works) выполняются в той же
+        транзакции, поэтому при неудаче не остаются применёнными наполовину."""
+        with self._lock:
+            self._renames = renames or {}
+            try:
+                return super().update(planned_work, allowance)
+            finally:
+                self._renames = {}
+
+    def _write(self, planned_work, allowance):
+        renames = self._renames
+        conn = self.db.conn
+        try:
+            # Сначала переименования: иначе новое название попало бы в
+            # справочник как отдельная работа
+            self.db.rename_works(renames, commit=False)
+            work_ids = self.db.get_work_ids([work for work, _, _ in planned_work], commit=False)
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO plan_changes (changed_at, allowance) VALUES (?, ?)",
+                (datetime.datetime.now().isoformat(timespec='seconds'), allowance)
+            )
+            change_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO plan_items (change_id, position, work_id, period, months) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(change_id, position, work_ids[work], period, months)
+                 for position, (work, period, months) in enumerate(planned_work)]
+            )
+            conn.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.data_changed()
+        self._stat = change_id
+        return True
+
+    def at(self, date):
+        """План, действовавший на дату ГГГГ-ММ-ДД (включая изменения этого дня).
+
+        Для дат раньше первого изменения берётся самая первая версия.
+        """
+        self.snapshot()  # первая версия создаётся при первом обращении
+        next_day = (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+        row = self.db.conn.execute(
+            "SELECT id, allowance FROM plan_changes WHERE changed_at < ? "
+            "ORDER BY changed_at DESC, id DESC LIMIT 1",
+            (next_day,)
+        ).fetchone()
+        if row is None:
+            row = self.db.conn.execute(
+                "SELECT id, allowance FROM plan_changes ORDER BY id LIMIT 1").fetchone()
+        return ConfigSnapshot(row[0], self._items(row[0]), row[1])
+
+    def history(self):
+        """Все версии плана: [(ID, дата изменения, допуск, план)] от новых к старым"""
+        self.snapshot()
+        rows = self.db.conn.execute(
+            "SELECT id, changed_at, allowance FROM plan_changes ORDER BY id DESC").fetchall()
+        return [(change_id, changed_at, allowance, self._items(change_id))
+                for change_id, changed_at, allowance in rows]
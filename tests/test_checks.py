@@ -0,0 +1,37 @@
+"""Проверки из benchmark.py как тесты: сбои при сохранении настроек и
+кэш check_services (вместе со сверкой check_fleet и check_services).
+
+Запуск: python -m unittest discover tests   (или python -m pytest tests)
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+
+class ChecksTest(unittest.TestCase):
+    def setUp(self):
+        # Проверки не должны ничего создавать в текущем каталоге
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_config_faults(self):
+        self.assertEqual(benchmark.check_config_faults(), [])
+
+    def test_check_cache(self):
+        problems, info = benchmark.check_check_cache(size=500, rounds=60)
+        self.assertEqual(problems, [])
+        self.assertGreater(info['hits'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
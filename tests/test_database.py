@@ -0,0 +1,211 @@
+"""Тесты слоя базы данных (database.py, plan.py)."""
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+from database import Database, add_months, service_date_cutoff  # noqa: E402
+from db_worker import DatabaseWorker  # noqa: E402
+
+TIMEOUT = 10  # секунд; дольше — значит, потоки ждут друг друга
+
+
+class DatabaseTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db = Database(os.path.join(tmp.name, 'test.db'))
+
+    def tearDown(self):
+        if self.db is not None:
+            self.db.close()
+
+    def test_plan_check_during_migration(self):
+        # Фоновый поток открывает историю, пока идут долгие миграции, а поток
+        # Tk в это время проверяет план (watch_plan)
+        migrating = threading.Event()
+        finish = threading.Event()
+
+        def slow_migrate(conn):
+            migrating.set()
+            finish.wait(TIMEOUT)
+            database_migrate(conn)
+
+        database_migrate = database.migrate
+        with mock.patch.object(database, 'migrate', slow_migrate):
+            reader = threading.Thread(target=self.db.count_records, daemon=True)
+            reader.start()
+            self.assertTrue(migrating.wait(TIMEOUT))
+            watcher = threading.Thread(target=self.db.plan.check_for_changes, daemon=True)
+            watcher.start()
+            threading.Timer(0.2, finish.set).start()
+            reader.join(TIMEOUT)
+            watcher.join(TIMEOUT)
+        deadlocked = reader.is_alive() or watcher.is_alive()
+        if deadlocked:
+            self.db = None  # close() тоже ждала бы блокировку
+        self.assertFalse(deadlocked, "взаимная блокировка")
+        self.assertTrue(self.db.plan.snapshot().planned_work)
+
+
+class HistoryPagingTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db = Database(os.path.join(tmp.name, 'test.db'))
+        self.addCleanup(self.db.close)
+        # Одинаковые даты и пробеги: порядок решает id
+        self.db.add_records([(1000 * (i % 7), f"2024-01-{i % 5 + 1:02d}", "плановое ТО",
+                              f"Работа {i}") for i in range(301)])
+        self.db.add_record(500, "2024-02-01", "плановое ТО", "Другой автомобиль", vehicle_id=2)
+        self.history = self.db.get_all_records()
+
+    def test_count_follows_journal(self):
+        self.assertEqual(self.db.count_records(), 301)
+        self.db.delete_record(self.history[0][0])
+        self.db.conn.execute("UPDATE logs SET vehicle_id = 2 WHERE id = ?", (self.history[1][0],))
+        self.db.conn.commit()
+        self.assertEqual((self.db.count_records(), self.db.count_records(2)), (299, 2))
+
+    def test_slice_from_either_end(self):
+        for offset in (0, 1, 150, 151, 250, 299, 300, 301, 400):
+            for limit in (1, 7, 100):
+                with self.subTest(offset=offset, limit=limit):
+                    self.assertEqual(self.db.get_records_slice(offset, limit),
+                                     self.history[offset:offset + limit])
+
+    def test_records_before(self):
+        self.assertEqual(self.db.get_records_before(10), self.history[-10:])
+        for index in (0, 5, 150, 300):
+            record = self.history[index]
+            before = (record[2], record[1], record[0])
+            self.assertEqual(self.db.get_records_before(20, before),
+                             self.history[max(0, index - 20):index])
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db = Database(os.path.join(tmp.name, 'test.db'))
+        self.addCleanup(self.db.close)
+        self.db.add_records([(i, "2024-01-01", "плановое ТО", f"Замена масла {i}")
+                             for i in range(30)])
+        self.db.add_record(100, "2024-01-02", "плановое ТО", "Замена масляного фильтра")
+
+    def test_ranking_threshold(self):
+        with mock.patch.object(database, 'SEARCH_RANK_LIMIT', 30):
+            self.assertFalse(self.db.search_ranked("зам"))
+            self.assertTrue(self.db.search_ranked("масла"))
+
+    def test_order_passed_in(self):
+        ranked = self.db.search_records("масл", 100, ranked=True)
+        recent = self.db.search_records("масл", 100, ranked=False)
+        self.assertEqual(sorted(ranked), sorted(recent))
+        self.assertEqual([row[0] for row in recent], sorted((row[0] for row in recent),
+                                                            reverse=True))
+        with mock.patch.object(Database, 'search_ranked') as search_ranked:
+            self.db.search_records("масл", 10, 10, ranked=True)
+        search_ranked.assert_not_called()
+
+
+class LastServiceTest(unittest.TestCase):
+    """Сводная таблица last_service (триггеры) и переименование работ"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db = Database(os.path.join(tmp.name, 'test.db'))
+        self.addCleanup(self.db.close)
+        self.db.plan.update([("A", 10000), ("B", 10000), ("C", 10000, 12)], 10)
+
+    def last(self, work):
+        return self.db.conn.execute(
+            "SELECT mileage, date FROM last_service "
+            "WHERE work_id = (SELECT id FROM works WHERE name = ?)", (work,)).fetchone()
+
+    def test_delete_recomputes(self):
+        first = self.db.add_record(1000, "2024-03-01", "плановое ТО", "C")
+        latest = self.db.add_record(500, "2024-05-01", "плановое ТО", "C")
+        highest = self.db.add_record(2000, "2024-01-01", "плановое ТО", "C")
+        self.assertEqual(self.last("C"), (2000, "2024-05-01"))
+        self.db.delete_record(highest)
+        self.assertEqual(self.last("C"), (1000, "2024-05-01"))
+        self.db.delete_record(latest)
+        self.assertEqual(self.last("C"), (1000, "2024-03-01"))
+        self.db.delete_record(first)
+        self.assertIsNone(self.last("C"))
+
+    def test_chain_and_swap_keep_histories(self):
+        self.db.add_record(100, "2024-01-01", "плановое ТО", "A")
+        self.db.add_record(200, "2024-01-01", "плановое ТО", "B")
+        self.db.add_record(300, "2024-01-01", "плановое ТО", "C")
+        # A -> B, B -> C, C -> A: ни одна история не сливается с другой
+        self.db.plan.update([("B", 10000), ("C", 10000), ("A", 10000, 12)], 10,
+                            renames={"A": "B", "B": "C", "C": "A"})
+        self.assertEqual([self.db.get_last_service(work) for work in "ABC"], [300, 100, 200])
+        self.assertEqual(self.db.count_records(), 3)
+
+    def test_merge_into_existing_work(self):
+        self.db.add_record(100, "2024-01-01", "плановое ТО", "A")
+        self.db.add_record(200, "2024-01-01", "плановое ТО", "B")
+        self.db.plan.update([("B", 10000), ("C", 10000, 12)], 10, renames={"A": "B"})
+        self.assertEqual(self.db.get_last_service("B"), 200)
+        self.assertEqual(self.db.conn.execute(
+            "SELECT COUNT(*) FROM logs WHERE work_id = (SELECT id FROM works WHERE name = 'B')"
+        ).fetchone()[0], 2)
+
+    def test_failed_save_keeps_names(self):
+        self.db.add_record(100, "2024-01-01", "плановое ТО", "A")
+        version = self.db.plan.snapshot().version
+        self.db.conn.execute(
+            "CREATE TRIGGER fail_plan BEFORE INSERT ON plan_items "
+            "BEGIN SELECT RAISE(ABORT, 'сбой'); END")
+        self.db.conn.commit()
+        with self.assertRaises(Exception):
+            self.db.plan.update([("D", 10000)], 10, renames={"A": "D"})
+        self.assertEqual(self.db.get_last_service("A"), 100)
+        self.assertEqual(self.db.get_last_service("D"), 0)
+        self.assertEqual(self.db.plan.snapshot().version, version)
+
+
+class MonthCutoffTest(unittest.TestCase):
+    def test_cutoff_matches_due_dates(self):
+        # check_fleet сравнивает дату ТО с границей, check_services — срок с днём
+        start = datetime.date(2023, 1, 1)
+        last_dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(800)]
+        for day in ("2024-02-29", "2024-03-31", "2024-04-30", "2024-05-15", "2025-02-28"):
+            for months in (1, 6, 12, 13):
+                for allowance in (0, 10, 20):
+                    cutoff = service_date_cutoff(day, months, allowance)
+                    delta = datetime.timedelta(
+                        days=int(months * database.DAYS_PER_MONTH * allowance / 100))
+                    for last in last_dates:
+                        due = datetime.date.fromisoformat(add_months(last, months))
+                        self.assertEqual((due - delta).isoformat() <= day, last <= cutoff,
+                                         (day, months, allowance, last))
+
+    def test_add_months_clamps_to_month_end(self):
+        self.assertEqual(add_months("2024-01-31", 1), "2024-02-29")
+        self.assertEqual(add_months("2023-01-31", 1), "2023-02-28")
+        self.assertEqual(add_months("2024-03-31", -1), "2024-02-29")
+        self.assertEqual(add_months("2024-11-15", 14), "2026-01-15")
+
+
+class DatabaseWorkerTest(unittest.TestCase):
+    def test_memory_database_rejected(self):
+        # Одно соединение базы в памяти нельзя делить между потоками пула
+        db = Database(':memory:')
+        self.addCleanup(db.close)
+        with self.assertRaises(ValueError):
+            DatabaseWorker(None, db)
+
+
+if __name__ == '__main__':
+    unittest.main()
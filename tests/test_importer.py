@@ -0,0 +1,72 @@
+"""Тесты импорта записей (importer.py)."""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from importer import import_file, validate_record  # noqa: E402
+
+RECORD = {'mileage': 1000, 'date': '2024-05-01', 'type': 'плановое ТО',
+          'description': 'Замена масла в двигателе'}
+
+
+class ValidateRecordTest(unittest.TestCase):
+    def test_valid_mileage(self):
+        for value in (1000, '1000', 1000.0, 2 ** 63 - 1):
+            with self.subTest(value=value):
+                self.assertEqual(validate_record(dict(RECORD, mileage=value))[0], int(value))
+
+    def test_invalid_mileage(self):
+        for value in (True, False, 1000.5, '10.5', None, 'abc', float('inf'), float('nan'),
+                      2 ** 63, '99999999999999999999999', 1e30):
+            with self.subTest(value=value):
+                with self.assertRaisesRegex(ValueError, "Некорректный пробег"):
+                    validate_record(dict(RECORD, mileage=value))
+
+    def test_not_an_object(self):
+        for row in (5, "запись", [1000, '2024-05-01'], None):
+            with self.subTest(row=row):
+                with self.assertRaisesRegex(ValueError, "объектом"):
+                    validate_record(row)
+
+
+class ImportFileTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.db = Database(os.path.join(tmp.name, 'test.db'))
+        self.addCleanup(self.db.close)
+
+    def import_json(self, rows, batch_size=1):
+        path = os.path.join(self.tmp, 'records.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        return import_file(self.db, path, batch_size=batch_size)
+
+    def test_bad_rows_do_not_abort_import(self):
+        rows = [RECORD, 5, dict(RECORD, mileage=1e30), dict(RECORD, mileage=True),
+                dict(RECORD, mileage=2000)]
+        result = self.import_json(rows)
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual([error.split(':')[0] for error in result['errors']],
+                         ["запись 2", "запись 3", "запись 4"])
+        self.assertEqual(self.db.count_records(), 2)
+
+    def test_csv_mileage_out_of_range(self):
+        path = os.path.join(self.tmp, 'records.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("mileage,date,type,description\n"
+                    "99999999999999999999999,2024-05-01,плановое ТО,Замена масла\n"
+                    "1000,2024-05-01,плановое ТО,Замена масла\n")
+        result = import_file(self.db, path)
+        self.assertEqual(result['imported'], 1)
+        self.assertEqual(len(result['errors']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
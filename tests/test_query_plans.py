@@ -0,0 +1,28 @@
+"""Планы горячих запросов (benchmark.py --explain) как тест."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+
+class QueryPlansTest(unittest.TestCase):
+    def setUp(self):
+        # Проверка не должна ничего создавать в текущем каталоге
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_query_plans(self):
+        self.assertEqual(benchmark.check_query_plans(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Холодный запуск (benchmark.py --startup) как тест.
+
+Строгий предел времени остаётся у python benchmark.py --startup: на
+общем сервере сборки время запуска процесса скачет, поэтому здесь
+предел по умолчанию мягкий. Его можно задать переменной окружения
+CAR_LOGGER_STARTUP_MAX_MS, например 100, как в benchmark.py.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+STARTUP_MAX_MS = float(os.environ.get('CAR_LOGGER_STARTUP_MAX_MS') or 1000)
+
+
+class StartupTest(unittest.TestCase):
+    def setUp(self):
+        # Проверка не должна ничего создавать в текущем каталоге
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_startup(self):
+        # Кроме времени проверяется, что cli не тянет tkinter, а импорт
+        # не создаёт car_config.json — это от нагрузки не зависит
+        self.assertEqual(benchmark.check_startup(STARTUP_MAX_MS), [])
+
+
+if __name__ == '__main__':
+    unittest.main()